@@ -0,0 +1,62 @@
+# Benchmarks for Compactor and Expander across issue widths. For each configuration this reports the time to
+# elaborate and convert to RTLIL, the number of RTLIL cells generated, and the simulation rate in vectors per
+# second for random enable patterns.
+#
+# Run from the repository root with: PYTHONPATH=src python bench/bench_compactor.py
+import random
+import time
+
+from amaranth.back import rtlil
+from amaranth.sim import Simulator, Settle
+from ssia.compactor import Compactor
+from ssia.expander import Expander
+
+WIDTH = 32
+COUNTS = [2, 4, 8, 12, 16]
+VECTORS = 256
+
+def convert(dut, ports):
+    start = time.perf_counter()
+    text = rtlil.convert(dut, ports=ports)
+    elapsed = time.perf_counter() - start
+    cells = sum(1 for line in text.splitlines() if line.lstrip().startswith("cell "))
+    return elapsed, cells
+
+def simulate(dut, apply):
+    rng = random.Random(0)
+    def process():
+        for _ in range(VECTORS):
+            yield from apply(rng)
+            yield Settle()
+    sim = Simulator(dut)
+    sim.add_process(process)
+    start = time.perf_counter()
+    sim.run()
+    return VECTORS / (time.perf_counter() - start)
+
+def benchCompactor(count):
+    dut = Compactor(width=WIDTH, count=count)
+    elapsed, cells = convert(dut, [*dut.input, *dut.input_en, dut.output_val, dut.output_count])
+    dut = Compactor(width=WIDTH, count=count)
+    def apply(rng):
+        for i in range(count):
+            yield dut.input[i].eq(rng.getrandbits(WIDTH))
+            yield dut.input_en[i].eq(rng.getrandbits(1))
+    return elapsed, cells, simulate(dut, apply)
+
+def benchExpander(count):
+    dut = Expander(width=WIDTH, count=count)
+    elapsed, cells = convert(dut, [dut.input_val, *dut.input_en, *dut.output, dut.output_count])
+    dut = Expander(width=WIDTH, count=count)
+    def apply(rng):
+        yield dut.input_val.eq(rng.getrandbits(WIDTH*count))
+        for i in range(count):
+            yield dut.input_en[i].eq(rng.getrandbits(1))
+    return elapsed, cells, simulate(dut, apply)
+
+if __name__ == '__main__':
+    print(f"{'module':<10} {'count':>5} {'rtlil s':>9} {'cells':>7} {'vectors/s':>10}")
+    for name, bench in [("Compactor", benchCompactor), ("Expander", benchExpander)]:
+        for count in COUNTS:
+            elapsed, cells, rate = bench(count)
+            print(f"{name:<10} {count:>5} {elapsed:>9.3f} {cells:>7} {rate:>10.0f}")
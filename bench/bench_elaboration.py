@@ -0,0 +1,80 @@
+# Elaboration benchmarks for TopStack and SSIA at large configurations. For each configuration this reports the
+# time to elaborate and convert to RTLIL, the peak Python memory allocated while doing so, and the number of
+# swizzle mux inputs generated, so that the cost per mux input can be compared across sizes. Memory is measured in
+# a second conversion, since tracing allocations slows conversion down several times over.
+#
+# Run from the repository root with: PYTHONPATH=src python bench/bench_elaboration.py
+import time
+import tracemalloc
+
+from amaranth.back import rtlil
+from ssia.top_stack import TopStack
+from ssia.ssia import SSIA
+
+WIDTH = 32
+
+# (issue_stages, top_stack_depth, mid_stack_depth)
+CONFIGS = [
+    (4, 4, 4),
+    (4, 8, 8),
+    (8, 8, 16),
+    (8, 16, 16),
+    (8, 32, 32),
+]
+
+def asValue(v):
+    return v.as_value()
+
+def muxInputs(issue_stages, stack_depth):
+    # Every slot of every stage selects from the slots of the prior stage, and the first and last slots from one
+    # more input.
+    return issue_stages * (stack_depth*stack_depth + 2)
+
+def convert(build):
+    dut, ports = build()
+    start = time.perf_counter()
+    text = rtlil.convert(dut, ports=ports)
+    elapsed = time.perf_counter() - start
+    cells = sum(1 for line in text.splitlines() if line.lstrip().startswith("cell "))
+
+    dut, ports = build()
+    tracemalloc.start()
+    rtlil.convert(dut, ports=ports)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, cells
+
+def benchTopStack(issue_stages, top_stack_depth, mid_stack_depth):
+    def build():
+        dut = TopStack(register_width=WIDTH, stack_depth=top_stack_depth, issue_stages=issue_stages, tag_width=5, writeback_count=2)
+        return dut, [
+            *map(asValue, dut.in_push),
+            *map(asValue, dut.in_mem),
+            *sum(dut.in_stack_swizzle, []),
+            *map(asValue, sum(dut.out_peek, [])),
+            *map(asValue, dut.out_bottom),
+            *map(asValue, dut.in_writeback),
+        ]
+    return convert(build)
+
+def benchSSIA(issue_stages, top_stack_depth, mid_stack_depth):
+    def build():
+        dut = SSIA(register_width=WIDTH, top_stack_depth=top_stack_depth, mid_stack_depth=mid_stack_depth, issue_stages=issue_stages, tag_width=5, writeback_count=2)
+        return dut, [
+            *map(asValue, dut.in_push),
+            *map(asValue, dut.in_mem),
+            *sum(dut.in_stack_swizzle, []),
+            *dut.in_stack_pushpop,
+            *map(asValue, sum(dut.out_peek, [])),
+            *map(asValue, dut.out_bottom),
+            *map(asValue, dut.in_writeback),
+        ]
+    return convert(build)
+
+if __name__ == '__main__':
+    print(f"{'module':<9} {'stages':>6} {'top':>4} {'mid':>4} {'mux in':>7} {'rtlil s':>8} {'peak MB':>8} {'cells':>7} {'ms/input':>9}")
+    for name, bench in [("TopStack", benchTopStack), ("SSIA", benchSSIA)]:
+        for config in CONFIGS:
+            elapsed, peak, cells = bench(*config)
+            inputs = muxInputs(config[0], config[1])
+            print(f"{name:<9} {config[0]:>6} {config[1]:>4} {config[2]:>4} {inputs:>7} {elapsed:>8.3f} {peak/1e6:>8.1f} {cells:>7} {elapsed/inputs*1e3:>9.3f}")
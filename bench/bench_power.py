@@ -0,0 +1,72 @@
+# Relative dynamic power of SSIA configurations on the stack workloads. Each kernel is scheduled on the model,
+# replayed cycle by cycle into the Amaranth simulation of SSIA, and the bit toggles of the stacks grids are
+# counted. Latched rows (stage 0) and the combinational rows of later stages are reported separately for each
+# region, in toggles per cycle, along with the total relative to the first configuration of each kernel.
+#
+# Run from the repository root with: PYTHONPATH=src python bench/bench_power.py
+from amaranth.sim import Simulator
+from ssia.ssia import SSIA
+from ssia.activity import ToggleCounter
+from ssia.workloads import KERNELS, StackMachine, runWorkload
+
+# Kernel sizes are reduced from their defaults to keep simulation time reasonable.
+SIZES = {
+    "fib": 7,
+    "dot": 16,
+    "forth": 8,
+    "matmul": 2,
+}
+
+# (issue_stages, top_stack_depth, mid_stack_depth, tag_width, writeback_count)
+CONFIGS = [
+    (2, 4, 4, 4, 1),
+    (4, 4, 4, 4, 1),
+    (4, 4, 8, 5, 2),
+    (4, 8, 8, 5, 2),
+]
+
+def measure(trace, issue_stages, top_stack_depth, mid_stack_depth, tag_width, writeback_count):
+    schedule = []
+    runWorkload(trace, register_width=32, top_stack_depth=top_stack_depth, mid_stack_depth=mid_stack_depth, issue_stages=issue_stages, tag_width=tag_width, writeback_count=writeback_count, schedule=schedule)
+
+    dut = SSIA(register_width=32, top_stack_depth=top_stack_depth, mid_stack_depth=mid_stack_depth, issue_stages=issue_stages, tag_width=tag_width, writeback_count=writeback_count)
+    counter = ToggleCounter()
+    def process():
+        counter.addGroups(dut.activityGroups())
+        yield from dut.zeroAllInputs()
+        for stages, writebacks in schedule:
+            yield from dut.applyBundle(stages, writebacks)
+            yield
+        yield
+
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    sim.add_sync_process(counter.clockedProcess)
+    sim.run()
+
+    cycles = len(schedule)
+    top_latched = counter.totalPower("top_stack_0_")
+    mid_latched = counter.totalPower("mid_stack_0_")
+    return {
+        "cycles": cycles,
+        "top latched": top_latched / cycles,
+        "top comb": (counter.totalPower("top_") - top_latched) / cycles,
+        "mid latched": mid_latched / cycles,
+        "mid comb": (counter.totalPower("mid_") - mid_latched) / cycles,
+        "total": counter.totalPower(),
+        "per op": counter.totalPower() / len(trace),
+    }
+
+if __name__ == '__main__':
+    print(f"{'kernel':<8} {'S':>2} {'top':>3} {'mid':>3} {'cycles':>6} {'top reg':>8} {'top comb':>8} {'mid reg':>8} {'mid comb':>8} {'per op':>7} {'relative':>8}")
+    for name, kernel in KERNELS.items():
+        vm = StackMachine(register_width=32)
+        kernel(vm, SIZES[name])
+        baseline = None
+        for config in CONFIGS:
+            result = measure(vm.trace, *config)
+            if baseline is None:
+                baseline = result["total"]
+            issue_stages, top_stack_depth, mid_stack_depth, _, _ = config
+            print(f"{name:<8} {issue_stages:>2} {top_stack_depth:>3} {mid_stack_depth:>3} {result['cycles']:>6} {result['top latched']:>8.1f} {result['top comb']:>8.1f} {result['mid latched']:>8.1f} {result['mid comb']:>8.1f} {result['per op']:>7.1f} {result['total'] / baseline:>8.2f}")
@@ -0,0 +1,25 @@
+# Stack-workload microbenchmarks. Each kernel is traced once on a StackMachine, then scheduled onto a model of
+# each SSIA configuration below. The results are deterministic, so they can be compared across changes to catch
+# regressions in effective throughput.
+#
+# Run from the repository root with: PYTHONPATH=src python bench/bench_workloads.py
+from ssia.workloads import KERNELS, StackMachine, runWorkload
+
+# (issue_stages, top_stack_depth, mid_stack_depth, tag_width, writeback_count)
+CONFIGS = [
+    (2, 4, 4, 4, 1),
+    (4, 4, 4, 4, 1),
+    (4, 4, 8, 5, 2),
+    (4, 8, 8, 5, 2),
+    (8, 8, 8, 6, 4),
+    (8, 8, 16, 6, 4),
+]
+
+if __name__ == '__main__':
+    print(f"{'kernel':<8} {'S':>2} {'top':>3} {'mid':>3} {'tag':>3} {'wb':>2} {'ops':>6} {'cycles':>6} {'IPC':>5} {'spills':>6} {'fills':>6} {'wb stalls':>9}")
+    for name, kernel in KERNELS.items():
+        vm = StackMachine(register_width=32)
+        kernel(vm)
+        for issue_stages, top_stack_depth, mid_stack_depth, tag_width, writeback_count in CONFIGS:
+            stats, _, _ = runWorkload(vm.trace, register_width=32, top_stack_depth=top_stack_depth, mid_stack_depth=mid_stack_depth, issue_stages=issue_stages, tag_width=tag_width, writeback_count=writeback_count)
+            print(f"{name:<8} {issue_stages:>2} {top_stack_depth:>3} {mid_stack_depth:>3} {tag_width:>3} {writeback_count:>2} {stats.ops:>6} {stats.cycles:>6} {stats.ipc:>5.2f} {stats.spills:>6} {stats.fills:>6} {stats.writeback_stalls:>9}")
@@ -0,0 +1,58 @@
+from amaranth.hdl import *
+from amaranth.sim import Passive
+
+# ToggleCounter estimates relative dynamic power from an Amaranth simulation by counting bit toggles per group of
+# signals between successive samples. Groups are typically taken from a module's activityGroups() once the
+# simulator has elaborated it. Each group may carry a weight, e.g. to account for the higher switched capacitance
+# of registers, and the weighted toggle count is reported as its relative power.
+class ToggleCounter:
+    def __init__(self):
+        self._groups = {}
+        self._previous = None
+        self.toggles = {}
+        self.samples = 0
+
+    def addGroup(self, name: str, signals, weight: float = 1.0):
+        self._groups[name] = ([Value.cast(s) for s in signals], weight)
+        self.toggles[name] = 0
+
+    def addGroups(self, groups, weight: float = 1.0):
+        for name, signals in groups.items():
+            self.addGroup(name, signals, weight)
+
+    # Sample every group, counting the bits that changed since the previous sample.
+    def sample(self):
+        current = {}
+        for name, (signals, _) in self._groups.items():
+            values = []
+            for s in signals:
+                values.append((yield s))
+            current[name] = values
+        if self._previous is not None:
+            for name, values in current.items():
+                for old, new in zip(self._previous[name], values):
+                    self.toggles[name] += bin(old ^ new).count("1")
+        self._previous = current
+        self.samples += 1
+
+    # A passive process for Simulator.add_sync_process() that samples once per clock, just before each edge.
+    def clockedProcess(self):
+        yield Passive()
+        while True:
+            yield
+            yield from self.sample()
+
+    def power(self, name: str):
+        return self.toggles[name] * self._groups[name][1]
+
+    def totalPower(self, prefix: str = ""):
+        return sum(self.power(name) for name in self._groups if name.startswith(prefix))
+
+    def report(self):
+        total = self.totalPower()
+        intervals = max(self.samples - 1, 1)
+        lines = [f"{'group':<24} {'toggles':>9} {'per cycle':>9} {'share':>6}"]
+        for name in self._groups:
+            share = self.power(name) / total if total else 0.0
+            lines.append(f"{name:<24} {self.toggles[name]:>9} {self.toggles[name] / intervals:>9.2f} {share:>6.1%}")
+        return "\n".join(lines)
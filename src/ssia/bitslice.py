@@ -0,0 +1,364 @@
+from amaranth.hdl import *
+from amaranth.hdl.ast import Assign, Switch, Property, Operator, Slice, Part, ArrayProxy, Statement
+
+# BitSlicedEvaluator evaluates the combinational logic of a design on many test vectors at once. Every bit of a
+# value is held as a bit plane: a Python int whose bit v is that bit of the value in test vector v. Bitwise
+# operators then evaluate every vector in a single int operation, and arithmetic is built from them as in a
+# ripple-carry circuit. This makes exhaustive checks of blocks such as Compactor feasible where a per-vector
+# Settle() loop in the simulator is not.
+#
+# Signals driven from the comb domain are evaluated on demand from their statements. Every other signal, including
+# the state of sync-domain registers, is an input: it takes the planes given with setInput() or setConst(), or its
+# reset value otherwise. As in the simulator, an out-of-range Array index selects the last element.
+class BitSlicedEvaluator:
+    def __init__(self, elaboratable):
+        self._statements = {}
+        self._comb = set()
+        self._collect(Fragment.get(elaboratable, None))
+        self.reset(1)
+
+    def _collect(self, fragment):
+        for domain, signals in fragment.drivers.items():
+            if domain is None or domain == "comb":
+                self._comb.update(id(x) for x in signals)
+        for statement in fragment.statements:
+            for signal in statement._lhs_signals():
+                self._statements.setdefault(id(signal), []).append(statement)
+        for subfragment, _ in fragment.subfragments:
+            self._collect(subfragment)
+
+    # Start a new evaluation of count test vectors, forgetting all inputs.
+    def reset(self, count: int):
+        self.count = count
+        self._all = (1 << count) - 1
+        self._inputs = {}
+        self._values = {}
+        self._cache = {}
+
+    def setInput(self, signal, planes):
+        signal = Value.cast(signal)
+        assert len(planes) == len(signal)
+        self._inputs[id(signal)] = list(planes)
+        self._values = {}
+        self._cache = {}
+
+    # Set an input to the same value in every test vector.
+    def setConst(self, signal, value: int):
+        signal = Value.cast(signal)
+        self.setInput(signal, [self._all if (value >> b) & 1 else 0 for b in range(len(signal))])
+
+    # The planes of any value, least significant bit first.
+    def planes(self, value):
+        return self._rhs(Value.cast(value))
+
+    # The value in every test vector, in vector order.
+    def values(self, value):
+        value = Value.cast(value)
+        return unpackPlanes(self.planes(value), self.count, value.shape().signed)
+
+    def _signal(self, signal):
+        key = id(signal)
+        if key in self._inputs:
+            return self._inputs[key]
+        if key in self._values:
+            return self._values[key]
+        planes = [self._all if (signal.reset >> b) & 1 else 0 for b in range(len(signal))]
+        if key in self._comb:
+            for statement in self._statements.get(key, []):
+                self._exec(statement, signal, planes, self._all)
+        self._values[key] = planes
+        return planes
+
+    def _exec(self, statement, target, planes, mask):
+        if isinstance(statement, Assign):
+            if any(x is target for x in statement.lhs._lhs_signals()):
+                rhs = self._extend(self._rhs(statement.rhs), statement.rhs.shape().signed, len(statement.lhs))
+                self._assign(statement.lhs, rhs, [mask] * len(rhs), target, planes)
+        elif isinstance(statement, Switch):
+            test = self._rhs(statement.test)
+            remaining = mask
+            for keys, statements in statement.cases.items():
+                if not remaining:
+                    break
+                if keys:
+                    matched = 0
+                    for key in keys:
+                        matched |= self._match(test, key)
+                else:
+                    matched = self._all
+                taken = remaining & matched
+                remaining &= ~matched
+                if taken:
+                    for s in statements:
+                        self._exec(s, target, planes, taken)
+        elif isinstance(statement, Property):
+            pass
+        elif isinstance(statement, Statement):
+            for s in statement:
+                self._exec(s, target, planes, mask)
+        else:
+            raise NotImplementedError("statement " + repr(statement) + " is not supported")
+
+    def _match(self, test, key):
+        # Keys are written most significant bit first, with '-' for a don't care.
+        matched = self._all
+        for b, c in enumerate(reversed(key)):
+            if c == "1":
+                matched &= test[b]
+            elif c == "0":
+                matched &= ~test[b]
+        return matched & self._all
+
+    # Assign rhs to the bits of target covered by lhs, in the vectors selected by the per-bit masks.
+    def _assign(self, lhs, rhs, masks, target, planes):
+        if isinstance(lhs, Signal):
+            if lhs is target:
+                for b in range(len(planes)):
+                    planes[b] = (planes[b] & ~masks[b]) | (rhs[b] & masks[b])
+        elif isinstance(lhs, Slice):
+            width = len(lhs.value)
+            self._assign(lhs.value,
+                         [0] * lhs.start + rhs + [0] * (width - lhs.stop),
+                         [0] * lhs.start + masks + [0] * (width - lhs.stop),
+                         target, planes)
+        elif isinstance(lhs, Cat):
+            offset = 0
+            for part in lhs.parts:
+                self._assign(part, rhs[offset:offset+len(part)], masks[offset:offset+len(part)], target, planes)
+                offset += len(part)
+        elif isinstance(lhs, Part):
+            offset = self._rhs(lhs.offset)
+            width = len(lhs.value)
+            for k in range(1 << len(lhs.offset)):
+                start = k * lhs.stride
+                if start >= width:
+                    break
+                selected = self._equals(offset, k)
+                stop = min(start + lhs.width, width)
+                self._assign(lhs.value,
+                             [0] * start + rhs[:stop-start] + [0] * (width - stop),
+                             [0] * start + [m & selected for m in masks[:stop-start]] + [0] * (width - stop),
+                             target, planes)
+        elif isinstance(lhs, ArrayProxy):
+            for i, selected in enumerate(self._selects(lhs)):
+                elem = Value.cast(lhs.elems[i])
+                self._assign(elem, rhs[:len(elem)], [m & selected for m in masks[:len(elem)]], target, planes)
+        else:
+            raise NotImplementedError("assignment to " + repr(lhs) + " is not supported")
+
+    # The vectors selecting each element of an Array, with out-of-range indices selecting the last element.
+    def _selects(self, proxy):
+        index = self._rhs(proxy.index)
+        selects = []
+        remaining = self._all
+        for i in range(len(proxy.elems)):
+            if i == len(proxy.elems) - 1:
+                selected = remaining
+            else:
+                selected = self._equals(index, i)
+            remaining &= ~selected
+            selects.append(selected)
+        return selects
+
+    def _equals(self, planes, value: int):
+        if value >> len(planes):
+            return 0
+        matched = self._all
+        for b, p in enumerate(planes):
+            matched &= p if (value >> b) & 1 else ~p
+        return matched & self._all
+
+    def _extend(self, planes, signed: bool, width: int):
+        if len(planes) >= width:
+            return planes[:width]
+        fill = planes[-1] if signed and planes else 0
+        return planes + [fill] * (width - len(planes))
+
+    def _rhs(self, value):
+        if isinstance(value, Signal):
+            return self._signal(value)
+        key = id(value)
+        if key in self._cache:
+            return self._cache[key][1]
+        planes = self._evaluate(value)
+        # Keep the value alive so that its id is not reused while the result is cached.
+        self._cache[key] = (value, planes)
+        return planes
+
+    def _evaluate(self, value):
+        if isinstance(value, Const):
+            return [self._all if (value.value >> b) & 1 else 0 for b in range(len(value))]
+        if isinstance(value, Slice):
+            return self._rhs(value.value)[value.start:value.stop]
+        if isinstance(value, Cat):
+            planes = []
+            for part in value.parts:
+                planes += self._rhs(part)
+            return planes
+        if isinstance(value, Part):
+            source = self._rhs(value.value)
+            offset = self._rhs(value.offset)
+            planes = [0] * value.width
+            for k in range(1 << len(value.offset)):
+                start = k * value.stride
+                if start >= len(source):
+                    break
+                selected = self._equals(offset, k)
+                for b in range(min(value.width, len(source) - start)):
+                    planes[b] |= source[start+b] & selected
+            return planes
+        if isinstance(value, ArrayProxy):
+            width = len(value)
+            signed = value.shape().signed
+            planes = [0] * width
+            for elem, selected in zip(value.elems, self._selects(value)):
+                elem = Value.cast(elem)
+                for b, p in enumerate(self._extend(self._rhs(elem), elem.shape().signed, width)):
+                    planes[b] |= p & selected
+            return planes
+        if isinstance(value, Operator):
+            return self._operator(value)
+        raise NotImplementedError("value " + repr(value) + " is not supported")
+
+    def _operator(self, value):
+        width = len(value)
+        operands = value.operands
+        op = value.operator
+
+        def operand(x, w=width):
+            return self._extend(self._rhs(x), x.shape().signed, w)
+
+        if len(operands) == 1:
+            arg, = operands
+            if op == "~":
+                return [~p & self._all for p in operand(arg)]
+            if op == "-":
+                return self._sub([0] * width, operand(arg))
+            if op in ("b", "r|"):
+                return [self._any(self._rhs(arg))]
+            if op == "r&":
+                matched = self._all
+                for p in self._rhs(arg):
+                    matched &= p
+                return [matched]
+            if op == "r^":
+                parity = 0
+                for p in self._rhs(arg):
+                    parity ^= p
+                return [parity]
+            if op in ("u", "s"):
+                return list(self._rhs(arg))
+        elif len(operands) == 2:
+            lhs, rhs = operands
+            if op == "+":
+                return self._add(operand(lhs), operand(rhs), 0)
+            if op == "-":
+                return self._sub(operand(lhs), operand(rhs))
+            if op == "*":
+                # Shift-and-add, adding the shifted multiplicand in the vectors where each multiplier bit is set.
+                a, b = operand(lhs), operand(rhs)
+                planes = [0] * width
+                for i, p in enumerate(b):
+                    if p:
+                        planes = self._add(planes, [0] * i + [q & p for q in a[:width-i]], 0)
+                return planes
+            if op in ("&", "|", "^"):
+                a, b = operand(lhs), operand(rhs)
+                if op == "&":
+                    return [x & y for x, y in zip(a, b)]
+                if op == "|":
+                    return [x | y for x, y in zip(a, b)]
+                return [x ^ y for x, y in zip(a, b)]
+            if op in ("<<", ">>"):
+                return self._shift(op, lhs, rhs, width)
+            if op in ("==", "!="):
+                w = max(len(lhs), len(rhs)) + 1
+                a, b = operand(lhs, w), operand(rhs, w)
+                matched = self._all
+                for x, y in zip(a, b):
+                    matched &= ~(x ^ y)
+                matched &= self._all
+                return [matched if op == "==" else ~matched & self._all]
+            if op in ("<", "<=", ">", ">="):
+                # Both operands fit in w-1 signed bits, so the sign of their difference in w bits is exact.
+                w = max(len(lhs), len(rhs)) + 2
+                a, b = operand(lhs, w), operand(rhs, w)
+                if op in (">", "<="):
+                    a, b = b, a
+                less = self._sub(a, b)[-1]
+                return [less if op in ("<", ">") else ~less & self._all]
+        elif len(operands) == 3 and op == "m":
+            sel, val1, val0 = operands
+            s = self._any(self._rhs(sel))
+            return [(x & s) | (y & ~s) for x, y in zip(operand(val1), operand(val0))]
+        raise NotImplementedError("operator '" + op + "' is not supported")
+
+    def _any(self, planes):
+        matched = 0
+        for p in planes:
+            matched |= p
+        return matched
+
+    def _add(self, a, b, carry):
+        planes = []
+        for x, y in zip(a, b):
+            half = x ^ y
+            planes.append(half ^ carry)
+            carry = (x & y) | (half & carry)
+        return planes
+
+    def _sub(self, a, b):
+        return self._add(a, [~p & self._all for p in b], self._all)
+
+    def _shift(self, op, lhs, rhs, width):
+        source = self._rhs(lhs)
+        fill = source[-1] if lhs.shape().signed and source else 0
+        amount = self._rhs(rhs)
+        planes = [0] * width
+        for k in range(1 << len(rhs)):
+            selected = self._equals(amount, k)
+            if not selected:
+                continue
+            for b in range(width):
+                i = b - k if op == "<<" else b + k
+                if 0 <= i < len(source):
+                    p = source[i]
+                elif i >= len(source):
+                    p = fill
+                else:
+                    p = 0
+                planes[b] |= p & selected
+        return planes
+
+# Pack a list of values, one per test vector, into planes.
+def packPlanes(values, width: int):
+    columns = list(zip(*(format(v & ((1 << width) - 1), "0" + str(width) + "b") for v in values)))
+    return [int("".join(reversed(columns[width-1-b])), 2) for b in range(width)]
+
+# Unpack planes into a list of values, one per test vector.
+def unpackPlanes(planes, count: int, signed: bool = False):
+    if not planes:
+        return [0] * count
+    rows = zip(*(format(p, "0" + str(count) + "b") for p in reversed(planes)))
+    values = [int("".join(r), 2) for r in rows][::-1]
+    if signed:
+        sign = 1 << (len(planes) - 1)
+        values = [v - (sign << 1) if v & sign else v for v in values]
+    return values
+
+# Planes enumerating every combination of inputs of the given widths. Returns the number of test vectors and the
+# planes of each input, where input i takes its own field of the vector index, starting from the low bits.
+def exhaustivePlanes(widths):
+    total = sum(widths)
+    count = 1 << total
+    planes = []
+    for b in range(total):
+        run = 1 << b
+        block = ((1 << run) - 1) << run
+        planes.append(block * (((1 << count) - 1) // ((1 << (2*run)) - 1)))
+    result = []
+    offset = 0
+    for w in widths:
+        result.append(planes[offset:offset+w])
+        offset += w
+    return count, result
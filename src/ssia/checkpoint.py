@@ -0,0 +1,165 @@
+from amaranth import *
+from amaranth.hdl import *
+from amaranth.back import verilog
+from amaranth.lib.data import StructLayout
+
+# CheckpointFile holds copies of the latched stack state so that the processor can issue past unresolved branches.
+# Checkpoints are allocated and released in program order, so they are kept in a circular buffer of checkpoint_count
+# entries. Restoring a checkpoint discards it along with every younger checkpoint. Held copies continue to observe
+# writebacks, so a restored state never contains a tag whose result has already retired.
+#
+# Only the TopStack and MidStack regions are captured. Regions below MidStack are owned by the memory side, which
+# must restore its own stack pointer alongside a restore.
+class CheckpointFile(Elaboratable):
+    # register_width: the width in bits of individual stack entries
+    # stack_depth: the number of stack entries captured by each checkpoint
+    # checkpoint_count: the maximum number of outstanding checkpoints
+    # tag_width: the number of bits to use to tag unretired instructions
+    # writeback_count: the number of values that can be retired in a single cycle
+    def __init__(self, register_width: int, stack_depth: int, checkpoint_count: int, tag_width: int, writeback_count: int):
+        self._stack_depth = stack_depth
+        self._checkpoint_count = checkpoint_count
+        self._tag_width = tag_width
+        self._register_layout = StructLayout({
+            "val": register_width,
+            "tag": tag_width,
+        })
+
+        # in_state: the register+tag of each stack slot to be captured
+        self.in_state = [Signal(self._register_layout, name="in_state_"+str(x)) for x in range(stack_depth)]
+
+        # in_capture: capture in_state as a new checkpoint. Ignored while out_full is set or during a restore.
+        self.in_capture = Signal(1, name="in_capture")
+
+        # out_capture_id: the checkpoint that in_state is captured into when in_capture is set
+        self.out_capture_id = Signal(range(checkpoint_count), name="out_capture_id")
+
+        # out_full: all checkpoints are outstanding, so no further captures are possible
+        self.out_full = Signal(1, name="out_full")
+
+        # in_release: release the oldest outstanding checkpoint, e.g. when its branch resolves as predicted
+        self.in_release = Signal(1, name="in_release")
+
+        # in_restore: restore checkpoint in_restore_id, releasing it and all younger checkpoints. Ignored unless
+        # in_restore_id is outstanding.
+        self.in_restore = Signal(1, name="in_restore")
+        self.in_restore_id = Signal(range(checkpoint_count), name="in_restore_id")
+
+        # out_restore: in_restore is applied this cycle, so the stacks must latch out_restore_state
+        self.out_restore = Signal(1, name="out_restore")
+
+        # out_restore_state: the contents of checkpoint in_restore_id, including this cycle's writebacks
+        self.out_restore_state = [Signal(self._register_layout, name="out_restore_state_"+str(x)) for x in range(stack_depth)]
+
+        # out_tag_present: one bit per tag value, set when an outstanding checkpoint holds an entry with that tag
+        self.out_tag_present = Signal(2**tag_width, name="out_tag_present")
+
+        # in_writeback: writeback_count register+tag which are tag-matched and written back each cycle
+        self.in_writeback = [Signal(self._register_layout, name="in_cdb_"+str(x)) for x in range(writeback_count)]
+
+    def elaborate(self, platform):
+        m = Module()
+
+        # Checkpoints is a N x D grid of latched copies of the stack.
+        checkpoints = [[Signal(self._register_layout, name="checkpoint_"+str(y)+"_"+str(x)) for x in range(self._stack_depth)] for y in range(self._checkpoint_count)]
+
+        head = Signal(range(self._checkpoint_count), name="head")
+        tail = Signal(range(self._checkpoint_count), name="tail")
+        count = Signal(range(self._checkpoint_count+1), name="count")
+        self.checkpoints = checkpoints
+        self.counters = {"head": head, "tail": tail, "count": count}
+
+        def next_id(id):
+            return Mux(id == self._checkpoint_count-1, 0, id+1)
+
+        def age(id):
+            # The number of checkpoints older than id, which is outstanding if this is less than count.
+            return Mux(id >= head, id - head, id + self._checkpoint_count - head)
+
+        m.d.comb += self.out_restore.eq(self.in_restore & (age(self.in_restore_id) < count))
+
+        # Apply writebacks to every held copy, whether or not it is outstanding.
+        patched = []
+        for n in range(self._checkpoint_count):
+            patched_copy = []
+            for d in range(self._stack_depth):
+                writeback_val = checkpoints[n][d]
+                for c in self.in_writeback:
+                    writeback_matched = (c['tag'] != 0) & (c['tag'] == checkpoints[n][d]['tag'])
+                    writeback_val = Mux(writeback_matched, Cat(c['val'], Const(1, self._tag_width)), writeback_val)
+                patched_slot = Signal(self._register_layout, name="patched_"+str(n)+"_"+str(d))
+                m.d.comb += patched_slot.eq(writeback_val)
+                patched_copy.append(patched_slot)
+            patched.append(patched_copy)
+
+        for d in range(self._stack_depth):
+            restore_mux = Array([patched[n][d] for n in range(self._checkpoint_count)])
+            m.d.comb += self.out_restore_state[d].eq(restore_mux[self.in_restore_id])
+
+        m.d.comb += self.out_full.eq(count == self._checkpoint_count)
+        m.d.comb += self.out_capture_id.eq(tail)
+
+        for n in range(self._checkpoint_count):
+            for d in range(self._stack_depth):
+                with m.If(self.in_capture & ~self.out_full & ~self.out_restore & (tail == n)):
+                    m.d.sync += checkpoints[n][d].eq(self.in_state[d])
+                with m.Else():
+                    m.d.sync += checkpoints[n][d].eq(patched[n][d])
+
+        with m.If(self.out_restore):
+            # Only checkpoints older than the restored one remain outstanding.
+            remaining = age(self.in_restore_id)
+            release = self.in_release & (remaining != 0)
+            m.d.sync += tail.eq(self.in_restore_id)
+            m.d.sync += count.eq(remaining - release)
+            with m.If(release):
+                m.d.sync += head.eq(next_id(head))
+        with m.Else():
+            capture = self.in_capture & ~self.out_full
+            release = self.in_release & (count != 0)
+            m.d.sync += count.eq(count + capture - release)
+            with m.If(capture):
+                m.d.sync += tail.eq(next_id(tail))
+            with m.If(release):
+                m.d.sync += head.eq(next_id(head))
+
+        # Decode the tag of every slot of the outstanding checkpoints for out_tag_present.
+        tag_present = 0
+        for n in range(self._checkpoint_count):
+            outstanding = age(Const(n, len(head))) < count
+            for d in range(self._stack_depth):
+                tag_present = tag_present | (outstanding << checkpoints[n][d]['tag'])
+        m.d.comb += self.out_tag_present.eq(tag_present)
+
+        return m
+
+    # Testing helpers
+    def zeroAllInputs(self):
+        for i in self.in_state:
+            yield i.eq(0)
+        yield self.in_capture.eq(0)
+        yield self.in_release.eq(0)
+        yield self.in_restore.eq(0)
+        yield self.in_restore_id.eq(0)
+        for i in self.in_writeback:
+            yield i.eq(0)
+
+if __name__ == '__main__':
+    checkpoint_file = CheckpointFile(register_width=32, stack_depth=8, checkpoint_count=4, tag_width=3, writeback_count=1)
+    with open('checkpoint.v', 'w') as f:
+        def asValue(v):
+            return v.as_value()
+        f.write(verilog.convert(checkpoint_file,
+                                ports = [
+                                         *map(asValue, checkpoint_file.in_state),
+                                         checkpoint_file.in_capture,
+                                         checkpoint_file.out_capture_id,
+                                         checkpoint_file.out_full,
+                                         checkpoint_file.in_release,
+                                         checkpoint_file.in_restore,
+                                         checkpoint_file.in_restore_id,
+                                         checkpoint_file.out_restore,
+                                         *map(asValue, checkpoint_file.out_restore_state),
+                                         checkpoint_file.out_tag_present,
+                                         *map(asValue, checkpoint_file.in_writeback),
+                                        ]))
@@ -3,6 +3,40 @@ from amaranth.hdl import *
 from amaranth.back import verilog
 from amaranth.lib.coding import PriorityEncoder
 
+# LaneIndexer finds the lane index of each enabled lane, in lane order. lane_index[i] is the index of the i-th
+# enabled lane, and lane_none[i] is set when fewer than i+1 lanes are enabled. It is shared by Compactor and Expander
+# so that packing and unpacking agree on lane order.
+class LaneIndexer(Elaboratable):
+    # lane_count: the number of enabled lanes to find, up to count. Defaults to count.
+    def __init__(self, count: int, lane_count: int = None):
+        self._count = count
+        self._lane_count = count if lane_count is None else lane_count
+        assert 1 <= self._lane_count <= count
+        self.input_en = Signal(count, name="input_en")
+        self.lane_index = [Signal(range(count), name="lane_index_"+str(x)) for x in range(self._lane_count)]
+        self.lane_none = [Signal(1, name="lane_none_"+str(x)) for x in range(self._lane_count)]
+        # remaining_en: input_en with the lanes found cleared, from which a further LaneIndexer can continue
+        self.remaining_en = Signal(count, name="remaining_en")
+
+    def elaborate(self, platform):
+        m = Module()
+        self.priority_encoders = [PriorityEncoder(self._count) for x in range(self._lane_count)]
+        m.submodules += self.priority_encoders
+
+        self.concat_en = [Signal(self._count, name = "concat_en_"+str(x)) for x in range(self._lane_count)]
+
+        for i in range(self._lane_count):
+            if i == 0:
+                m.d.comb += self.concat_en[0].eq(self.input_en)
+            else:
+                m.d.comb += self.concat_en[i].eq(self.concat_en[i-1] & (self.concat_en[i-1]-1))
+            m.d.comb += self.priority_encoders[i].i.eq(self.concat_en[i])
+            m.d.comb += self.lane_index[i].eq(self.priority_encoders[i].o)
+            m.d.comb += self.lane_none[i].eq(self.priority_encoders[i].n)
+        last_en = self.concat_en[-1]
+        m.d.comb += self.remaining_en.eq(last_en & (last_en-1))
+        return m
+
 class Compactor(Elaboratable):
     def __init__(self, width: int, count: int):
         self._width = width
@@ -15,26 +49,30 @@ class Compactor(Elaboratable):
 
     def elaborate(self, platform):
         m = Module()
-        self.priority_encoders = [PriorityEncoder(self._count) for x in range(self._count)]
-        m.submodules += self.priority_encoders
+        self.lane_indexer = LaneIndexer(self._count)
+        m.submodules += self.lane_indexer
 
-        self.concat_en = [Signal(self._count, name = "concat_en_"+str(x)) for x in range(self._count)]
         self.parts = [Signal(self._width, name="part_"+str(x)) for x in range(self._count)]
 
         array = Array(self.input)
         array.append(0)
+        m.d.comb += self.lane_indexer.input_en.eq(Cat(*self.input_en))
         for i in range(self._count):
-            if i == 0:
-                m.d.comb += self.concat_en[0].eq(Cat(*self.input_en))
-            else:
-                m.d.comb += self.concat_en[i].eq(self.concat_en[i-1] & (self.concat_en[i-1]-1))
-            m.d.comb += self.priority_encoders[i].i.eq(self.concat_en[i])
-            m.d.comb += self.parts[i].eq(array[Cat(self.priority_encoders[i].o, self.priority_encoders[i].n)])
+            m.d.comb += self.parts[i].eq(array[Cat(self.lane_indexer.lane_index[i], self.lane_indexer.lane_none[i])])
         m.d.comb += self.output_val.eq(Cat(*self.parts))
         m.d.comb += self.output_count.eq(sum(self.input_en))
         return m
     
     # Testing helpers
+    def activityGroups(self, prefix: str = ""):
+        # Groups for the lane selection and the gathered parts, which are only available after elaboration.
+        groups = {}
+        for i in range(self._count):
+            groups[prefix+"concat_en_"+str(i)] = [self.lane_indexer.concat_en[i]]
+            groups[prefix+"part_"+str(i)] = [self.parts[i]]
+        groups[prefix+"output"] = [self.output_val, self.output_count]
+        return groups
+
     def zeroAllInputs(self):
         for i in self.input:
             yield i.eq(0)
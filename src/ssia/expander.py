@@ -0,0 +1,50 @@
+from amaranth import *
+from amaranth.hdl import *
+from amaranth.back import verilog
+from ssia.compactor import LaneIndexer
+
+# Expander is the inverse of Compactor. It scatters a densely packed vector back out to the enabled lanes, so that
+# the i-th part of input_val is routed to the i-th enabled lane. Disabled lanes output zero.
+class Expander(Elaboratable):
+    def __init__(self, width: int, count: int):
+        self._width = width
+        self._count = count
+        self.input_val = Signal(count*width, name="input_val")
+        self.input_en = [Signal(1, name="input_en_"+str(x)) for x in range(count)]
+        self.output = [Signal(width, name="output_"+str(x)) for x in range(count)]
+        self.output_count = Signal(range(count+1), name="output_count")
+
+    def elaborate(self, platform):
+        m = Module()
+        self.lane_indexer = LaneIndexer(self._count)
+        m.submodules += self.lane_indexer
+
+        self.parts = [self.input_val[x*self._width:(x+1)*self._width] for x in range(self._count)]
+
+        m.d.comb += self.lane_indexer.input_en.eq(Cat(*self.input_en))
+        for lane in range(self._count):
+            # The i-th enabled lane is never below lane i, so only the first lane+1 parts can land here.
+            lane_val = 0
+            for i in range(lane+1):
+                lane_matched = ~self.lane_indexer.lane_none[i] & (self.lane_indexer.lane_index[i] == lane)
+                lane_val = lane_val | Mux(lane_matched, self.parts[i], 0)
+            m.d.comb += self.output[lane].eq(lane_val)
+        m.d.comb += self.output_count.eq(sum(self.input_en))
+        return m
+
+    # Testing helpers
+    def zeroAllInputs(self):
+        yield self.input_val.eq(0)
+        for i in self.input_en:
+            yield i.eq(0)
+
+if __name__ == '__main__':
+    expander = Expander(width=32, count=4)
+    with open('expander.v', 'w') as f:
+        f.write(verilog.convert(expander,
+                                ports = [
+                                         expander.input_val,
+                                         *expander.input_en,
+                                         *expander.output,
+                                         expander.output_count,
+                                        ]))
@@ -0,0 +1,198 @@
+from amaranth import *
+from amaranth.hdl import *
+from amaranth.back import verilog
+from amaranth.sim import Settle
+from amaranth.lib.data import StructLayout
+from ssia.mid_stack import MidStackCommand
+
+# FillPrefetcher sits below the MidStack and holds the top of the memory stack in a small buffer, so that a POP can
+# be fed from in_mem in the same cycle even though the memory below has a read latency of several cycles. Entries
+# spilled by a PUSH are taken into the buffer, and the buffer exchanges entries with memory at its bottom: it
+# requests fills while it is below its target level and evicts entries while it is nearly full.
+#
+# The target level is predicted from the recent pop rate: the peak net number of pops per cycle over the last
+# history cycles, multiplied by the number of cycles from a fill request until the entry can be popped. That many
+# entries are enough to keep feeding in_mem at every stage without stalling while a requested fill is in flight.
+#
+# Memory is treated as a stack with one request per cycle. A fill requested in cycle t arrives on in_fill in cycle
+# t+fill_latency, and fills arrive in the order they were requested. Evictions are only made with no fills in
+# flight, so that the memory stack stays in order.
+class FillPrefetcher(Elaboratable):
+    # buffer_depth: the number of entries held in the buffer
+    # fill_latency: the number of cycles from out_fill_request to in_fill_valid
+    # history: the number of cycles of in_stack_pushpop history used to predict the pop rate
+    def __init__(self, register_width: int, buffer_depth: int, issue_stages: int, tag_width: int, fill_latency: int, history: int = 8):
+        assert buffer_depth >= 2*issue_stages
+        assert fill_latency >= 1 and history >= 1
+        self._buffer_depth = buffer_depth
+        self._issue_stages = issue_stages
+        self._fill_latency = fill_latency
+        self._history = history
+        self._register_layout = StructLayout({
+            "val": register_width,
+            "tag": tag_width,
+        })
+
+        # in_stack_pushpop: the nop/pop/push command of each stage, as given to the MidStack
+        self.in_stack_pushpop = [Signal(MidStackCommand, name="in_pushpop_"+str(s)) for s in range(issue_stages)]
+
+        # in_spill: the MidStack's out_bottom for each stage, taken into the buffer by a PUSH
+        self.in_spill = [Signal(self._register_layout, name="in_spill_"+str(s)) for s in range(issue_stages)]
+
+        # out_mem: the top entry of the buffer at each stage, to be given to the MidStack's in_mem
+        self.out_mem = [Signal(self._register_layout, name="out_mem_"+str(s)) for s in range(issue_stages)]
+
+        # out_stall: set when a stage would pop from an empty buffer or push into a full one. The buffer is then left
+        # unchanged, and the stages must be replayed in a later cycle.
+        self.out_stall = Signal(1, name="out_stall")
+
+        # out_fill_request: request the next entry from the top of memory
+        self.out_fill_request = Signal(1, name="out_fill_request")
+
+        # in_fill/in_fill_valid: a requested entry arriving from memory
+        self.in_fill = Signal(self._register_layout, name="in_fill")
+        self.in_fill_valid = Signal(1, name="in_fill_valid")
+
+        # out_evict/out_evict_valid: the bottom entry of the buffer, to be pushed onto the top of memory
+        self.out_evict = Signal(self._register_layout, name="out_evict")
+        self.out_evict_valid = Signal(1, name="out_evict_valid")
+
+        # out_count: the number of entries held in the buffer
+        # out_in_flight: the number of fills requested that have not yet arrived
+        # out_target: the predicted number of entries needed to cover the fill latency
+        self.out_count = Signal(range(buffer_depth+1), name="out_count")
+        self.out_in_flight = Signal(range(buffer_depth+1), name="out_in_flight")
+        self.out_target = Signal(range(buffer_depth+1), name="out_target")
+
+    def elaborate(self, platform):
+        m = Module()
+
+        # As in the MidStack, buffers is an (S+1) x D grid of signals and counts holds the occupancy at each stage.
+        # Only the first stage is latched.
+        buffers = [[Signal(self._register_layout, name="buffer_"+str(y)+"_"+str(x)) for x in range(self._buffer_depth)] for y in range(self._issue_stages+1)]
+        counts = [Signal(range(self._buffer_depth+1), name="count_"+str(y)) for y in range(self._issue_stages+1)]
+        in_flight = Signal(range(self._buffer_depth+1), name="in_flight")
+        self.buffers = buffers
+
+        stalls = []
+        for stage in range(self._issue_stages):
+            m.d.comb += self.out_mem[stage].eq(buffers[stage][0])
+            with m.Switch(self.in_stack_pushpop[stage]):
+                with m.Case(MidStackCommand.POP):
+                    for d in range(self._buffer_depth):
+                        m.d.comb += buffers[stage+1][d].eq(buffers[stage][d+1] if d+1 < self._buffer_depth else 0)
+                    m.d.comb += counts[stage+1].eq(counts[stage] - 1)
+                with m.Case(MidStackCommand.PUSH):
+                    for d in range(self._buffer_depth):
+                        m.d.comb += buffers[stage+1][d].eq(buffers[stage][d-1] if d > 0 else self.in_spill[stage])
+                    m.d.comb += counts[stage+1].eq(counts[stage] + 1)
+                with m.Default():
+                    for d in range(self._buffer_depth):
+                        m.d.comb += buffers[stage+1][d].eq(buffers[stage][d])
+                    m.d.comb += counts[stage+1].eq(counts[stage])
+
+            # Slots below the held entries are reserved for the fills in flight.
+            pop_stall = (self.in_stack_pushpop[stage] == MidStackCommand.POP) & (counts[stage] == 0)
+            push_stall = (self.in_stack_pushpop[stage] == MidStackCommand.PUSH) & (counts[stage] + in_flight >= self._buffer_depth)
+            stalls.append(pop_stall | push_stall)
+        m.d.comb += self.out_stall.eq(Cat(*stalls).any())
+
+        # A stall leaves the buffer as it was at the start of the cycle.
+        buffer = [Mux(self.out_stall, buffers[0][d], buffers[self._issue_stages][d]) for d in range(self._buffer_depth)]
+        count = Mux(self.out_stall, counts[0], counts[self._issue_stages])
+
+        # Predict the pop rate from the net pops of each recent cycle, counting replayed cycles as no movement.
+        net_pops = Signal(range(-self._issue_stages, self._issue_stages+1), name="net_pops")
+        m.d.comb += net_pops.eq(sum((x == MidStackCommand.POP) - (x == MidStackCommand.PUSH) for x in self.in_stack_pushpop))
+        recent = [Signal(range(self._issue_stages+1), name="recent_"+str(x)) for x in range(self._history)]
+        m.d.sync += recent[0].eq(Mux(self.out_stall | (net_pops < 0), 0, net_pops))
+        for x in range(1, self._history):
+            m.d.sync += recent[x].eq(recent[x-1])
+        peak = 0
+        for x in recent:
+            peak = Mux(x > peak, x, peak)
+
+        # A fill can be popped in the cycle after it arrives. Keep room for a full cycle of pushes above the target.
+        high_level = self._buffer_depth - self._issue_stages
+        target = peak * (self._fill_latency+1)
+        m.d.comb += self.out_target.eq(Mux(target > high_level, high_level, target))
+
+        # Evict from the bottom of the buffer when it is nearly full, otherwise fill it up to the target.
+        m.d.comb += self.out_evict_valid.eq((count > high_level) & (in_flight == 0))
+        m.d.comb += self.out_evict.eq(Array(buffer)[count-1])
+        m.d.comb += self.out_fill_request.eq(~self.out_evict_valid & (count + in_flight < self.out_target))
+
+        # An arriving fill lands in the slot just below the held entries.
+        for d in range(self._buffer_depth):
+            m.d.sync += buffers[0][d].eq(Mux(self.in_fill_valid & (count == d), self.in_fill, buffer[d]))
+        m.d.sync += counts[0].eq(count + self.in_fill_valid - self.out_evict_valid)
+        m.d.sync += in_flight.eq(in_flight + self.out_fill_request - self.in_fill_valid)
+
+        m.d.comb += self.out_count.eq(counts[0])
+        m.d.comb += self.out_in_flight.eq(in_flight)
+
+        return m
+
+    # Testing helpers
+    def zeroAllInputs(self):
+        for i in self.in_stack_pushpop:
+            yield i.eq(0)
+        for i in self.in_spill:
+            yield i.eq(0)
+        yield self.in_fill.eq(0)
+        yield self.in_fill_valid.eq(0)
+
+# LatencyMemory models the memory stack below a FillPrefetcher in simulation. Call step() once per cycle, after
+# driving the prefetcher's other inputs and before the clock edge. Entries are (val, tag) tuples, top of stack last.
+class LatencyMemory:
+    def __init__(self, prefetcher: FillPrefetcher, latency: int, stack=()):
+        self._prefetcher = prefetcher
+        self._latency = latency
+        self.stack = list(stack)
+        self._responses = []
+        self._cycle = 0
+        self.fills = 0
+        self.evictions = 0
+
+    def step(self):
+        p = self._prefetcher
+        due = [x for x in self._responses if x[0] == self._cycle]
+        if due:
+            self._responses.remove(due[0])
+            val, tag = due[0][1]
+            yield p.in_fill.eq(Cat(Const(val, len(p.in_fill['val'])), Const(tag, len(p.in_fill['tag']))))
+            yield p.in_fill_valid.eq(1)
+        else:
+            yield p.in_fill_valid.eq(0)
+        yield Settle()
+
+        # Requests are served from the stack when they are made, and the data is returned after the latency.
+        if (yield p.out_fill_request):
+            entry = self.stack.pop() if self.stack else (0, 0)
+            self._responses.append((self._cycle + self._latency, entry))
+            self.fills += 1
+        if (yield p.out_evict_valid):
+            self.stack.append(((yield p.out_evict['val']), (yield p.out_evict['tag'])))
+            self.evictions += 1
+        self._cycle += 1
+
+if __name__ == '__main__':
+    fill_prefetcher = FillPrefetcher(register_width=32, buffer_depth=8, issue_stages=4, tag_width=3, fill_latency=4)
+    with open('fill_prefetcher.v', 'w') as f:
+        def asValue(v):
+            return v.as_value()
+        f.write(verilog.convert(fill_prefetcher,
+                                ports = [
+                                         *fill_prefetcher.in_stack_pushpop,
+                                         *map(asValue, fill_prefetcher.in_spill),
+                                         *map(asValue, fill_prefetcher.out_mem),
+                                         fill_prefetcher.out_stall,
+                                         fill_prefetcher.out_fill_request,
+                                         fill_prefetcher.in_fill.as_value(),
+                                         fill_prefetcher.in_fill_valid,
+                                         fill_prefetcher.out_evict.as_value(),
+                                         fill_prefetcher.out_evict_valid,
+                                         fill_prefetcher.out_count,
+                                         fill_prefetcher.out_in_flight,
+                                         fill_prefetcher.out_target,
+                                        ]))
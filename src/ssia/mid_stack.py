@@ -12,10 +12,25 @@ class MidStackCommand(Enum):
 # MidStack holds the generation of data on the processor stack immediately below the TopStack. Like TopStack it
 # supports deferred writebacks, but unlike TopStack it only supports stack movement of the form NOP/POP/PUSH.
 # Because of this, its area is linear with depth in contrast to TopStack. Stack regions below this no longer support
-# deferred writebacks, so the processor will need to stall until writebacks can drain from this region as needed.
+# deferred writebacks, so the processor will need to stall until writebacks can drain from this region as needed,
+# unless a WritebackTable records the tagged entries that spill below it.
+#
+# With move_width greater than one, a POP or PUSH can move up to move_width entries in a single stage, so that spill
+# and fill bandwidth can keep up with the issue width. Each multi-entry port then has move_width lanes, where lane 0
+# is the single-entry port. Lanes are ordered the same way in every port: pushed and spilled lanes from the deepest
+# entry up, and pulled-up lanes from the shallowest entry down.
 class MidStack(Elaboratable):
-    def __init__(self, register_width: int, stack_depth: int, issue_stages: int, tag_width: int, writeback_count: int):
+    # move_width: the maximum number of entries a POP or PUSH can move in a single stage
+    # value_lanes: the number of independent lanes to slice the val field into, each shifted by its own copy of the
+    #   pushpop and extra controls, see TopStack
+    def __init__(self, register_width: int, stack_depth: int, issue_stages: int, tag_width: int, writeback_count: int,
+                 move_width: int = 1, value_lanes: int = 1):
+        assert 1 <= move_width <= stack_depth
+        assert 1 <= value_lanes <= register_width
         self._stack_depth = stack_depth
+        self._register_width = register_width
+        self._value_lanes = value_lanes
+        self._move_width = move_width
         self._tag_width = tag_width
         self._issue_stages = issue_stages
         self._register_layout = StructLayout({
@@ -33,6 +48,9 @@ class MidStack(Elaboratable):
         # 0b00 encodes no change, 0b10 encodes a pop, and 0b10 encodes a push.
         self.in_stack_pushpop = [Signal(MidStackCommand, name="in_pushpop_"+str(s)) for s in range(issue_stages)]
 
+        # in_extra: the number of entries a POP or PUSH moves beyond the first, up to move_width-1.
+        self.in_stack_extra = [Signal(range(move_width), name="in_extra_"+str(s)) for s in range(issue_stages)]
+
         # out_peek: one register+tag per issue stage that is the top-most entries in the stack
         self.out_peek = [Signal(self._register_layout, name = "out_peek_"+str(y)) for y in range(issue_stages)]
 
@@ -42,64 +60,132 @@ class MidStack(Elaboratable):
         # in_writeback: writeback_count register+tag which are tag-matched and written back each cycle
         self.in_writeback = [Signal(self._register_layout, name="in_cdb_"+str(x)) for x in range(writeback_count)]
 
+        # Lanes of the multi-entry ports. in_push_lanes[s][0] is in_push[s], and so on.
+        # in_push_lanes: pushed entries, where lane i is pushed to slot k-1-i by a PUSH of k entries
+        # in_mem_lanes: pulled-up entries, where lane i is pulled up to slot D-k+i by a POP of k entries
+        # out_peek_lanes: lane i is stack slot i
+        # out_bottom_lanes: lane i is stack slot D-1-i, which is spilled by a PUSH of more than i entries
+        self.in_push_lanes = [[self.in_push[x]] + [Signal(self._register_layout, name="in_push_"+str(x)+"_"+str(y)) for y in range(1, move_width)] for x in range(issue_stages)]
+        self.in_mem_lanes = [[self.in_mem[x]] + [Signal(self._register_layout, name="in_mem_"+str(x)+"_"+str(y)) for y in range(1, move_width)] for x in range(issue_stages)]
+        self.out_peek_lanes = [[self.out_peek[x]] + [Signal(self._register_layout, name="out_peek_"+str(x)+"_"+str(y)) for y in range(1, move_width)] for x in range(issue_stages)]
+        self.out_bottom_lanes = [[self.out_bottom[x]] + [Signal(self._register_layout, name="out_bottom"+str(x)+"_"+str(y)) for y in range(1, move_width)] for x in range(issue_stages)]
+
+        # out_next_state: the register+tag of each stack slot that will be latched at the next clock
+        self.out_next_state = [Signal(self._register_layout, name="out_next_state_"+str(x)) for x in range(stack_depth)]
+
+        # in_restore: when set, the latched stack is replaced by in_restore_state instead of the result of this cycle
+        self.in_restore = Signal(1, name="in_restore")
+        self.in_restore_state = [Signal(self._register_layout, name="in_restore_state_"+str(x)) for x in range(stack_depth)]
+
+        # out_slot_we: one write enable per stack slot, set when the latched slot changes by construction, see TopStack
+        self.out_slot_we = [Signal(1, name="out_slot_we_"+str(x)) for x in range(stack_depth)]
+
+        # out_tag_present: one bit per tag value, set when a latched slot holds an entry with that tag, see TopStack
+        self.out_tag_present = Signal(2**tag_width, name="out_tag_present")
+
     def elaborate(self, platform):
         m = Module()
 
         # Stacks is a (S+1) x D grid of signals. The outer dimension is time, the inner dimension
         # is stack depth. Only the first stage (time = 0) is latched.
         stacks = [[Signal(self._register_layout, name="stack_"+str(y)+"_"+str(x)) for x in range(self._stack_depth)] for y in range(self._issue_stages+1)]
+        self.stacks = stacks
+
+        # Origins tracks which latched slot each slot of the stacks grid holds, alongside the values. Origin
+        # stack_depth marks an entry from in_push or in_mem.
+        origins = [[Signal(range(self._stack_depth+1), name="origin_"+str(y)+"_"+str(x)) for x in range(self._stack_depth)] for y in range(self._issue_stages+1)]
+        for d in range(self._stack_depth):
+            m.d.comb += origins[0][d].eq(d)
 
         for stage in range(self._issue_stages):
-            # The top slot can be any feed-forward, one down, or a new pushed value.
-            with m.Switch(self.in_stack_pushpop[stage]):
-                with m.Case(MidStackCommand.POP):
-                    m.d.comb += stacks[stage+1][0].eq(stacks[stage][1])
-                with m.Case(MidStackCommand.PUSH):
-                    m.d.comb += stacks[stage+1][0].eq(self.in_push[stage])
-                with m.Default():
-                    m.d.comb += stacks[stage+1][0].eq(stacks[stage][0])
-
-            first_mux = Array([stacks[stage][0], stacks[stage][1], Cat(self.in_push[stage], Const(1, self._tag_width))])
-            m.d.comb += stacks[stage+1][0].eq(first_mux[self.in_stack_pushpop[stage]])
-
-            # Intermediary slots can be either feed-forward, one below, or one above.
-            for d in range(self._stack_depth-2):
-                with m.Switch(self.in_stack_pushpop[stage]):
-                    with m.Case(MidStackCommand.POP):
-                        m.d.comb += stacks[stage+1][d+1].eq(stacks[stage][d+2])
-                    with m.Case(MidStackCommand.PUSH):
-                        m.d.comb += stacks[stage+1][d+1].eq(stacks[stage][d])
-                    with m.Default():
-                        m.d.comb += stacks[stage+1][d+1].eq(stacks[stage][d+1])
-
-            # The bottom slot can be either feed-forward, a new value, or one above.
-            with m.Switch(self.in_stack_pushpop[stage]):
-                    with m.Case(MidStackCommand.POP):
-                        m.d.comb += stacks[stage+1][self._stack_depth-1].eq(self.in_mem[stage])
-                    with m.Case(MidStackCommand.PUSH):
-                        m.d.comb += stacks[stage+1][self._stack_depth-1].eq(stacks[stage][self._stack_depth-2])
-                    with m.Default():
-                        m.d.comb += stacks[stage+1][self._stack_depth-1].eq(stacks[stage][self._stack_depth-1])
-
-            # Expose the top stack entry at each stage as a "peek" value.
-            m.d.comb += self.out_peek[stage].eq(stacks[stage][0])
-
-            # Expose the bottom entry at each stage to the tidal stack.
-            m.d.comb += self.out_bottom[stage].eq(stacks[stage][self._stack_depth-1])
+            # Each stage is elaborated as its own submodule, see TopStack.
+            stage_m = Module()
+            m.submodules["stage_"+str(stage)] = stage_m
+
+            # Each slot can be feed-forward, k below for a POP of k entries, or k above for a PUSH of k entries.
+            # Slots that would reach past the ends of the stack take pulled-up or pushed lanes instead, and an
+            # in_extra beyond move_width-1 selects a zero entry. Each row is assigned as a single statement, so that
+            # it forms a single group for the RTLIL backend.
+            def shift(pushpop, extra, slots, mem, push):
+                row = []
+                for d in range(self._stack_depth):
+                    popped, pushed = 0, 0
+                    for k in range(1, self._move_width+1):
+                        if d+k < self._stack_depth:
+                            popped = Mux(extra == k-1, slots[d+k], popped)
+                        else:
+                            popped = Mux(extra == k-1, mem[d+k-self._stack_depth], popped)
+                        if d >= k:
+                            pushed = Mux(extra == k-1, slots[d-k], pushed)
+                        else:
+                            pushed = Mux(extra == k-1, push[k-1-d], pushed)
+                    row.append(Mux(pushpop == MidStackCommand.POP, popped,
+                                   Mux(pushpop == MidStackCommand.PUSH, pushed, slots[d])))
+                return row
+
+            for part, pushpop, extra in self.elaborateLanes(stage_m, stage):
+                row = shift(pushpop, extra, [*map(part, stacks[stage])], [*map(part, self.in_mem_lanes[stage])], [*map(part, self.in_push_lanes[stage])])
+                stage_m.d.comb += Cat(*map(part, stacks[stage+1])).eq(Cat(*row))
+            origin_row = shift(self.in_stack_pushpop[stage], self.in_stack_extra[stage], origins[stage], [self._stack_depth]*self._move_width, [self._stack_depth]*self._move_width)
+            stage_m.d.comb += Cat(*origins[stage+1]).eq(Cat(*origin_row))
+
+            # Expose the top stack entries at each stage as "peek" values.
+            for i in range(self._move_width):
+                stage_m.d.comb += self.out_peek_lanes[stage][i].eq(stacks[stage][i])
+
+            # Expose the bottom entries at each stage to the tidal stack.
+            for i in range(self._move_width):
+                stage_m.d.comb += self.out_bottom_lanes[stage][i].eq(stacks[stage][self._stack_depth-1-i])
 
         # Latch the final stage back to the concrete stack.
         for d in range(self._stack_depth):
             writeback_val = stacks[self._issue_stages][d]
 
             # Check for value write-backs before latching.
+            written_back = 0
             for c in self.in_writeback:
                 writeback_matched = (c['tag'] != 0) & (c['tag'] == stacks[self._issue_stages][d]['tag'])
                 writeback_val = Mux(writeback_matched, Cat(c['val'], Const(1, self._tag_width)), writeback_val)
-            m.d.sync += stacks[0][d].eq(writeback_val)
+                written_back = written_back | writeback_matched
+
+            # A restore discards the result of this cycle in favor of the checkpointed state.
+            m.d.comb += self.out_next_state[d].eq(Mux(self.in_restore, self.in_restore_state[d], writeback_val))
+            m.d.comb += self.out_slot_we[d].eq((origins[self._issue_stages][d] != d) | written_back | self.in_restore)
+            with m.If(self.out_slot_we[d]):
+                m.d.sync += stacks[0][d].eq(self.out_next_state[d])
 
+        # Decode the tag of every latched slot for out_tag_present.
+        tag_present = 0
+        for d in range(self._stack_depth):
+            tag_present = tag_present | (Const(1, len(self.out_tag_present)) << stacks[0][d]['tag'])
+        m.d.comb += self.out_tag_present.eq(tag_present)
         return m
     
+    def elaborateLanes(self, m: Module, stage: int):
+        # Returns a (part, pushpop, extra) triple per lane, where part() gives the lane's slice of an entry, as for
+        # TopStack.elaborateLanes().
+        if self._value_lanes == 1:
+            return [(lambda x: x, self.in_stack_pushpop[stage], self.in_stack_extra[stage])]
+        lanes = []
+        bounds = [(l * self._register_width) // self._value_lanes for l in range(self._value_lanes+1)]
+        for l in range(self._value_lanes):
+            pushpop = Signal.like(self.in_stack_pushpop[stage], name="lane_pushpop_"+str(l)+"_"+str(stage), attrs={"keep": 1})
+            extra = Signal.like(self.in_stack_extra[stage], name="lane_extra_"+str(l)+"_"+str(stage), attrs={"keep": 1})
+            m.d.comb += pushpop.eq(self.in_stack_pushpop[stage])
+            m.d.comb += extra.eq(self.in_stack_extra[stage])
+            lanes.append((lambda x, lo=bounds[l], hi=bounds[l+1]: x.as_value()[lo:hi], pushpop, extra))
+        lanes.append((lambda x: x.as_value()[self._register_width:], self.in_stack_pushpop[stage], self.in_stack_extra[stage]))
+        return lanes
+
     # Testing helpers
+    def activityGroups(self, prefix: str = ""):
+        # One group per slot of the stacks grid, which is only available after elaboration. Stage 0 is latched.
+        groups = {}
+        for stage, row in enumerate(self.stacks):
+            for d, slot in enumerate(row):
+                groups[prefix+"stack_"+str(stage)+"_"+str(d)] = [slot]
+        return groups
+
     def zeroAllInputs(self):
         for i in self.in_mem:
             yield i.eq(0)
@@ -107,29 +193,40 @@ class MidStack(Elaboratable):
             yield i.eq(0)
         for i in self.in_stack_pushpop:
             yield i.eq(0)
+        for i in self.in_stack_extra:
+            yield i.eq(0)
+        for i in self.in_push_lanes + self.in_mem_lanes:
+            for j in i:
+                yield j.eq(0)
         for i in self.in_writeback:
             yield i.eq(0)
+        yield self.in_restore.eq(0)
+        for i in self.in_restore_state:
+            yield i.eq(0)
 
     def feedForwardAtStage(self, stage: int):
         yield self.in_stack_pushpop[stage].eq(MidStackCommand.NOP)
+        yield self.in_stack_extra[stage].eq(0)
 
     def feedForwardAllStages(self):
         for stage in range(len(self.in_stack_pushpop)):
             yield from self.feedForwardAtStage(stage)
 
-    def pushStackAtStage(self, stage: int):
+    def pushStackAtStage(self, stage: int, count: int = 1):
         yield self.in_stack_pushpop[stage].eq(MidStackCommand.PUSH)
+        yield self.in_stack_extra[stage].eq(count-1)
 
-    def pushStackAllStages(self):
+    def pushStackAllStages(self, count: int = 1):
         for stage in range(len(self.in_stack_pushpop)):
-            yield from self.pushStackAtStage(stage)
+            yield from self.pushStackAtStage(stage, count)
 
-    def popStackAtStage(self, stage: int):
+    def popStackAtStage(self, stage: int, count: int = 1):
         yield self.in_stack_pushpop[stage].eq(MidStackCommand.POP)
+        yield self.in_stack_extra[stage].eq(count-1)
 
-    def popStackAllStages(self):
+    def popStackAllStages(self, count: int = 1):
         for stage in range(len(self.in_stack_pushpop)):
-            yield from self.popStackAtStage(stage)
+            yield from self.popStackAtStage(stage, count)
     
 if __name__ == '__main__':
     mid_stack = MidStack(register_width=32, stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1)
@@ -138,10 +235,16 @@ if __name__ == '__main__':
             return v.as_value()
         f.write(verilog.convert(mid_stack,
                                 ports = [
-                                         *map(asValue, mid_stack.in_push),
-                                         *map(asValue, mid_stack.in_mem),
+                                         *map(asValue, sum(mid_stack.in_push_lanes, [])),
+                                         *map(asValue, sum(mid_stack.in_mem_lanes, [])),
                                          *mid_stack.in_stack_pushpop,
-                                         *map(asValue, mid_stack.out_peek),
-                                         *map(asValue, mid_stack.out_bottom),
+                                         *mid_stack.in_stack_extra,
+                                         *map(asValue, sum(mid_stack.out_peek_lanes, [])),
+                                         *map(asValue, sum(mid_stack.out_bottom_lanes, [])),
                                          *map(asValue, mid_stack.in_writeback),
+                                         *map(asValue, mid_stack.out_next_state),
+                                         mid_stack.in_restore,
+                                         *map(asValue, mid_stack.in_restore_state),
+                                         *mid_stack.out_slot_we,
+                                         mid_stack.out_tag_present,
                                         ]))
\ No newline at end of file
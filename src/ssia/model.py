@@ -0,0 +1,101 @@
+from ssia.mid_stack import MidStackCommand
+from ssia.snapshot import Snapshot
+
+# SSIAModel is a cycle-level reference model of SSIA. Entries are (val, tag) tuples. A cycle is modelled by
+# applying each issue stage in turn with stage(), then committing the result with latch(). Stages that are not
+# applied behave as feed-forward stages. peek() and bottom() expose the same values as SSIA's out_peek and
+# out_bottom for the next stage to be applied.
+#
+# With a move_width greater than one, a POP or PUSH moves extra+1 entries, and mem is a list of entries, one per
+# in_mem lane.
+#
+# Tags 0 and 1 mark entries with no outstanding writeback: 0 for entries that were never tagged and 1 for
+# entries whose value is known. Any other tag is awaiting a writeback.
+class SSIAModel:
+    def __init__(self, register_width: int, top_stack_depth: int, mid_stack_depth: int, issue_stages: int, tag_width: int, writeback_count: int,
+                 move_width: int = 1):
+        self._register_width = register_width
+        self._move_width = move_width
+        self._top_stack_depth = top_stack_depth
+        self._mid_stack_depth = mid_stack_depth
+        self._issue_stages = issue_stages
+        self._tag_width = tag_width
+        self._writeback_count = writeback_count
+        self.top = [(0, 0)] * top_stack_depth
+        self.mid = [(0, 0)] * mid_stack_depth
+        self._stage = 0
+
+    def peek(self):
+        return self.top[0], self.top[1]
+
+    def bottom(self, lane: int = 0):
+        return self.mid[-1-lane]
+
+    # Apply one issue stage. swizzle and pushpop are encoded as for SSIA's in_stack_swizzle and in_stack_pushpop.
+    def stage(self, swizzle, pushpop: MidStackCommand, push=(0, 0), mem=(0, 0), extra: int = 0):
+        assert self._stage < self._issue_stages, "more stages applied than issue_stages"
+        assert extra < self._move_width, "extra exceeds move_width"
+        depth = self._top_stack_depth
+        lanes = mem if isinstance(mem, list) else [mem]
+        lanes = [self._entry(x) for x in lanes] + [(0, 0)] * (self._move_width - len(lanes))
+        top = []
+        for d, source in enumerate(swizzle):
+            if source < depth:
+                top.append(self.top[source])
+            elif d >= depth-self._move_width and source < depth+self._move_width:
+                top.append(self.mid[source-depth])
+            elif d == 0 and source == depth:
+                top.append(self._entry(push))
+            else:
+                raise ValueError("swizzle " + str(source) + " is out of range for slot " + str(d))
+
+        # The top region pulls up from the top of the mid region and pushes its bottom entries into it, while the
+        # mid region pulls up from in_mem.
+        count = extra + 1
+        if pushpop == MidStackCommand.PUSH:
+            self.mid = self.top[depth-count:] + self.mid[:-count]
+        elif pushpop == MidStackCommand.POP:
+            self.mid = self.mid[count:] + lanes[:count]
+        self.top = top
+        self._stage += 1
+
+    # Apply writebacks and latch the state at the end of a cycle.
+    def latch(self, writebacks=()):
+        assert len(writebacks) <= self._writeback_count, "more writebacks than writeback_count"
+        def writeback(entry):
+            # Every writeback is matched against the tag before any writeback applies, and the last match wins.
+            result = entry
+            for val, tag in writebacks:
+                if tag != 0 and tag == entry[1]:
+                    result = (val & ((1 << self._register_width) - 1), 1)
+            return result
+        self.top = [writeback(x) for x in self.top]
+        self.mid = [writeback(x) for x in self.mid]
+        self._stage = 0
+
+    def _config(self):
+        return {
+            "register_width": self._register_width,
+            "top_stack_depth": self._top_stack_depth,
+            "mid_stack_depth": self._mid_stack_depth,
+            "tag_width": self._tag_width,
+        }
+
+    # Take a Snapshot of the latched state, between latch() and the first stage() of the next cycle.
+    def dumpState(self, cycle: int = 0):
+        assert self._stage == 0, "state dumped part way through a cycle"
+        snapshot = Snapshot(self._config(), cycle)
+        snapshot.top = list(self.top)
+        snapshot.mid = list(self.mid)
+        return snapshot
+
+    # Restore the latched state from a Snapshot. Registers other than the stack regions are not modelled.
+    def loadState(self, snapshot: Snapshot):
+        snapshot.checkConfig(self._config())
+        self.top = [self._entry(x) for x in snapshot.top]
+        self.mid = [self._entry(x) for x in snapshot.mid]
+        self._stage = 0
+
+    def _entry(self, entry):
+        val, tag = entry
+        return (val & ((1 << self._register_width) - 1), tag & ((1 << self._tag_width) - 1))
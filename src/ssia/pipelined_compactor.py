@@ -0,0 +1,83 @@
+from amaranth import *
+from amaranth.hdl import *
+from amaranth.back import verilog
+from ssia.compactor import LaneIndexer
+
+# PipelinedCompactor is a registered variant of Compactor that accepts a new vector every cycle and produces the
+# compacted vector latency cycles later. The chain that finds each enabled lane in turn is cut into latency
+# segments of consecutive output parts, each found by its own LaneIndexer, with a pipeline register after each
+# segment. Each register carries the enables not yet gathered, the inputs, and the parts gathered so far.
+class PipelinedCompactor(Elaboratable):
+    # latency: the number of pipeline registers, from 1 up to count
+    def __init__(self, width: int, count: int, latency: int):
+        assert 1 <= latency <= count
+        self._width = width
+        self._count = count
+        self._latency = latency
+        self.input = [Signal(width, name="input_"+str(x)) for x in range(count)]
+        self.input_en = [Signal(1, name="input_en_"+str(x)) for x in range(count)]
+        self.input_valid = Signal(1, name="input_valid")
+        self.output_val = Signal(count*width, name="output_val")
+        self.output_count = Signal(range(count+1), name="output_count")
+        self.output_valid = Signal(1, name="output_valid")
+
+    def elaborate(self, platform):
+        m = Module()
+
+        # Segment k gathers parts bounds[k] to bounds[k+1]-1.
+        bounds = [(k * self._count) // self._latency for k in range(self._latency+1)]
+
+        concat_en = Cat(*self.input_en)
+        inputs = self.input
+        parts = []
+        count = sum(self.input_en)
+        valid = self.input_valid
+        for k in range(self._latency):
+            lane_indexer = LaneIndexer(self._count, lane_count=bounds[k+1]-bounds[k])
+            m.submodules["lane_indexer_"+str(k)] = lane_indexer
+            m.d.comb += lane_indexer.input_en.eq(concat_en)
+            array = Array(inputs)
+            for index, none in zip(lane_indexer.lane_index, lane_indexer.lane_none):
+                parts.append(Mux(none, 0, array[index]))
+            concat_en = lane_indexer.remaining_en
+
+            # Register the state of the chain at the end of the segment.
+            last = k == self._latency-1
+            stage_en = Signal(self._count, name="stage_en_"+str(k))
+            stage_inputs = [Signal(self._width, name="stage_input_"+str(k)+"_"+str(x)) for x in range(self._count)]
+            stage_parts = [Signal(self._width, name="stage_part_"+str(k)+"_"+str(x)) for x in range(len(parts))]
+            stage_count = self.output_count if last else Signal(range(self._count+1), name="stage_count_"+str(k))
+            stage_valid = self.output_valid if last else Signal(1, name="stage_valid_"+str(k))
+            if not last:
+                m.d.sync += stage_en.eq(concat_en)
+                for x in range(self._count):
+                    m.d.sync += stage_inputs[x].eq(inputs[x])
+            for x in range(len(parts)):
+                m.d.sync += stage_parts[x].eq(parts[x])
+            m.d.sync += stage_count.eq(count)
+            m.d.sync += stage_valid.eq(valid)
+            concat_en, inputs, parts, count, valid = stage_en, stage_inputs, stage_parts, stage_count, stage_valid
+
+        m.d.comb += self.output_val.eq(Cat(*parts))
+        return m
+
+    # Testing helpers
+    def zeroAllInputs(self):
+        for i in self.input:
+            yield i.eq(0)
+        for i in self.input_en:
+            yield i.eq(0)
+        yield self.input_valid.eq(0)
+
+if __name__ == '__main__':
+    compactor = PipelinedCompactor(width=32, count=8, latency=2)
+    with open('pipelined_compactor.v', 'w') as f:
+        f.write(verilog.convert(compactor,
+                                ports = [
+                                         *compactor.input,
+                                         *compactor.input_en,
+                                         compactor.input_valid,
+                                         compactor.output_val,
+                                         compactor.output_count,
+                                         compactor.output_valid,
+                                        ]))
@@ -0,0 +1,179 @@
+from amaranth import *
+from amaranth.hdl import *
+from amaranth.back import verilog
+from amaranth.lib.data import StructLayout
+from ssia.compactor import LaneIndexer
+
+# PointerTopStack has the same ports and behaviour as TopStack, but keeps the stack entries stationary in a small
+# register file and swizzles only narrow pointers to them through the issue stages. Values are only read from the
+# register file at out_peek and out_bottom, and writebacks update the register file directly. With wide registers
+# this replaces the register_width+tag_width swizzle muxes of every stage with pointer-width ones.
+#
+# A stage can only point at the entries brought in by the stages before it, so the pointers and the value reads of
+# each stage only cover the register file and those entries.
+#
+# Each stage may bring in one pushed entry and move_width pulled-up entries. These are given virtual pointers past
+# the end of the register file for the rest of the cycle, and are only written to the register file if they are
+# still on the stack at the end of the cycle. Every stage has its own free registers set aside for them, so the
+# register file holds stack_depth + issue_stages*(1+move_width) entries.
+class PointerTopStack(Elaboratable):
+    def __init__(self, register_width: int, stack_depth: int, issue_stages: int, tag_width: int, writeback_count: int,
+                 move_width: int = 1):
+        assert 1 <= move_width < stack_depth
+        self._stack_depth = stack_depth
+        self._move_width = move_width
+        self._tag_width = tag_width
+        self._issue_stages = issue_stages
+        self._incoming_count = issue_stages*(1+move_width)
+        self._register_count = stack_depth + self._incoming_count
+        self._register_layout = StructLayout({
+            "val": register_width,
+            "tag": tag_width,
+        })
+
+        # in_push: one register+tag per issue stage to possibly be pushed onto the stack
+        self.in_push = [Signal(self._register_layout, name="in_push_"+str(x)) for x in range(issue_stages)]
+
+        # in_mem: one register+tag per issue stage that is pulled up from lower in the stack
+        self.in_mem = [Signal(self._register_layout, name="in_mem_"+str(x)) for x in range(issue_stages)]
+
+        # in_swizzle: one swizzle of the top-stack stack slots per stack slot per stage, encoded as for TopStack
+        self.in_stack_swizzle = []
+        for s in range(issue_stages):
+            single_swizzle = []
+            for d in range(stack_depth):
+                if d >= stack_depth-move_width:
+                    single_swizzle.append(Signal(range(stack_depth+move_width), name="in_swizzle_"+str(s)+"_"+str(d)))
+                elif d == 0:
+                    single_swizzle.append(Signal(range(stack_depth+1), name="in_swizzle_"+str(s)+"_"+str(d)))
+                else:
+                    single_swizzle.append(Signal(range(stack_depth), name="in_swizzle_"+str(s)+"_"+str(d)))
+            self.in_stack_swizzle.append(single_swizzle)
+
+        # out_peek: two register+tag per issue stage that are the two top-most entries in the stack
+        self.out_peek = [[Signal(self._register_layout, name = "out_peek_"+str(y)+"_"+str(x)) for x in range(2)] for y in range(issue_stages)]
+
+        # out_bottom: one register+tag per issue stage that is the lowest entry in the top-stack
+        self.out_bottom = [Signal(self._register_layout, name="out_bottom"+str(x)) for x in range(issue_stages)]
+
+        # in_writeback: writeback_count register+tag which are tag-matched and written back each cycle
+        self.in_writeback = [Signal(self._register_layout, name="in_cdb_"+str(x)) for x in range(writeback_count)]
+
+        # out_tag_present: one bit per tag value, set when a latched slot holds an entry with that tag
+        self.out_tag_present = Signal(2**tag_width, name="out_tag_present")
+
+        # Lanes of the multi-entry ports, as for TopStack.
+        self.in_mem_lanes = [[self.in_mem[x]] + [Signal(self._register_layout, name="in_mem_"+str(x)+"_"+str(y)) for y in range(1, move_width)] for x in range(issue_stages)]
+        self.out_bottom_lanes = [[self.out_bottom[x]] + [Signal(self._register_layout, name="out_bottom"+str(x)+"_"+str(y)) for y in range(1, move_width)] for x in range(issue_stages)]
+
+    def elaborate(self, platform):
+        m = Module()
+        D = self._stack_depth
+        R = self._register_count
+
+        registers = [Signal(self._register_layout, name="register_"+str(x)) for x in range(R)]
+        self.registers = registers
+
+        # Pointers is a (S+1) x D grid of pointers, laid out as the stacks grid of TopStack. Pointers below R select
+        # a register, and pointer R+v selects incoming entry v. Row y can only select the entries brought in by the
+        # first y stages. Only the first stage is latched.
+        per_stage = 1+self._move_width
+        pointers = [[Signal(range(R+y*per_stage), name="pointer_"+str(y)+"_"+str(x), reset=x if y == 0 else 0) for x in range(D)] for y in range(self._issue_stages+1)]
+        self.pointers = pointers
+
+        # Incoming entries are the pushed entry and the pulled-up lanes of each stage.
+        incoming = []
+        for stage in range(self._issue_stages):
+            incoming += [self.in_push[stage], *self.in_mem_lanes[stage]]
+
+        for stage in range(self._issue_stages):
+            base = R + stage*per_stage
+            first_mux = Array([*pointers[stage], Const(base)])
+            for d in range(D-self._move_width):
+                m.d.comb += pointers[stage+1][d].eq(first_mux[self.in_stack_swizzle[stage][d]])
+            last_mux = Array([*pointers[stage], *(Const(base+1+i) for i in range(self._move_width))])
+            for d in range(D-self._move_width, D):
+                m.d.comb += pointers[stage+1][d].eq(last_mux[self.in_stack_swizzle[stage][d]])
+
+            # Values are only read out where they leave the region.
+            entries = Array([*registers, *incoming[:stage*per_stage]])
+            for i in range(2):
+                m.d.comb += self.out_peek[stage][i].eq(entries[pointers[stage][i]])
+            for i in range(self._move_width):
+                m.d.comb += self.out_bottom_lanes[stage][i].eq(entries[pointers[stage][D-1-i]])
+
+        # Set aside a free register for each incoming entry, in the lane order of the free registers.
+        m.submodules.free_indexer = free_indexer = LaneIndexer(R, lane_count=self._incoming_count)
+        referenced = [0] * R
+        for d in range(D):
+            for r in range(R):
+                referenced[r] = referenced[r] | (pointers[0][d] == r)
+        m.d.comb += free_indexer.input_en.eq(~Cat(*referenced))
+        allocated = free_indexer.lane_index
+
+        # Incoming entries still on the stack are written to their registers, and the pointers renamed to match.
+        physical = Array([*(Const(r) for r in range(R)), *allocated])
+        kept = [0] * self._incoming_count
+        for d in range(D):
+            m.d.sync += pointers[0][d].eq(physical[pointers[self._issue_stages][d]])
+            for v in range(self._incoming_count):
+                kept[v] = kept[v] | (pointers[self._issue_stages][d] == R+v)
+
+        for r in range(R):
+            new_val = registers[r].as_value()
+            for v in range(self._incoming_count):
+                new_val = Mux(kept[v] & (allocated[v] == r), incoming[v], new_val)
+
+            # Check for value write-backs before latching.
+            tag = new_val[-self._tag_width:]
+            for c in self.in_writeback:
+                writeback_matched = (c['tag'] != 0) & (c['tag'] == tag)
+                new_val = Mux(writeback_matched, Cat(c['val'], Const(1, self._tag_width)), new_val)
+            m.d.sync += registers[r].eq(new_val)
+
+        # Decode the tag of every referenced register for out_tag_present.
+        tag_present = 0
+        for r in range(R):
+            tag_present = tag_present | (referenced[r] << registers[r]['tag'])
+        m.d.comb += self.out_tag_present.eq(tag_present)
+        return m
+
+    # Testing helpers
+    def zeroAllInputs(self):
+        for i in self.in_mem:
+            yield i.eq(0)
+        for i in self.in_push:
+            yield i.eq(0)
+        for i in self.in_mem_lanes:
+            for j in i:
+                yield j.eq(0)
+        for i in self.in_stack_swizzle:
+            for j in i:
+                yield j.eq(0)
+        for i in self.in_writeback:
+            yield i.eq(0)
+
+    def feedForwardAtStage(self, stage: int):
+        stack_depth = len(self.in_stack_swizzle[stage])
+        for slot in range(stack_depth):
+            yield self.in_stack_swizzle[stage][slot].eq(slot)
+
+    def feedForwardAllStages(self):
+        for stage in range(len(self.in_stack_swizzle)):
+            yield from self.feedForwardAtStage(stage)
+
+if __name__ == '__main__':
+    top_stack = PointerTopStack(register_width=64, stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1)
+    with open('pointer_top_stack.v', 'w') as f:
+        def asValue(v):
+            return v.as_value()
+        f.write(verilog.convert(top_stack,
+                                ports = [
+                                         *map(asValue, top_stack.in_push),
+                                         *map(asValue, sum(top_stack.in_mem_lanes, [])),
+                                         *sum(top_stack.in_stack_swizzle, []),
+                                         *map(asValue, sum(top_stack.out_peek, [])),
+                                         *map(asValue, sum(top_stack.out_bottom_lanes, [])),
+                                         *map(asValue, top_stack.in_writeback),
+                                         top_stack.out_tag_present,
+                                        ]))
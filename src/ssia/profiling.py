@@ -0,0 +1,136 @@
+import inspect
+import time
+from collections import Counter
+
+from amaranth.hdl import *
+from amaranth.hdl.ast import Statement, ValueCastable
+from amaranth.sim import Simulator, Settle, Tick, Delay
+
+# SimProfile records where the wall-clock time of Amaranth simulations goes. While instrument() is active, every
+# process added to a Simulator is wrapped so that each command it yields is counted and timed:
+#   testbench: time spent running the process itself, between commands
+#   wait: time from yielding a command until the process is resumed, by kind of command. For a "tick" or
+#     "settle" this is the time the simulator spends evaluating the design (and running any other processes),
+#     and for a "read" or "write" it is the time taken to compile and apply the command.
+# Commands are also counted against every testing helper they were yielded from, e.g. zeroAllInputs, including
+# helpers called from other helpers. Cycles are counted as the most ticks taken by any one process.
+class SimProfile:
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.run_time = 0.0
+        self.testbench_time = 0.0
+        self.wait_time = Counter()
+        self.commands = Counter()
+        self.helpers = Counter()
+        self._ticks = []
+
+    @property
+    def cycles(self):
+        return max(self._ticks, default=0)
+
+    def _kind(self, command):
+        if command is None or isinstance(command, Tick):
+            return "tick"
+        if isinstance(command, Settle):
+            return "settle"
+        if isinstance(command, Delay):
+            return "delay"
+        if isinstance(command, Statement):
+            return "write"
+        if isinstance(command, (Value, ValueCastable)):
+            return "read"
+        return type(command).__name__.lower()
+
+    def _record(self, command, generator, ticks):
+        kind = self._kind(command)
+        self.commands[kind] += 1
+        if kind == "tick":
+            self._ticks[ticks] += 1
+        # Attribute the command to each helper on the chain of generators it was yielded through.
+        inner = generator.gi_yieldfrom
+        while inspect.isgenerator(inner):
+            self.helpers[inner.gi_code.co_qualname] += 1
+            inner = inner.gi_yieldfrom
+        return kind
+
+    # Wrap a process function for Simulator.add_process() or add_sync_process().
+    def wrapProcess(self, process):
+        profile = self
+        ticks = len(self._ticks)
+        self._ticks.append(0)
+
+        def wrapper():
+            generator = process if inspect.isgenerator(process) else process()
+            resume, arg = generator.send, None
+            while True:
+                start = time.perf_counter()
+                try:
+                    command = resume(arg)
+                except StopIteration:
+                    profile.testbench_time += time.perf_counter() - start
+                    return
+                yielded = time.perf_counter()
+                profile.testbench_time += yielded - start
+                kind = profile._record(command, generator, ticks)
+                try:
+                    resume, arg = generator.send, (yield command)
+                except GeneratorExit:
+                    generator.close()
+                    raise
+                except Exception as exn:
+                    # The simulator reports an invalid command by throwing into the process.
+                    resume, arg = generator.throw, exn
+                profile.wait_time[kind] += time.perf_counter() - yielded
+        return wrapper
+
+    # A context manager under which every Simulator is profiled.
+    def instrument(self):
+        return _Instrumented(self)
+
+    def report(self):
+        lines = []
+        per_cycle = self.run_time / self.cycles * 1e3 if self.cycles else 0.0
+        lines.append(f"{self.name}: {self.run_time:.3f}s run, {self.cycles} cycles, {per_cycle:.3f}ms/cycle")
+        lines.append(f"  {'testbench':<10} {self.testbench_time:>8.3f}s")
+        for kind, seconds in self.wait_time.most_common():
+            lines.append(f"  {kind:<10} {seconds:>8.3f}s {self.commands[kind]:>8} commands")
+        for helper, count in self.helpers.most_common():
+            lines.append(f"  {helper:<40} {count:>8} yields")
+        return "\n".join(lines)
+
+class _Instrumented:
+    def __init__(self, profile: SimProfile):
+        self._profile = profile
+
+    def __enter__(self):
+        profile = self._profile
+        self._saved = {x: getattr(Simulator, x) for x in ("add_process", "add_sync_process", "run", "run_until")}
+        add_process, add_sync_process, run, run_until = (self._saved[x] for x in ("add_process", "add_sync_process", "run", "run_until"))
+
+        def profiledAddProcess(sim, process):
+            add_process(sim, profile.wrapProcess(process))
+        def profiledAddSyncProcess(sim, process, *, domain="sync"):
+            add_sync_process(sim, profile.wrapProcess(process), domain=domain)
+        def profiledRun(sim):
+            start = time.perf_counter()
+            try:
+                run(sim)
+            finally:
+                profile.run_time += time.perf_counter() - start
+        def profiledRunUntil(sim, deadline, *, run_passive=False):
+            start = time.perf_counter()
+            try:
+                run_until(sim, deadline, run_passive=run_passive)
+            finally:
+                profile.run_time += time.perf_counter() - start
+
+        Simulator.add_process = profiledAddProcess
+        Simulator.add_sync_process = profiledAddSyncProcess
+        Simulator.run = profiledRun
+        Simulator.run_until = profiledRunUntil
+        return profile
+
+    def __exit__(self, *exc):
+        for name, method in self._saved.items():
+            setattr(Simulator, name, method)
+        return False
@@ -0,0 +1,60 @@
+from amaranth import *
+from amaranth.hdl import *
+from amaranth.back import verilog
+
+# SkidBuffer is a two-entry valid/ready register slice. Both out_payload and in_ready are registered, so it breaks
+# the combinational paths in both directions while still accepting a new payload every cycle when the downstream
+# side is ready. When the downstream side stalls, the payload accepted in that cycle is parked in the skid register.
+class SkidBuffer(Elaboratable):
+    # shape: the shape of the payload carried by the stream
+    def __init__(self, shape):
+        self._shape = shape
+
+        # in_payload/in_valid/in_ready: the upstream side of the stream
+        self.in_payload = Signal(shape, name="in_payload")
+        self.in_valid = Signal(1, name="in_valid")
+        self.in_ready = Signal(1, name="in_ready")
+
+        # out_payload/out_valid/out_ready: the downstream side of the stream
+        self.out_payload = Signal(shape, name="out_payload")
+        self.out_valid = Signal(1, name="out_valid")
+        self.out_ready = Signal(1, name="out_ready")
+
+    def elaborate(self, platform):
+        m = Module()
+
+        main_valid = Signal(1, name="main_valid")
+        skid = Signal(self._shape, name="skid")
+        skid_valid = Signal(1, name="skid_valid")
+
+        m.d.comb += self.in_ready.eq(~skid_valid)
+        m.d.comb += self.out_valid.eq(main_valid)
+
+        with m.If(self.out_ready | ~main_valid):
+            # The main register is free to be reloaded, preferring a parked payload.
+            with m.If(skid_valid):
+                m.d.sync += self.out_payload.eq(skid)
+                m.d.sync += main_valid.eq(1)
+                m.d.sync += skid_valid.eq(0)
+            with m.Else():
+                m.d.sync += self.out_payload.eq(self.in_payload)
+                m.d.sync += main_valid.eq(self.in_valid)
+        with m.Elif(self.in_valid & self.in_ready):
+            # The downstream side stalled, so park the incoming payload.
+            m.d.sync += skid.eq(self.in_payload)
+            m.d.sync += skid_valid.eq(1)
+
+        return m
+
+if __name__ == '__main__':
+    skid_buffer = SkidBuffer(32)
+    with open('skid_buffer.v', 'w') as f:
+        f.write(verilog.convert(skid_buffer,
+                                ports = [
+                                         skid_buffer.in_payload,
+                                         skid_buffer.in_valid,
+                                         skid_buffer.in_ready,
+                                         skid_buffer.out_payload,
+                                         skid_buffer.out_valid,
+                                         skid_buffer.out_ready,
+                                        ]))
@@ -0,0 +1,58 @@
+import json
+
+# Snapshot is the latched state of SSIA at the start of a cycle, so that long simulations can skip their warm-up
+# and fan out from one warm state. It is taken from and restored to either an Amaranth simulation of SSIA, with
+# SSIA.dumpState() and SSIA.loadState(), or an SSIAModel, with SSIAModel.dumpState() and SSIAModel.loadState().
+# Snapshots are saved to and loaded from JSON files.
+#
+# Entries are (val, tag) tuples, as for SSIAModel:
+#   top, mid: the latched TopStack and MidStack regions, top-first
+#   memory: the entries spilled below the mid region, top of stack last, as returned by runWorkload()
+#   registers: any other latched state of SSIA by name, e.g. the CheckpointFile's copies and counters. Only the
+#     Amaranth simulation has these, and they are left out of snapshots taken from a model.
+#   workload: the state of the scheduler in runWorkload(), i.e. the trace position, the tags awaiting writeback, the
+#     stack occupancy and the statistics so far, so that a run can be resumed
+class Snapshot:
+    # config: the parameters the state was taken with, which must match wherever it is restored
+    # cycle: the number of cycles run before the state was taken
+    def __init__(self, config: dict, cycle: int = 0):
+        self.config = dict(config)
+        self.cycle = cycle
+        self.top = []
+        self.mid = []
+        self.memory = []
+        self.registers = {}
+        self.workload = {}
+
+    def checkConfig(self, config: dict):
+        for key, value in config.items():
+            if key in self.config and self.config[key] != value:
+                raise ValueError("snapshot was taken with " + key + "=" + str(self.config[key]) + ", not " + str(value))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                "config": self.config,
+                "cycle": self.cycle,
+                "top": self.top,
+                "mid": self.mid,
+                "memory": self.memory,
+                "registers": self.registers,
+                "workload": self.workload,
+            }, f, indent=1)
+
+    @staticmethod
+    def load(path):
+        with open(path) as f:
+            state = json.load(f)
+        def entries(x):
+            return [tuple(entry) for entry in x]
+        snapshot = Snapshot(state["config"], state["cycle"])
+        snapshot.top = entries(state["top"])
+        snapshot.mid = entries(state["mid"])
+        snapshot.memory = entries(state["memory"])
+        snapshot.registers = state["registers"]
+        snapshot.workload = state["workload"]
+        if "pending" in snapshot.workload:
+            snapshot.workload["pending"] = [(*x[:-1], tuple(x[-1])) for x in snapshot.workload["pending"]]
+        return snapshot
@@ -1,12 +1,29 @@
 from amaranth import *
 from amaranth.hdl import *
 from amaranth.back import verilog
+from amaranth.sim import Settle
 from amaranth.lib.data import StructLayout
-from top_stack import TopStack
-from mid_stack import MidStack, MidStackCommand
+from ssia.top_stack import TopStack
+from ssia.mid_stack import MidStack, MidStackCommand
+from ssia.checkpoint import CheckpointFile
+from ssia.compactor import Compactor
+from ssia.expander import Expander
+from ssia.snapshot import Snapshot
 
 class SSIA(Elaboratable):
-    def __init__(self, register_width: int, top_stack_depth: int, mid_stack_depth: int, issue_stages: int, tag_width: int, writeback_count: int):
+    # checkpoint_count: the maximum number of outstanding speculative checkpoints, or 0 to disable checkpointing
+    # onehot_swizzle: build TopStack's swizzles as one-hot AND-OR crossbars, see TopStack
+    # move_width: the maximum number of entries moved between regions by a single stage, see MidStack
+    # sparse_issue: accept a valid mask with each bundle, and pack the valid stages into the leading stages
+    # double_pump: run the MidStack in a "fast" domain at twice the clock rate, with half of the stages, see
+    #   elaborateDoublePump()
+    # value_lanes: slice the val field of both regions into lanes with replicated controls, see TopStack
+    def __init__(self, register_width: int, top_stack_depth: int, mid_stack_depth: int, issue_stages: int, tag_width: int, writeback_count: int,
+                 checkpoint_count: int = 0, onehot_swizzle: bool = False, move_width: int = 1, sparse_issue: bool = False,
+                 double_pump: bool = False, value_lanes: int = 1):
+        # A restore would have to be applied to the MidStack at the right fast clock edge, so checkpoints are not
+        # supported with a double-pumped MidStack.
+        assert not double_pump or (issue_stages % 2 == 0 and checkpoint_count == 0)
         self._top_stack_depth = top_stack_depth
         self._mid_stack_depth = mid_stack_depth
         self._tag_width = tag_width
@@ -14,6 +31,12 @@ class SSIA(Elaboratable):
         self._register_width = register_width
         self._tag_width = tag_width
         self._writeback_count = writeback_count
+        self._checkpoint_count = checkpoint_count
+        self._onehot_swizzle = onehot_swizzle
+        self._move_width = move_width
+        self._sparse_issue = sparse_issue
+        self._double_pump = double_pump
+        self._value_lanes = value_lanes
         self._register_layout = StructLayout({
             "val": register_width,
             "tag": tag_width,
@@ -30,11 +53,15 @@ class SSIA(Elaboratable):
         # bits. Values 0 to stack_depth-1 encode the corresponding stack slot from the prior stage. Value
         # stack_depth is only value for the first and last swizzle, and encode selecting the values of
         # in_push and in_mem respectively.
+        # With a move_width of k, the bottom k swizzles instead have values up to stack_depth+k-1, where value
+        # stack_depth+i selects the i-th entry pulled up from the mid-stack.
         self.in_stack_swizzle = []
         for s in range(issue_stages):
             single_swizzle = []
             for d in range(top_stack_depth):
-                if d == 0 or d == top_stack_depth-1:
+                if d >= top_stack_depth-move_width:
+                    single_swizzle.append(Signal(range(top_stack_depth+move_width), name="in_swizzle_"+str(s)+"_"+str(d)))
+                elif d == 0:
                     single_swizzle.append(Signal(range(top_stack_depth+1), name="in_swizzle_"+str(s)+"_"+str(d)))
                 else:
                     single_swizzle.append(Signal(range(top_stack_depth), name="in_swizzle_"+str(s)+"_"+str(d)))
@@ -44,6 +71,9 @@ class SSIA(Elaboratable):
         # 0b00 encodes no change, 0b10 encodes a pop, and 0b10 encodes a push.
         self.in_stack_pushpop = [Signal(MidStackCommand, name="in_pushpop_"+str(s)) for s in range(issue_stages)]
 
+        # in_extra: the number of entries a POP or PUSH moves beyond the first, up to move_width-1.
+        self.in_stack_extra = [Signal(range(move_width), name="in_extra_"+str(s)) for s in range(issue_stages)]
+
         # out_peek: two register+tag per issue stage that are the two top-most entries in the stack
         self.out_peek = [[Signal(self._register_layout, name = "out_peek_"+str(y)+"_"+str(x)) for x in range(2)] for y in range(issue_stages)]
 
@@ -52,47 +82,368 @@ class SSIA(Elaboratable):
 
         # in_writeback: writeback_count register+tag which are tag-matched and written back each cycle
         self.in_writeback = [Signal(self._register_layout, name="in_cdb_"+str(x)) for x in range(writeback_count)]
+
+        # Lanes of the multi-entry ports, ordered as in MidStack. in_mem_lanes[s][0] is in_mem[s], and so on.
+        self.in_mem_lanes = [[self.in_mem[x]] + [Signal(self._register_layout, name="in_mem_"+str(x)+"_"+str(y)) for y in range(1, move_width)] for x in range(issue_stages)]
+        self.out_bottom_lanes = [[self.out_bottom[x]] + [Signal(self._register_layout, name="out_bottom"+str(x)+"_"+str(y)) for y in range(1, move_width)] for x in range(issue_stages)]
+
+        # out_tag_present: one bit per tag value, set when a latched slot of either region, or of an outstanding
+        # checkpoint, holds an entry with that tag. A WritebackQueue uses this to drop results that can no longer be
+        # matched.
+        self.out_tag_present = Signal(2**tag_width, name="out_tag_present")
+
+        if sparse_issue:
+            # in_stage_valid: one valid bit per stage. The commands and inputs of the valid stages are packed into
+            # the leading stages with a Compactor, and the remaining stages feed forward. The peeks and bottoms of
+            # each packed stage are scattered back to the stage they were packed from, and are zero for stages that
+            # are not valid.
+            self.in_stage_valid = [Signal(1, name="in_stage_valid_"+str(s), reset=1) for s in range(issue_stages)]
+
+            # out_active_stages: the number of valid stages in the bundle
+            self.out_active_stages = Signal(range(issue_stages+1), name="out_active_stages")
+
+        if checkpoint_count > 0:
+            # in_checkpoint: capture the state latched at the end of this cycle as checkpoint out_checkpoint_id.
+            # Ignored while out_checkpoint_full is set or during a restore.
+            self.in_checkpoint = Signal(1, name="in_checkpoint")
+            self.out_checkpoint_id = Signal(range(checkpoint_count), name="out_checkpoint_id")
+            self.out_checkpoint_full = Signal(1, name="out_checkpoint_full")
+
+            # in_checkpoint_release: release the oldest outstanding checkpoint
+            self.in_checkpoint_release = Signal(1, name="in_checkpoint_release")
+
+            # in_restore: discard this cycle's bundle and restore checkpoint in_restore_id at the next clock,
+            # releasing it and all younger checkpoints. Ignored unless in_restore_id is outstanding, in which case
+            # the bundle is issued as usual.
+            self.in_restore = Signal(1, name="in_restore")
+            self.in_restore_id = Signal(range(checkpoint_count), name="in_restore_id")
     
     def elaborate(self, platform):
         m = Module()
 
-        topStack = TopStack(register_width=self._register_width, stack_depth=self._top_stack_depth, issue_stages=self._issue_stages, tag_width=self._tag_width, writeback_count=self._writeback_count)
+        topStack = TopStack(register_width=self._register_width, stack_depth=self._top_stack_depth, issue_stages=self._issue_stages, tag_width=self._tag_width, writeback_count=self._writeback_count, onehot_swizzle=self._onehot_swizzle, move_width=self._move_width, value_lanes=self._value_lanes)
         m.submodules += topStack
+        self.topStack = topStack
+
+        midStack = MidStack(register_width=self._register_width, stack_depth=self._mid_stack_depth, issue_stages=self._issue_stages//2 if self._double_pump else self._issue_stages, tag_width=self._tag_width, writeback_count=self._writeback_count, move_width=self._move_width, value_lanes=self._value_lanes)
+        if self._double_pump:
+            m.submodules += DomainRenamer("fast")(midStack)
+        else:
+            m.submodules += midStack
+        self.midStack = midStack
 
-        midStack = MidStack(register_width=self._register_width, stack_depth=self._mid_stack_depth, issue_stages=self._issue_stages, tag_width=self._tag_width, writeback_count=self._writeback_count)
-        m.submodules += midStack
+        if self._sparse_issue:
+            push, mem_lanes, swizzles, pushpops, extras, peeks, bottom_lanes = self.elaborateSparseIssue(m)
+        else:
+            push, mem_lanes, swizzles, pushpops, extras = self.in_push, self.in_mem_lanes, self.in_stack_swizzle, self.in_stack_pushpop, self.in_stack_extra
+            peeks, bottom_lanes = self.out_peek, self.out_bottom_lanes
 
         for x in range(self._issue_stages):
-            m.d.comb += topStack.in_push[x].eq(self.in_push[x])
-            m.d.comb += topStack.in_mem[x].eq(midStack.out_peek[x])
-            m.d.comb += midStack.in_push[x].eq(topStack.out_bottom[x])
-            m.d.comb += midStack.in_mem[x].eq(self.in_mem[x])
+            m.d.comb += topStack.in_push[x].eq(push[x])
             for y in range(self._top_stack_depth):
-                m.d.comb += self.in_stack_swizzle[x][y].eq(topStack.in_stack_swizzle[x][y])
-            m.d.comb += midStack.in_stack_pushpop[x].eq(self.in_stack_pushpop[x])
-
+                m.d.comb += topStack.in_stack_swizzle[x][y].eq(swizzles[x][y])
             for y in range(2):
-                m.d.comb += self.out_peek[x][y].eq(topStack.out_peek[x][y])
-            m.d.comb += self.out_bottom[x].eq(midStack.out_bottom[x])
-
+                m.d.comb += peeks[x][y].eq(topStack.out_peek[x][y])
         for x in range(self._writeback_count):
             m.d.comb += topStack.in_writeback[x].eq(self.in_writeback[x])
-            m.d.comb += midStack.in_writeback[x].eq(self.in_writeback[x])
+
+        region_tags = Signal(len(self.out_tag_present), name="region_tag_present")
+        if self._double_pump:
+            self.elaborateDoublePump(m, mem_lanes, pushpops, extras, bottom_lanes, region_tags)
+        else:
+            for x in range(self._issue_stages):
+                for y in range(self._move_width):
+                    m.d.comb += topStack.in_mem_lanes[x][y].eq(midStack.out_peek_lanes[x][y])
+                    m.d.comb += midStack.in_push_lanes[x][y].eq(topStack.out_bottom_lanes[x][y])
+                    m.d.comb += midStack.in_mem_lanes[x][y].eq(mem_lanes[x][y])
+                    m.d.comb += bottom_lanes[x][y].eq(midStack.out_bottom_lanes[x][y])
+                m.d.comb += midStack.in_stack_pushpop[x].eq(pushpops[x])
+                m.d.comb += midStack.in_stack_extra[x].eq(extras[x])
+            for x in range(self._writeback_count):
+                m.d.comb += midStack.in_writeback[x].eq(self.in_writeback[x])
+            m.d.comb += region_tags.eq(topStack.out_tag_present | midStack.out_tag_present)
+
+        if self._checkpoint_count > 0:
+            checkpointFile = CheckpointFile(register_width=self._register_width, stack_depth=self._top_stack_depth+self._mid_stack_depth, checkpoint_count=self._checkpoint_count, tag_width=self._tag_width, writeback_count=self._writeback_count)
+            m.submodules += checkpointFile
+            self.checkpointFile = checkpointFile
+
+            for x in range(self._top_stack_depth):
+                m.d.comb += checkpointFile.in_state[x].eq(topStack.out_next_state[x])
+                m.d.comb += topStack.in_restore_state[x].eq(checkpointFile.out_restore_state[x])
+            for x in range(self._mid_stack_depth):
+                m.d.comb += checkpointFile.in_state[self._top_stack_depth+x].eq(midStack.out_next_state[x])
+                m.d.comb += midStack.in_restore_state[x].eq(checkpointFile.out_restore_state[self._top_stack_depth+x])
+
+            m.d.comb += checkpointFile.in_capture.eq(self.in_checkpoint)
+            m.d.comb += self.out_checkpoint_id.eq(checkpointFile.out_capture_id)
+            m.d.comb += self.out_checkpoint_full.eq(checkpointFile.out_full)
+            m.d.comb += checkpointFile.in_release.eq(self.in_checkpoint_release)
+            m.d.comb += checkpointFile.in_restore.eq(self.in_restore)
+            m.d.comb += checkpointFile.in_restore_id.eq(self.in_restore_id)
+            m.d.comb += topStack.in_restore.eq(checkpointFile.out_restore)
+            m.d.comb += midStack.in_restore.eq(checkpointFile.out_restore)
+            for x in range(self._writeback_count):
+                m.d.comb += checkpointFile.in_writeback[x].eq(self.in_writeback[x])
+            m.d.comb += self.out_tag_present.eq(region_tags | checkpointFile.out_tag_present)
+        else:
+            m.d.comb += self.out_tag_present.eq(region_tags)
 
         return m
+
+    def elaborateDoublePump(self, m: Module, mem_lanes, pushpops, extras, bottom_lanes, region_tags):
+        # The MidStack only shifts, so its stages are much shallower than the TopStack's swizzles. Here it is built
+        # with half of the stages and clocked by a "fast" domain at twice the rate of "sync", with the rising edges
+        # of "sync" aligned to every other edge of "fast". It runs the first half of the stages in the first half
+        # of each cycle, and the second half of the stages in the second half.
+        #
+        # Crossing between the domains:
+        #   - second_half is set from the middle of each cycle. It compares a bit toggled by "sync" against a copy
+        #     taken by "fast", so it needs no reset alignment between the domains.
+        #   - The MidStack's commands, pulled-up entries and the TopStack's bottoms are selected by second_half.
+        #   - The peeks, bottoms and tags present from the first half are held in "fast" registers, so that the
+        #     TopStack and the outputs see stable values for the whole cycle.
+        #   - Writebacks are only applied at the end of the cycle, as without double pumping. An entry that reaches
+        #     the TopStack in the second half has not been written back yet, and is matched there instead.
+        topStack, midStack = self.topStack, self.midStack
+        half = self._issue_stages // 2
+
+        toggle = Signal(1, name="pump_toggle")
+        toggle_seen = Signal(1, name="pump_toggle_seen")
+        second_half = Signal(1, name="pump_second_half")
+        m.d.sync += toggle.eq(~toggle)
+        m.d.fast += toggle_seen.eq(toggle)
+        m.d.comb += second_half.eq(toggle == toggle_seen)
+        self.pump_second_half = second_half
+
+        for x in range(half):
+            for y in range(self._move_width):
+                held_peek = Signal(self._register_layout, name="pump_peek_"+str(x)+"_"+str(y))
+                held_bottom = Signal(self._register_layout, name="pump_bottom_"+str(x)+"_"+str(y))
+                with m.If(~second_half):
+                    m.d.fast += held_peek.eq(midStack.out_peek_lanes[x][y])
+                    m.d.fast += held_bottom.eq(midStack.out_bottom_lanes[x][y])
+                m.d.comb += topStack.in_mem_lanes[x][y].eq(Mux(second_half, held_peek, midStack.out_peek_lanes[x][y]))
+                m.d.comb += topStack.in_mem_lanes[half+x][y].eq(midStack.out_peek_lanes[x][y])
+                m.d.comb += bottom_lanes[x][y].eq(Mux(second_half, held_bottom, midStack.out_bottom_lanes[x][y]))
+                m.d.comb += bottom_lanes[half+x][y].eq(midStack.out_bottom_lanes[x][y])
+
+                m.d.comb += midStack.in_push_lanes[x][y].eq(Mux(second_half, topStack.out_bottom_lanes[half+x][y], topStack.out_bottom_lanes[x][y]))
+                m.d.comb += midStack.in_mem_lanes[x][y].eq(Mux(second_half, mem_lanes[half+x][y], mem_lanes[x][y]))
+            m.d.comb += midStack.in_stack_pushpop[x].eq(Mux(second_half, pushpops[half+x], pushpops[x]))
+            m.d.comb += midStack.in_stack_extra[x].eq(Mux(second_half, extras[half+x], extras[x]))
+
+        for x in range(self._writeback_count):
+            m.d.comb += midStack.in_writeback[x].eq(Mux(second_half, self.in_writeback[x], 0))
+
+        held_tags = Signal(len(self.out_tag_present), name="pump_tag_present")
+        with m.If(~second_half):
+            m.d.fast += held_tags.eq(midStack.out_tag_present)
+        m.d.comb += region_tags.eq(topStack.out_tag_present | Mux(second_half, held_tags, midStack.out_tag_present))
+
+    def elaborateSparseIssue(self, m: Module):
+        # Internal copies of the per-stage ports, as seen by the regions after packing.
+        push = [Signal(self._register_layout, name="issue_push_"+str(x)) for x in range(self._issue_stages)]
+        mem_lanes = [[Signal(self._register_layout, name="issue_mem_"+str(x)+"_"+str(y)) for y in range(self._move_width)] for x in range(self._issue_stages)]
+        swizzles = [[Signal(s.shape(), name="issue_swizzle_"+str(x)+"_"+str(y)) for y, s in enumerate(self.in_stack_swizzle[x])] for x in range(self._issue_stages)]
+        pushpops = [Signal(MidStackCommand, name="issue_pushpop_"+str(x)) for x in range(self._issue_stages)]
+        extras = [Signal(range(self._move_width), name="issue_extra_"+str(x)) for x in range(self._issue_stages)]
+        peeks = [[Signal(self._register_layout, name="issue_peek_"+str(x)+"_"+str(y)) for y in range(2)] for x in range(self._issue_stages)]
+        bottom_lanes = [[Signal(self._register_layout, name="issue_bottom_"+str(x)+"_"+str(y)) for y in range(self._move_width)] for x in range(self._issue_stages)]
+
+        # Each stage's command and inputs are packed as a single lane of the Compactor.
+        def command(x, swizzles, pushpops, extras, push, mem_lanes):
+            return Cat(*swizzles[x], pushpops[x], extras[x], push[x], *mem_lanes[x])
+        width = len(command(0, swizzles, pushpops, extras, push, mem_lanes))
+        compactor = Compactor(width=width, count=self._issue_stages)
+        m.submodules += compactor
+        self.compactor = compactor
+        for x in range(self._issue_stages):
+            m.d.comb += compactor.input[x].eq(command(x, self.in_stack_swizzle, self.in_stack_pushpop, self.in_stack_extra, self.in_push, self.in_mem_lanes))
+            m.d.comb += compactor.input_en[x].eq(self.in_stage_valid[x])
+        m.d.comb += self.out_active_stages.eq(compactor.output_count)
+
+        # Stages past the packed commands feed forward.
+        swizzle_width = sum(len(s) for s in swizzles[0])
+        for x in range(self._issue_stages):
+            feed_forward = Cat(*(Const(y, len(s)) for y, s in enumerate(swizzles[x])), Const(0, width-swizzle_width))
+            packed = compactor.output_val[x*width:(x+1)*width]
+            m.d.comb += command(x, swizzles, pushpops, extras, push, mem_lanes).eq(Mux(x < compactor.output_count, packed, feed_forward))
+
+        # Scatter the outputs of each packed stage back to the stage it came from.
+        def outputs(x, peeks, bottom_lanes):
+            return Cat(*peeks[x], *bottom_lanes[x])
+        width = len(outputs(0, peeks, bottom_lanes))
+        expander = Expander(width=width, count=self._issue_stages)
+        m.submodules += expander
+        self.expander = expander
+        m.d.comb += expander.input_val.eq(Cat(*(outputs(x, peeks, bottom_lanes) for x in range(self._issue_stages))))
+        for x in range(self._issue_stages):
+            m.d.comb += expander.input_en[x].eq(self.in_stage_valid[x])
+            m.d.comb += outputs(x, self.out_peek, self.out_bottom_lanes).eq(expander.output[x])
+
+        return push, mem_lanes, swizzles, pushpops, extras, peeks, bottom_lanes
+
+    # Testing helpers
+    def activityGroups(self):
+        # Groups for the stacks grids of both regions, which are only available after elaboration.
+        return {**self.topStack.activityGroups("top_"), **self.midStack.activityGroups("mid_")}
+
+    def applyBundle(self, stages, writebacks=()):
+        # Drive one cycle given as (swizzle, pushpop, push, mem[, extra]) per stage, with entries as (val, tag)
+        # tuples, as accepted by SSIAModel.stage(). mem may also be a list of entries, one per lane. Stages that
+        # are not given feed forward.
+        for stage in range(self._issue_stages):
+            if stage < len(stages):
+                swizzle, pushpop, push, mem, *extra = stages[stage]
+                for slot in range(self._top_stack_depth):
+                    yield self.in_stack_swizzle[stage][slot].eq(swizzle[slot])
+                yield self.in_stack_pushpop[stage].eq(pushpop)
+                yield self.in_stack_extra[stage].eq(extra[0] if extra else 0)
+            else:
+                yield from self.feedForwardAtStage(stage)
+                push = mem = (0, 0)
+            yield self.in_push[stage].eq(push[0] | (push[1] << self._register_width))
+            lanes = mem if isinstance(mem, list) else [mem]
+            for y in range(self._move_width):
+                val, tag = lanes[y] if y < len(lanes) else (0, 0)
+                yield self.in_mem_lanes[stage][y].eq(val | (tag << self._register_width))
+        for x in range(self._writeback_count):
+            val, tag = writebacks[x] if x < len(writebacks) else (0, 0)
+            yield self.in_writeback[x].eq(val | (tag << self._register_width))
+
+    def _stateConfig(self):
+        return {
+            "register_width": self._register_width,
+            "top_stack_depth": self._top_stack_depth,
+            "mid_stack_depth": self._mid_stack_depth,
+            "tag_width": self._tag_width,
+            "checkpoint_count": self._checkpoint_count,
+        }
+
+    def _stateRegisters(self):
+        # Latched state other than the stack regions, by name. The double pump registers are not included, as they
+        # are reloaded in the first half of every cycle.
+        registers = {}
+        if self._checkpoint_count > 0:
+            for n, copy in enumerate(self.checkpointFile.checkpoints):
+                for d, slot in enumerate(copy):
+                    registers["checkpoint_"+str(n)+"_"+str(d)] = slot
+            for name, counter in self.checkpointFile.counters.items():
+                registers["checkpoint_"+name] = counter
+        return registers
+
+    def dumpState(self, cycle: int = 0):
+        # Read the latched state as a Snapshot. Call between cycles, before any inputs of the next cycle are driven.
+        def entry(slot):
+            value = yield slot.as_value()
+            return (value & ((1 << self._register_width) - 1), value >> self._register_width)
+        yield Settle()
+        snapshot = Snapshot(self._stateConfig(), cycle)
+        for slot in self.topStack.stacks[0]:
+            snapshot.top.append((yield from entry(slot)))
+        for slot in self.midStack.stacks[0]:
+            snapshot.mid.append((yield from entry(slot)))
+        for name, register in self._stateRegisters().items():
+            snapshot.registers[name] = yield Value.cast(register)
+        return snapshot
+
+    def loadState(self, snapshot: Snapshot):
+        # Overwrite the latched state from a Snapshot, e.g. straight after the simulation starts. Registers missing
+        # from the snapshot, such as those of a snapshot taken from SSIAModel, are cleared.
+        snapshot.checkConfig(self._stateConfig())
+        yield Settle()
+        for slot, (val, tag) in zip(self.topStack.stacks[0], snapshot.top):
+            yield slot.eq(val | (tag << self._register_width))
+        for slot, (val, tag) in zip(self.midStack.stacks[0], snapshot.mid):
+            yield slot.eq(val | (tag << self._register_width))
+        for name, register in self._stateRegisters().items():
+            yield register.eq(snapshot.registers.get(name, 0))
+
+    def zeroAllInputs(self):
+        for i in self.in_mem:
+            yield i.eq(0)
+        for i in self.in_push:
+            yield i.eq(0)
+        for i in self.in_stack_swizzle:
+            for j in i:
+                yield j.eq(0)
+        for i in self.in_stack_pushpop:
+            yield i.eq(0)
+        for i in self.in_stack_extra:
+            yield i.eq(0)
+        for i in self.in_mem_lanes:
+            for j in i:
+                yield j.eq(0)
+        for i in self.in_writeback:
+            yield i.eq(0)
+        if self._sparse_issue:
+            for i in self.in_stage_valid:
+                yield i.eq(1)
+        if self._checkpoint_count > 0:
+            yield self.in_checkpoint.eq(0)
+            yield self.in_checkpoint_release.eq(0)
+            yield self.in_restore.eq(0)
+            yield self.in_restore_id.eq(0)
+
+    def feedForwardAtStage(self, stage: int):
+        for slot in range(self._top_stack_depth):
+            yield self.in_stack_swizzle[stage][slot].eq(slot)
+        yield self.in_stack_pushpop[stage].eq(MidStackCommand.NOP)
+        yield self.in_stack_extra[stage].eq(0)
+
+    def feedForwardAllStages(self):
+        for stage in range(self._issue_stages):
+            yield from self.feedForwardAtStage(stage)
+
+    def pushStackAtStage(self, stage: int):
+        for slot in range(self._top_stack_depth):
+            if slot == 0:
+                yield self.in_stack_swizzle[stage][slot].eq(self._top_stack_depth)
+            else:
+                yield self.in_stack_swizzle[stage][slot].eq(slot-1)
+        yield self.in_stack_pushpop[stage].eq(MidStackCommand.PUSH)
+        yield self.in_stack_extra[stage].eq(0)
+
+    def pushStackAllStages(self):
+        for stage in range(self._issue_stages):
+            yield from self.pushStackAtStage(stage)
+
+    def popStackAtStage(self, stage: int, count: int = 1):
+        for slot in range(self._top_stack_depth):
+            yield self.in_stack_swizzle[stage][slot].eq(slot+count)
+        yield self.in_stack_pushpop[stage].eq(MidStackCommand.POP)
+        yield self.in_stack_extra[stage].eq(count-1)
+
+    def popStackAllStages(self, count: int = 1):
+        for stage in range(self._issue_stages):
+            yield from self.popStackAtStage(stage, count)
     
 if __name__ == '__main__':
-    ssia = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1)
+    ssia = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1, checkpoint_count=2)
     with open('ssia.v', 'w') as f:
         def asValue(v):
             return v.as_value()
-        f.write(verilog.convert(ssia,
-                                ports = [
-                                         *map(asValue, ssia.in_push),
-                                         *map(asValue, ssia.in_mem),
-                                         *sum(ssia.in_stack_swizzle, []),
-                                         *ssia.in_stack_pushpop,
-                                         *map(asValue, sum(ssia.out_peek, [])),
-                                         *map(asValue, ssia.out_bottom),
-                                         *map(asValue, ssia.in_writeback),
-                                        ]))
\ No newline at end of file
+        ports = [
+                 *map(asValue, ssia.in_push),
+                 *map(asValue, sum(ssia.in_mem_lanes, [])),
+                 *sum(ssia.in_stack_swizzle, []),
+                 *ssia.in_stack_pushpop,
+                 *ssia.in_stack_extra,
+                 *map(asValue, sum(ssia.out_peek, [])),
+                 *map(asValue, sum(ssia.out_bottom_lanes, [])),
+                 *map(asValue, ssia.in_writeback),
+                 ssia.out_tag_present,
+                ]
+        if ssia._sparse_issue:
+            ports += [*ssia.in_stage_valid, ssia.out_active_stages]
+        if ssia._checkpoint_count > 0:
+            ports += [
+                      ssia.in_checkpoint,
+                      ssia.out_checkpoint_id,
+                      ssia.out_checkpoint_full,
+                      ssia.in_checkpoint_release,
+                      ssia.in_restore,
+                      ssia.in_restore_id,
+                     ]
+        f.write(verilog.convert(ssia, ports=ports))
\ No newline at end of file
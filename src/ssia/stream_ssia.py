@@ -0,0 +1,199 @@
+from amaranth import *
+from amaranth.hdl import *
+from amaranth.back import verilog
+from amaranth.lib.data import StructLayout, ArrayLayout
+from ssia.ssia import SSIA
+from ssia.mid_stack import MidStackCommand
+from ssia.skid_buffer import SkidBuffer
+from ssia.expander import Expander
+
+# StreamSSIA wraps SSIA in valid/ready streams so that it can sit behind variable-latency producers. A bundle
+# issues only when it is valid, the fill data for its pops is valid, and the spill stream can accept the entries
+# its pushes evict. Otherwise SSIA is fed a feed-forward bundle, which leaves the stack unchanged while
+# writebacks continue to drain. Every stream passes through a SkidBuffer, so no ready signal is combinationally
+# dependent on another stream.
+class StreamSSIA(Elaboratable):
+    def __init__(self, register_width: int, top_stack_depth: int, mid_stack_depth: int, issue_stages: int, tag_width: int, writeback_count: int):
+        self._register_width = register_width
+        self._top_stack_depth = top_stack_depth
+        self._mid_stack_depth = mid_stack_depth
+        self._issue_stages = issue_stages
+        self._tag_width = tag_width
+        self._writeback_count = writeback_count
+        self._register_layout = StructLayout({
+            "val": register_width,
+            "tag": tag_width,
+        })
+
+        # in_bundle: one issue bundle per transfer. Swizzles and pushpop commands are encoded as in SSIA.
+        self._bundle_layout = StructLayout({
+            "push": ArrayLayout(self._register_layout, issue_stages),
+            "swizzle": ArrayLayout(ArrayLayout(range(top_stack_depth+1), top_stack_depth), issue_stages),
+            "pushpop": ArrayLayout(MidStackCommand, issue_stages),
+        })
+        self.in_bundle = Signal(self._bundle_layout, name="in_bundle")
+        self.in_bundle_valid = Signal(1, name="in_bundle_valid")
+        self.in_bundle_ready = Signal(1, name="in_bundle_ready")
+
+        # in_writeback: writeback_count register+tag per transfer
+        self.in_writeback = Signal(ArrayLayout(self._register_layout, writeback_count), name="in_writeback")
+        self.in_writeback_valid = Signal(1, name="in_writeback_valid")
+        self.in_writeback_ready = Signal(1, name="in_writeback_ready")
+
+        # in_mem: the fill entries for one bundle that pops, one transfer per such bundle. The entries are packed in
+        # pop order, so entry i goes to the i-th stage of the bundle that pops, and entries past the bundle's number
+        # of pops are discarded. The memory side only needs to know how many entries to send, not which stages pop.
+        self.in_mem = Signal(ArrayLayout(self._register_layout, issue_stages), name="in_mem")
+        self.in_mem_valid = Signal(1, name="in_mem_valid")
+        self.in_mem_ready = Signal(1, name="in_mem_ready")
+
+        # out_bottom: the entries evicted by each bundle that pushes. Bit x of mask is set if stage x spilled.
+        self._spill_layout = StructLayout({
+            "bottom": ArrayLayout(self._register_layout, issue_stages),
+            "mask": issue_stages,
+        })
+        self.out_bottom = Signal(self._spill_layout, name="out_bottom")
+        self.out_bottom_valid = Signal(1, name="out_bottom_valid")
+        self.out_bottom_ready = Signal(1, name="out_bottom_ready")
+
+        # out_peek: two register+tag per issue stage that are the two top-most entries in the stack
+        self.out_peek = [[Signal(self._register_layout, name = "out_peek_"+str(y)+"_"+str(x)) for x in range(2)] for y in range(issue_stages)]
+
+        # out_issue: set in cycles where the bundle presented to SSIA was issued
+        self.out_issue = Signal(1, name="out_issue")
+
+    def elaborate(self, platform):
+        m = Module()
+
+        ssia = SSIA(register_width=self._register_width, top_stack_depth=self._top_stack_depth, mid_stack_depth=self._mid_stack_depth, issue_stages=self._issue_stages, tag_width=self._tag_width, writeback_count=self._writeback_count)
+        m.submodules.ssia = ssia
+
+        bundle_buffer = SkidBuffer(self._bundle_layout)
+        m.submodules.bundle_buffer = bundle_buffer
+        writeback_buffer = SkidBuffer(ArrayLayout(self._register_layout, self._writeback_count))
+        m.submodules.writeback_buffer = writeback_buffer
+        mem_buffer = SkidBuffer(ArrayLayout(self._register_layout, self._issue_stages))
+        m.submodules.mem_buffer = mem_buffer
+        bottom_buffer = SkidBuffer(self._spill_layout)
+        m.submodules.bottom_buffer = bottom_buffer
+
+        m.d.comb += [
+            bundle_buffer.in_payload.eq(self.in_bundle),
+            bundle_buffer.in_valid.eq(self.in_bundle_valid),
+            self.in_bundle_ready.eq(bundle_buffer.in_ready),
+            writeback_buffer.in_payload.eq(self.in_writeback),
+            writeback_buffer.in_valid.eq(self.in_writeback_valid),
+            self.in_writeback_ready.eq(writeback_buffer.in_ready),
+            mem_buffer.in_payload.eq(self.in_mem),
+            mem_buffer.in_valid.eq(self.in_mem_valid),
+            self.in_mem_ready.eq(mem_buffer.in_ready),
+            self.out_bottom.eq(bottom_buffer.out_payload),
+            self.out_bottom_valid.eq(bottom_buffer.out_valid),
+            bottom_buffer.out_ready.eq(self.out_bottom_ready),
+        ]
+
+        bundle = bundle_buffer.out_payload
+        pops = Cat(*[bundle.pushpop[x] == MidStackCommand.POP for x in range(self._issue_stages)])
+        pushes = Cat(*[bundle.pushpop[x] == MidStackCommand.PUSH for x in range(self._issue_stages)])
+
+        # Issue only when every stream the bundle touches can make progress.
+        issue = Signal(1, name="issue")
+        m.d.comb += issue.eq(bundle_buffer.out_valid & ((pops == 0) | mem_buffer.out_valid) & ((pushes == 0) | bottom_buffer.in_ready))
+        m.d.comb += self.out_issue.eq(issue)
+        m.d.comb += bundle_buffer.out_ready.eq(issue)
+        m.d.comb += mem_buffer.out_ready.eq(issue & (pops != 0))
+        m.d.comb += bottom_buffer.in_valid.eq(issue & (pushes != 0))
+
+        for x in range(self._issue_stages):
+            with m.If(issue):
+                m.d.comb += ssia.in_push[x].eq(bundle.push[x])
+                for y in range(self._top_stack_depth):
+                    m.d.comb += ssia.in_stack_swizzle[x][y].eq(bundle.swizzle[x][y])
+                m.d.comb += ssia.in_stack_pushpop[x].eq(bundle.pushpop[x])
+            with m.Else():
+                for y in range(self._top_stack_depth):
+                    m.d.comb += ssia.in_stack_swizzle[x][y].eq(y)
+                m.d.comb += ssia.in_stack_pushpop[x].eq(MidStackCommand.NOP)
+            m.d.comb += bottom_buffer.in_payload.bottom[x].eq(ssia.out_bottom[x])
+            for y in range(2):
+                m.d.comb += self.out_peek[x][y].eq(ssia.out_peek[x][y])
+        m.d.comb += bottom_buffer.in_payload.mask.eq(pushes)
+
+        # Scatter the packed fill entries to the stages that pop.
+        expander = Expander(width=Shape.cast(self._register_layout).width, count=self._issue_stages)
+        m.submodules.mem_expander = expander
+        m.d.comb += expander.input_val.eq(mem_buffer.out_payload)
+        for x in range(self._issue_stages):
+            m.d.comb += expander.input_en[x].eq(pops[x])
+            m.d.comb += ssia.in_mem[x].eq(expander.output[x])
+
+        # Writebacks do not move the stack, so they drain every cycle regardless of issue.
+        m.d.comb += writeback_buffer.out_ready.eq(1)
+        for x in range(self._writeback_count):
+            with m.If(writeback_buffer.out_valid):
+                m.d.comb += ssia.in_writeback[x].eq(writeback_buffer.out_payload[x])
+
+        return m
+
+    # Testing helpers
+    def zeroAllInputs(self):
+        yield self.in_bundle.eq(0)
+        yield self.in_bundle_valid.eq(0)
+        yield self.in_writeback.eq(0)
+        yield self.in_writeback_valid.eq(0)
+        yield self.in_mem.eq(0)
+        yield self.in_mem_valid.eq(0)
+        yield self.out_bottom_ready.eq(0)
+
+    def feedForwardAtStage(self, stage: int):
+        for slot in range(self._top_stack_depth):
+            yield self.in_bundle.swizzle[stage][slot].eq(slot)
+        yield self.in_bundle.pushpop[stage].eq(MidStackCommand.NOP)
+
+    def feedForwardAllStages(self):
+        for stage in range(self._issue_stages):
+            yield from self.feedForwardAtStage(stage)
+
+    def pushStackAtStage(self, stage: int):
+        for slot in range(self._top_stack_depth):
+            if slot == 0:
+                yield self.in_bundle.swizzle[stage][slot].eq(self._top_stack_depth)
+            else:
+                yield self.in_bundle.swizzle[stage][slot].eq(slot-1)
+        yield self.in_bundle.pushpop[stage].eq(MidStackCommand.PUSH)
+
+    def pushStackAllStages(self):
+        for stage in range(self._issue_stages):
+            yield from self.pushStackAtStage(stage)
+
+    def popStackAtStage(self, stage: int):
+        for slot in range(self._top_stack_depth):
+            yield self.in_bundle.swizzle[stage][slot].eq(slot+1)
+        yield self.in_bundle.pushpop[stage].eq(MidStackCommand.POP)
+
+    def popStackAllStages(self):
+        for stage in range(self._issue_stages):
+            yield from self.popStackAtStage(stage)
+
+if __name__ == '__main__':
+    stream_ssia = StreamSSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1)
+    with open('stream_ssia.v', 'w') as f:
+        def asValue(v):
+            return v.as_value()
+        f.write(verilog.convert(stream_ssia,
+                                ports = [
+                                         stream_ssia.in_bundle.as_value(),
+                                         stream_ssia.in_bundle_valid,
+                                         stream_ssia.in_bundle_ready,
+                                         stream_ssia.in_writeback.as_value(),
+                                         stream_ssia.in_writeback_valid,
+                                         stream_ssia.in_writeback_ready,
+                                         stream_ssia.in_mem.as_value(),
+                                         stream_ssia.in_mem_valid,
+                                         stream_ssia.in_mem_ready,
+                                         stream_ssia.out_bottom.as_value(),
+                                         stream_ssia.out_bottom_valid,
+                                         stream_ssia.out_bottom_ready,
+                                         *map(asValue, sum(stream_ssia.out_peek, [])),
+                                         stream_ssia.out_issue,
+                                        ]))
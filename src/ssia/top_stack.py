@@ -2,6 +2,7 @@ from amaranth import *
 from amaranth.hdl import *
 from amaranth.back import verilog
 from amaranth.lib.data import StructLayout
+from amaranth.lib.coding import Decoder
 
 # TopStack is the hot zone at the very top of the processor's stack. It supports delayed writebacks, as well
 # as arbitary swizzling of its contents at each input stage. Increasing the depth of this portion of the stack
@@ -12,8 +13,22 @@ class TopStack(Elaboratable):
     # issue_stages: the number of instructions to be issued in a single cycle
     # tag_width: the number of bits to use to tag unretired instructions
     # writeback_count: the number of values that can be retired in a single cycle
-    def __init__(self, register_width: int, stack_depth: int, issue_stages: int, tag_width: int, writeback_count: int):
+    # onehot_swizzle: decode each swizzle to one-hot once and select through an AND-OR crossbar, rather than
+    #   building a binary-indexed mux per slot. This maps to shallower logic at larger stack depths.
+    # move_width: the maximum number of entries that can be spilled to or pulled up from the region below in a
+    #   single stage, see MidStack
+    # value_lanes: the number of independent lanes to slice the val field into. Each lane is swizzled by its own
+    #   copy of the swizzle selects, so that no single select fans out to the full register_width. The tag is
+    #   swizzled by the original selects.
+    def __init__(self, register_width: int, stack_depth: int, issue_stages: int, tag_width: int, writeback_count: int,
+                 onehot_swizzle: bool = False, move_width: int = 1, value_lanes: int = 1):
+        assert 1 <= move_width < stack_depth
+        assert 1 <= value_lanes <= register_width
         self._stack_depth = stack_depth
+        self._register_width = register_width
+        self._value_lanes = value_lanes
+        self._move_width = move_width
+        self._onehot_swizzle = onehot_swizzle
         self._tag_width = tag_width
         self._issue_stages = issue_stages
         self._register_layout = StructLayout({
@@ -32,11 +47,15 @@ class TopStack(Elaboratable):
         # bits. Values 0 to stack_depth-1 encode the corresponding stack slot from the prior stage. Value
         # stack_depth is only value for the first and last swizzle, and encode selecting the values of
         # in_push and in_mem respectively.
+        # With a move_width of k, the bottom k swizzles instead have values up to stack_depth+k-1, where value
+        # stack_depth+i selects lane i of in_mem.
         self.in_stack_swizzle = []
         for s in range(issue_stages):
             single_swizzle = []
             for d in range(stack_depth):
-                if d == 0 or d == stack_depth-1:
+                if d >= stack_depth-move_width:
+                    single_swizzle.append(Signal(range(stack_depth+move_width), name="in_swizzle_"+str(s)+"_"+str(d)))
+                elif d == 0:
                     single_swizzle.append(Signal(range(stack_depth+1), name="in_swizzle_"+str(s)+"_"+str(d)))
                 else:
                     single_swizzle.append(Signal(range(stack_depth), name="in_swizzle_"+str(s)+"_"+str(d)))
@@ -50,6 +69,27 @@ class TopStack(Elaboratable):
 
         # in_writeback: writeback_count register+tag which are tag-matched and written back each cycle
         self.in_writeback = [Signal(self._register_layout, name="in_cdb_"+str(x)) for x in range(writeback_count)]
+
+        # Lanes of the multi-entry ports, ordered as in MidStack. in_mem_lanes[s][0] is in_mem[s], and so on.
+        # in_mem_lanes: pulled-up entries, where lane i is the i-th entry from the top of the region below
+        # out_bottom_lanes: lane i is stack slot stack_depth-1-i
+        self.in_mem_lanes = [[self.in_mem[x]] + [Signal(self._register_layout, name="in_mem_"+str(x)+"_"+str(y)) for y in range(1, move_width)] for x in range(issue_stages)]
+        self.out_bottom_lanes = [[self.out_bottom[x]] + [Signal(self._register_layout, name="out_bottom"+str(x)+"_"+str(y)) for y in range(1, move_width)] for x in range(issue_stages)]
+
+        # out_next_state: the register+tag of each stack slot that will be latched at the next clock
+        self.out_next_state = [Signal(self._register_layout, name="out_next_state_"+str(x)) for x in range(stack_depth)]
+
+        # in_restore: when set, the latched stack is replaced by in_restore_state instead of the result of this cycle
+        self.in_restore = Signal(1, name="in_restore")
+        self.in_restore_state = [Signal(self._register_layout, name="in_restore_state_"+str(x)) for x in range(stack_depth)]
+
+        # out_slot_we: one write enable per stack slot, set when the latched slot changes by construction. This is the
+        # case when the stages leave another entry in the slot, a writeback matches it, or a restore is applied. A
+        # slot whose enable is clear keeps its value, so the enables can gate the clock of each slot's registers.
+        self.out_slot_we = [Signal(1, name="out_slot_we_"+str(x)) for x in range(stack_depth)]
+
+        # out_tag_present: one bit per tag value, set when a latched slot holds an entry with that tag
+        self.out_tag_present = Signal(2**tag_width, name="out_tag_present")
     
     def elaborate(self, platform):
         m = Module()
@@ -57,51 +97,149 @@ class TopStack(Elaboratable):
         # Stacks is a (S+1) x D grid of signals. The outer dimension is time, the inner dimension
         # is stack depth. Only the first stage (time = 0) is latched.
         stacks = [[Signal(self._register_layout, name="stack_"+str(y)+"_"+str(x)) for x in range(self._stack_depth)] for y in range(self._issue_stages+1)]
+        self.stacks = stacks
+
+        # Origins tracks which latched slot each slot of the stacks grid holds, alongside the values. Origin
+        # stack_depth marks an entry from in_push or in_mem.
+        origins = [[Signal(range(self._stack_depth+1), name="origin_"+str(y)+"_"+str(x)) for x in range(self._stack_depth)] for y in range(self._issue_stages+1)]
+        for d in range(self._stack_depth):
+            m.d.comb += origins[0][d].eq(d)
 
         for stage in range(self._issue_stages):
-            # The top slot can be any swizzle of the slots, or a pushed value.
-            first_mux = Array([*stacks[stage], Cat(self.in_push[stage], Const(1, self._tag_width))])
-            m.d.comb += stacks[stage+1][0].eq(first_mux[self.in_stack_swizzle[stage][0]])
+            # Each stage is elaborated as its own submodule. The RTLIL backend filters every statement of a module
+            # once per group of signals assigned together, so this keeps conversion time linear in issue_stages.
+            stage_m = Module()
+            m.submodules["stage_"+str(stage)] = stage_m
+
+            if self._onehot_swizzle:
+                self.elaborateOnehotStage(stage_m, stacks, origins, stage)
+            else:
+                # The origin muxes mirror the binary-indexed value muxes, including out-of-range swizzles.
+                first_origin = Array([*origins[stage], self._stack_depth])
+                for d in range(self._stack_depth-self._move_width):
+                    stage_m.d.comb += origins[stage+1][d].eq(first_origin[self.in_stack_swizzle[stage][d]])
+                last_origin = Array([*origins[stage], *[self._stack_depth]*self._move_width])
+                for d in range(self._stack_depth-self._move_width, self._stack_depth):
+                    stage_m.d.comb += origins[stage+1][d].eq(last_origin[self.in_stack_swizzle[stage][d]])
 
-            # Intermediary slots can be any swizzle of the slots.
-            for d in range(self._stack_depth-2):
-                mux = Array(stacks[stage])
-                m.d.comb += stacks[stage+1][d+1].eq(first_mux[self.in_stack_swizzle[stage][d+1]])
+                for part, swizzle in self.elaborateLanes(stage_m, stage):
+                    # The top slot can be any swizzle of the slots, or a pushed value. Pushed values keep their own
+                    # tag, and every element has the width of a slot, so that no assignment needs to slice the proxy.
+                    first_mux = Array([*map(part, stacks[stage]), part(self.in_push[stage])])
+                    stage_m.d.comb += part(stacks[stage+1][0]).eq(first_mux[swizzle[0]])
 
-            # The bottom slot can be any swizzle of the slots, or the top value from the tidal stack.
-            last_mux = Array([*stacks[stage], self.in_mem[stage]])
-            m.d.comb += stacks[stage+1][self._stack_depth-1].eq(last_mux[self.in_stack_swizzle[stage][self._stack_depth-1]])
+                    # Intermediary slots can be any swizzle of the slots.
+                    for d in range(self._stack_depth-1-self._move_width):
+                        stage_m.d.comb += part(stacks[stage+1][d+1]).eq(first_mux[swizzle[d+1]])
+
+                    # The bottom slots can be any swizzle of the slots, or the top values from the tidal stack.
+                    last_mux = Array([*map(part, stacks[stage]), *map(part, self.in_mem_lanes[stage])])
+                    for d in range(self._stack_depth-self._move_width, self._stack_depth):
+                        stage_m.d.comb += part(stacks[stage+1][d]).eq(last_mux[swizzle[d]])
 
             # Expose the top two stack entries at each stage as a "peek" values.
             for i in range(2):
-                m.d.comb += self.out_peek[stage][i].eq(stacks[stage][i])
+                stage_m.d.comb += self.out_peek[stage][i].eq(stacks[stage][i])
             
-            # Expose the bottom entry at each stage to the tidal stack.
-            m.d.comb += self.out_bottom[stage].eq(stacks[stage][self._stack_depth-1])
+            # Expose the bottom entries at each stage to the tidal stack.
+            for i in range(self._move_width):
+                stage_m.d.comb += self.out_bottom_lanes[stage][i].eq(stacks[stage][self._stack_depth-1-i])
         
         # Latch the final stage back to the concrete stack.
         for d in range(self._stack_depth):
             writeback_val = stacks[self._issue_stages][d]
 
             # Check for value write-backs before latching.
+            written_back = 0
             for c in self.in_writeback:
                 writeback_matched = (c['tag'] != 0) & (c['tag'] == stacks[self._issue_stages][d]['tag'])
                 writeback_val = Mux(writeback_matched, Cat(c['val'], Const(1, self._tag_width)), writeback_val)
-            m.d.sync += stacks[0][d].eq(writeback_val)
+                written_back = written_back | writeback_matched
+
+            # A restore discards the result of this cycle in favor of the checkpointed state.
+            m.d.comb += self.out_next_state[d].eq(Mux(self.in_restore, self.in_restore_state[d], writeback_val))
+            m.d.comb += self.out_slot_we[d].eq((origins[self._issue_stages][d] != d) | written_back | self.in_restore)
+            with m.If(self.out_slot_we[d]):
+                m.d.sync += stacks[0][d].eq(self.out_next_state[d])
 
+        # Decode the tag of every latched slot for out_tag_present.
+        tag_present = 0
+        for d in range(self._stack_depth):
+            tag_present = tag_present | (Const(1, len(self.out_tag_present)) << stacks[0][d]['tag'])
+        m.d.comb += self.out_tag_present.eq(tag_present)
         return m
 
+    def elaborateLanes(self, m: Module, stage: int):
+        # Returns a (part, swizzle) pair per lane, where part() gives the lane's slice of an entry and swizzle the
+        # selects for each slot. With a single lane, the part is the whole entry. Otherwise each val lane gets a
+        # replicated copy of the selects, kept through synthesis so that the copies can be placed next to the lane.
+        if self._value_lanes == 1:
+            return [(lambda x: x, self.in_stack_swizzle[stage])]
+        lanes = []
+        bounds = [(l * self._register_width) // self._value_lanes for l in range(self._value_lanes+1)]
+        for l in range(self._value_lanes):
+            swizzle = [Signal.like(x, name="lane_swizzle_"+str(l)+"_"+str(stage)+"_"+str(d), attrs={"keep": 1}) for d, x in enumerate(self.in_stack_swizzle[stage])]
+            for copy, x in zip(swizzle, self.in_stack_swizzle[stage]):
+                m.d.comb += copy.eq(x)
+            lanes.append((lambda x, lo=bounds[l], hi=bounds[l+1]: x.as_value()[lo:hi], swizzle))
+        lanes.append((lambda x: x.as_value()[self._register_width:], self.in_stack_swizzle[stage]))
+        return lanes
+
+    def elaborateOnehotStage(self, m: Module, stacks, origins, stage: int):
+        lanes = self.elaborateLanes(m, stage)
+        for l, (part, swizzle) in enumerate(lanes):
+            width = len(Value.cast(part(stacks[stage][0])))
+            for d in range(self._stack_depth):
+                # The top slot can additionally select the pushed value, and the bottom slots the top values from
+                # the tidal stack, exactly as in the binary-indexed muxes.
+                sources = [Value.cast(part(x)) for x in stacks[stage]]
+                if d >= self._stack_depth-self._move_width:
+                    sources += [Value.cast(part(x)) for x in self.in_mem_lanes[stage]]
+                elif d == 0:
+                    sources.append(Value.cast(part(self.in_push[stage])))
+
+                decoder = Decoder(len(sources))
+                m.submodules += decoder
+                m.d.comb += decoder.i.eq(swizzle[d])
+
+                crossbar = 0
+                for i, source in enumerate(sources):
+                    crossbar = crossbar | (source & decoder.o[i].replicate(width))
+                m.d.comb += part(stacks[stage+1][d]).eq(crossbar)
+
+                # The origins are taken from the same one-hot selects as the last lane, which uses the original
+                # swizzle. An out-of-range swizzle selects nothing and clears the slot, so it is marked as new.
+                if l == len(lanes)-1:
+                    origin = Mux(decoder.o == 0, self._stack_depth, 0)
+                    for i in range(len(sources)):
+                        origin = origin | Mux(decoder.o[i], origins[stage][i] if i < self._stack_depth else self._stack_depth, 0)
+                    m.d.comb += origins[stage+1][d].eq(origin)
+
     # Testing helpers
+    def activityGroups(self, prefix: str = ""):
+        # One group per slot of the stacks grid, which is only available after elaboration. Stage 0 is latched.
+        groups = {}
+        for stage, row in enumerate(self.stacks):
+            for d, slot in enumerate(row):
+                groups[prefix+"stack_"+str(stage)+"_"+str(d)] = [slot]
+        return groups
+
     def zeroAllInputs(self):
         for i in self.in_mem:
             yield i.eq(0)
         for i in self.in_push:
             yield i.eq(0)
+        for i in self.in_mem_lanes:
+            for j in i:
+                yield j.eq(0)
         for i in self.in_stack_swizzle:
             for j in i:
                 yield j.eq(0)
         for i in self.in_writeback:
             yield i.eq(0)
+        yield self.in_restore.eq(0)
+        for i in self.in_restore_state:
+            yield i.eq(0)
 
     def feedForwardAtStage(self, stage: int):
         stack_depth = len(self.in_stack_swizzle[stage])
@@ -124,14 +262,14 @@ class TopStack(Elaboratable):
         for stage in range(len(self.in_stack_swizzle)):
             yield from self.pushStackAtStage(stage)
 
-    def popStackAtStage(self, stage: int):
+    def popStackAtStage(self, stage: int, count: int = 1):
         stack_depth = len(self.in_stack_swizzle[stage])
         for slot in range(stack_depth):
-            yield self.in_stack_swizzle[stage][slot].eq(slot+1)
+            yield self.in_stack_swizzle[stage][slot].eq(slot+count)
 
-    def popStackAllStages(self):
+    def popStackAllStages(self, count: int = 1):
         for stage in range(len(self.in_stack_swizzle)):
-            yield from self.popStackAtStage(stage)
+            yield from self.popStackAtStage(stage, count)
 
 if __name__ == '__main__':
     top_stack = TopStack(register_width=32, stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1)
@@ -141,9 +279,14 @@ if __name__ == '__main__':
         f.write(verilog.convert(top_stack,
                                 ports = [
                                          *map(asValue, top_stack.in_push),
-                                         *map(asValue, top_stack.in_mem),
+                                         *map(asValue, sum(top_stack.in_mem_lanes, [])),
                                          *sum(top_stack.in_stack_swizzle, []),
                                          *map(asValue, sum(top_stack.out_peek, [])),
-                                         *map(asValue, top_stack.out_bottom),
+                                         *map(asValue, sum(top_stack.out_bottom_lanes, [])),
                                          *map(asValue, top_stack.in_writeback),
+                                         *map(asValue, top_stack.out_next_state),
+                                         top_stack.in_restore,
+                                         *map(asValue, top_stack.in_restore_state),
+                                         *top_stack.out_slot_we,
+                                         top_stack.out_tag_present,
                                         ]))
\ No newline at end of file
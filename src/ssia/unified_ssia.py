@@ -0,0 +1,175 @@
+from amaranth import *
+from amaranth.hdl import *
+from amaranth.back import verilog
+from amaranth.lib.data import StructLayout
+from ssia.mid_stack import MidStackCommand
+
+# UnifiedSSIA is a variant of SSIA that holds the whole stack in a single array of stack_depth slots, and places
+# the boundary between the full-swizzle hot zone and the shift-only region at run time. The top in_window slots
+# behave as a TopStack of depth in_window, and the slots below behave as a MidStack. Up to window_depth slots can
+# be built with full swizzles, but a shallow-swizzle workload can run with a small window, leaving the other
+# swizzle muxes idle.
+#
+# Because both regions share one array, changing in_window moves no entries: slots simply change which region
+# they belong to from the next stage on. Entries only cross the boundary when a stage pushes or pops.
+class UnifiedSSIA(Elaboratable):
+    # stack_depth: the number of stack entries held by the whole array
+    # window_depth: the largest window that can be selected by in_window
+    def __init__(self, register_width: int, stack_depth: int, window_depth: int, issue_stages: int, tag_width: int, writeback_count: int):
+        assert 2 <= window_depth < stack_depth
+        self._stack_depth = stack_depth
+        self._window_depth = window_depth
+        self._issue_stages = issue_stages
+        self._register_width = register_width
+        self._tag_width = tag_width
+        self._writeback_count = writeback_count
+        self._register_layout = StructLayout({
+            "val": register_width,
+            "tag": tag_width,
+        })
+
+        # in_window: the number of slots at the top of the stack with full swizzles, from 2 to window_depth. Values
+        # outside that range are clamped to it, since the window must hold both peeked entries.
+        self.in_window = Signal(range(window_depth+1), name="in_window", reset=window_depth)
+
+        # in_push: one register+tag per issue stage to possibly be pushed onto the stack
+        self.in_push = [Signal(self._register_layout, name="in_push_"+str(x)) for x in range(issue_stages)]
+
+        # in_mem: one register+tag per issue stage that is pulled up from lower in the stack
+        self.in_mem = [Signal(self._register_layout, name="in_mem_"+str(x)) for x in range(issue_stages)]
+
+        # in_swizzle: one swizzle per window slot per stage, encoded as for a TopStack of depth in_window. Values
+        # below in_window select the corresponding slot from the prior stage. Value in_window selects in_push for
+        # the first slot, and the top of the shift-only region for the last slot of the window. Swizzles of slots
+        # outside the window are ignored.
+        self.in_stack_swizzle = [[Signal(range(window_depth+1), name="in_swizzle_"+str(s)+"_"+str(d)) for d in range(window_depth)] for s in range(issue_stages)]
+
+        # in_pushpop: one nop/pop/push command per stage for the shift-only region, as for MidStack
+        self.in_stack_pushpop = [Signal(MidStackCommand, name="in_pushpop_"+str(s)) for s in range(issue_stages)]
+
+        # out_peek: two register+tag per issue stage that are the two top-most entries in the stack
+        self.out_peek = [[Signal(self._register_layout, name = "out_peek_"+str(y)+"_"+str(x)) for x in range(2)] for y in range(issue_stages)]
+
+        # out_bottom: one register+tag per issue stage that is the lowest entry in the stack
+        self.out_bottom = [Signal(self._register_layout, name="out_bottom"+str(x)) for x in range(issue_stages)]
+
+        # in_writeback: writeback_count register+tag which are tag-matched and written back each cycle
+        self.in_writeback = [Signal(self._register_layout, name="in_cdb_"+str(x)) for x in range(writeback_count)]
+
+    def elaborate(self, platform):
+        m = Module()
+
+        # Stacks is a (S+1) x D grid of signals. The outer dimension is time, the inner dimension
+        # is stack depth. Only the first stage (time = 0) is latched.
+        stacks = [[Signal(self._register_layout, name="stack_"+str(y)+"_"+str(x)) for x in range(self._stack_depth)] for y in range(self._issue_stages+1)]
+        self.stacks = stacks
+
+        window = Signal(range(self._window_depth+1), name="window")
+        m.d.comb += window.eq(Mux(self.in_window < 2, 2, Mux(self.in_window > self._window_depth, self._window_depth, self.in_window)))
+
+        for stage in range(self._issue_stages):
+            # Window slots can be any swizzle of the window, or the top of the shift-only region below it.
+            window_mux = Array(stacks[stage][:self._window_depth+1])
+            for d in range(self._stack_depth):
+                # Slots below the window shift as in MidStack, taking the bottom of the window on a PUSH.
+                if d+1 < self._stack_depth:
+                    popped = stacks[stage][d+1]
+                else:
+                    popped = self.in_mem[stage]
+                pushed = stacks[stage][d-1] if d > 0 else self.in_push[stage]
+                shifted = Mux(self.in_stack_pushpop[stage] == MidStackCommand.POP, popped,
+                              Mux(self.in_stack_pushpop[stage] == MidStackCommand.PUSH, pushed, stacks[stage][d]))
+
+                if d < self._window_depth:
+                    swizzle = self.in_stack_swizzle[stage][d]
+                    swizzled = window_mux[swizzle]
+                    if d == 0:
+                        swizzled = Mux(swizzle == window, self.in_push[stage], swizzled)
+                    m.d.comb += stacks[stage+1][d].eq(Mux(d < window, swizzled, shifted))
+                else:
+                    m.d.comb += stacks[stage+1][d].eq(shifted)
+
+            # Expose the top two stack entries at each stage as a "peek" values.
+            for i in range(2):
+                m.d.comb += self.out_peek[stage][i].eq(stacks[stage][i])
+
+            # Expose the bottom entry at each stage to the tidal stack.
+            m.d.comb += self.out_bottom[stage].eq(stacks[stage][self._stack_depth-1])
+
+        # Latch the final stage back to the concrete stack.
+        for d in range(self._stack_depth):
+            writeback_val = stacks[self._issue_stages][d]
+
+            # Check for value write-backs before latching.
+            for c in self.in_writeback:
+                writeback_matched = (c['tag'] != 0) & (c['tag'] == stacks[self._issue_stages][d]['tag'])
+                writeback_val = Mux(writeback_matched, Cat(c['val'], Const(1, self._tag_width)), writeback_val)
+
+            m.d.sync += stacks[0][d].eq(writeback_val)
+
+        return m
+
+    # Testing helpers
+    def activityGroups(self, prefix: str = ""):
+        # One group per slot of the stacks grid, which is only available after elaboration. Stage 0 is latched.
+        groups = {}
+        for stage, row in enumerate(self.stacks):
+            for d, slot in enumerate(row):
+                groups[prefix+"stack_"+str(stage)+"_"+str(d)] = [slot]
+        return groups
+
+    def applyBundle(self, stages, writebacks=()):
+        # Drive one cycle given as (swizzle, pushpop, push, mem) per stage, as for SSIA.applyBundle(). Swizzles are
+        # encoded for a TopStack of depth in_window, and may be shorter than window_depth.
+        for stage in range(self._issue_stages):
+            if stage < len(stages):
+                swizzle, pushpop, push, mem = stages[stage]
+            else:
+                swizzle, pushpop, push, mem = range(self._window_depth), MidStackCommand.NOP, (0, 0), (0, 0)
+            for slot in range(self._window_depth):
+                yield self.in_stack_swizzle[stage][slot].eq(swizzle[slot] if slot < len(swizzle) else slot)
+            yield self.in_stack_pushpop[stage].eq(pushpop)
+            yield self.in_push[stage].eq(push[0] | (push[1] << self._register_width))
+            yield self.in_mem[stage].eq(mem[0] | (mem[1] << self._register_width))
+        for x in range(self._writeback_count):
+            val, tag = writebacks[x] if x < len(writebacks) else (0, 0)
+            yield self.in_writeback[x].eq(val | (tag << self._register_width))
+
+    def zeroAllInputs(self):
+        for i in self.in_mem:
+            yield i.eq(0)
+        for i in self.in_push:
+            yield i.eq(0)
+        for i in self.in_stack_swizzle:
+            for j in i:
+                yield j.eq(0)
+        for i in self.in_stack_pushpop:
+            yield i.eq(0)
+        for i in self.in_writeback:
+            yield i.eq(0)
+
+    def feedForwardAtStage(self, stage: int):
+        for slot in range(self._window_depth):
+            yield self.in_stack_swizzle[stage][slot].eq(slot)
+        yield self.in_stack_pushpop[stage].eq(MidStackCommand.NOP)
+
+    def feedForwardAllStages(self):
+        for stage in range(self._issue_stages):
+            yield from self.feedForwardAtStage(stage)
+
+if __name__ == '__main__':
+    unified_ssia = UnifiedSSIA(register_width=32, stack_depth=8, window_depth=4, issue_stages=4, tag_width=3, writeback_count=1)
+    with open('unified_ssia.v', 'w') as f:
+        def asValue(v):
+            return v.as_value()
+        f.write(verilog.convert(unified_ssia,
+                                ports = [
+                                         unified_ssia.in_window,
+                                         *map(asValue, unified_ssia.in_push),
+                                         *map(asValue, unified_ssia.in_mem),
+                                         *sum(unified_ssia.in_stack_swizzle, []),
+                                         *unified_ssia.in_stack_pushpop,
+                                         *map(asValue, sum(unified_ssia.out_peek, [])),
+                                         *map(asValue, unified_ssia.out_bottom),
+                                         *map(asValue, unified_ssia.in_writeback),
+                                        ]))
@@ -0,0 +1,413 @@
+from ssia.mid_stack import MidStackCommand
+from ssia.model import SSIAModel
+from ssia.snapshot import Snapshot
+
+# Stack-machine workloads for measuring the effective throughput of an SSIA configuration. A kernel runs on a
+# StackMachine, which computes its results and records the dynamic trace of operations. runWorkload() then
+# schedules that trace into SSIA issue bundles on an SSIAModel, modelling tag allocation, result latency, the
+# writeback ports, and the memory stack below the mid region.
+#
+# Operations issue in order without waiting for their operands, which are matched by tag as in SSIA. A computed
+# result only starts its latency once every operand it consumes has been written back, so dependent chains hold
+# their tags for longer, and a run is limited by the tags and writeback ports of the configuration.
+
+# RESULT marks the slot that receives the value produced by an operation.
+RESULT = -1
+
+# Op describes how a single-stage stack operation rearranges the top of the stack: the new top entries are taken
+# from prefix, in top-first order, and replace the top consumed entries. Entries below are shifted to suit.
+# latency is the number of cycles from the operands being available until a computed result is written back, or
+# None if the result is known at issue (or there is no result).
+class Op:
+    def __init__(self, prefix, consumed: int, latency=None):
+        self.prefix = prefix
+        self.consumed = consumed
+        self.latency = latency
+
+    # Encode as the in_stack_swizzle and in_stack_pushpop of one issue stage, for the given top_stack_depth.
+    def encode(self, top_stack_depth: int):
+        net = len(self.prefix) - self.consumed
+        if net not in (-1, 0, 1):
+            raise ValueError("operations must push or pop at most one entry")
+        swizzle = []
+        for d in range(top_stack_depth):
+            if d < len(self.prefix):
+                if self.prefix[d] == RESULT:
+                    if d != 0:
+                        raise ValueError("results can only be pushed to the top slot")
+                    source = top_stack_depth
+                else:
+                    source = self.prefix[d]
+                    if source >= top_stack_depth:
+                        raise ValueError("operation reaches below a top stack of depth " + str(top_stack_depth))
+            else:
+                source = d - len(self.prefix) + self.consumed
+                if source >= top_stack_depth and d != top_stack_depth-1:
+                    raise ValueError("operation consumes more than a top stack of depth " + str(top_stack_depth))
+            swizzle.append(source)
+        if net == 1:
+            pushpop = MidStackCommand.PUSH
+        elif net == -1:
+            pushpop = MidStackCommand.POP
+        else:
+            pushpop = MidStackCommand.NOP
+        return swizzle, pushpop
+
+OPS = {
+    "LIT": Op([RESULT], 0),
+    "DUP": Op([0], 0),
+    "OVER": Op([1], 0),
+    "PICK2": Op([2], 0),
+    "DROP": Op([], 1),
+    "NIP": Op([0], 2),
+    "SWAP": Op([1, 0], 2),
+    "ROT": Op([2, 0, 1], 3),
+    "ADD": Op([RESULT], 2, latency=1),
+    "SUB": Op([RESULT], 2, latency=1),
+    "LT": Op([RESULT], 2, latency=1),
+    "MUL": Op([RESULT], 2, latency=3),
+    "LOAD": Op([RESULT], 1, latency=4),
+    # BRANCH consumes a flag. Branches are assumed to be predicted perfectly.
+    "BRANCH": Op([], 1),
+    # STORE consumes the address, and is always followed by a DROP of the stored value.
+    "STORE": Op([], 1),
+}
+
+# StackMachine executes kernels functionally, recording the trace of operations and their results.
+class StackMachine:
+    def __init__(self, register_width: int = 32):
+        self._mask = (1 << register_width) - 1
+        self.stack = []
+        self.memory = {}
+        self.trace = []
+
+    def lit(self, val: int):
+        self.stack.append(val & self._mask)
+        self.trace.append(("LIT", val & self._mask))
+
+    def op(self, name: str):
+        s = self.stack
+        result = None
+        if name == "DUP":
+            s.append(s[-1])
+        elif name == "OVER":
+            s.append(s[-2])
+        elif name == "PICK2":
+            s.append(s[-3])
+        elif name == "DROP":
+            s.pop()
+        elif name == "NIP":
+            del s[-2]
+        elif name == "SWAP":
+            s[-1], s[-2] = s[-2], s[-1]
+        elif name == "ROT":
+            s.append(s.pop(-3))
+        elif name == "LOAD":
+            result = self.memory.get(s.pop(), 0)
+        else:
+            b = s.pop()
+            a = s.pop()
+            if name == "ADD":
+                result = (a + b) & self._mask
+            elif name == "SUB":
+                result = (a - b) & self._mask
+            elif name == "LT":
+                result = int(a < b)
+            elif name == "MUL":
+                result = (a * b) & self._mask
+            else:
+                raise ValueError("unknown operation " + name)
+        if result is not None:
+            s.append(result)
+        self.trace.append((name, result))
+
+    def branch(self):
+        self.trace.append(("BRANCH", None))
+        return self.stack.pop() != 0
+
+    def store(self):
+        addr = self.stack.pop()
+        self.memory[addr] = self.stack.pop()
+        self.trace.append(("STORE", None))
+        self.trace.append(("DROP", None))
+
+# Kernels
+
+def fib(vm: StackMachine, n: int = 10):
+    # ( n -- fib(n) ), recursively.
+    def word():
+        vm.op("DUP")
+        vm.lit(2)
+        vm.op("LT")
+        if vm.branch():
+            return
+        vm.op("DUP")
+        vm.lit(1)
+        vm.op("SUB")
+        word()
+        vm.op("SWAP")
+        vm.lit(2)
+        vm.op("SUB")
+        word()
+        vm.op("ADD")
+    vm.lit(n)
+    word()
+
+def dot(vm: StackMachine, n: int = 64):
+    a, b = 0x1000, 0x2000
+    for i in range(n):
+        vm.memory[a+i] = i + 1
+        vm.memory[b+i] = 2*i + 3
+    # ( acc i ), looping until i reaches n.
+    vm.lit(0)
+    vm.lit(0)
+    while True:
+        vm.op("DUP")
+        vm.lit(a)
+        vm.op("ADD")
+        vm.op("LOAD")
+        vm.op("OVER")
+        vm.lit(b)
+        vm.op("ADD")
+        vm.op("LOAD")
+        vm.op("MUL")
+        vm.op("ROT")
+        vm.op("ADD")
+        vm.op("SWAP")
+        vm.lit(1)
+        vm.op("ADD")
+        vm.op("DUP")
+        vm.lit(n)
+        vm.op("LT")
+        if not vm.branch():
+            break
+    vm.op("DROP")
+
+def forth(vm: StackMachine, n: int = 32):
+    # A threaded-code inner interpreter computing the sum of squares of 1..n. The instruction pointer is kept on
+    # top of the data stack, so every primitive has to work around it.
+    code = 0x4000
+    LIT_, DUP_, MUL_, ADD_, EXIT_ = range(5)
+    program = [LIT_, 0]
+    for k in range(1, n+1):
+        program += [LIT_, k, DUP_, MUL_, ADD_]
+    program.append(EXIT_)
+    for i, x in enumerate(program):
+        vm.memory[code+i] = x
+
+    vm.lit(code)
+    while True:
+        # NEXT: ( ip -- ip+1 ), dispatching on the fetched execution token.
+        vm.op("DUP")
+        vm.op("LOAD")
+        vm.op("SWAP")
+        vm.lit(1)
+        vm.op("ADD")
+        vm.op("SWAP")
+        xt = vm.stack[-1]
+        vm.branch()
+        if xt == EXIT_:
+            break
+        elif xt == LIT_:
+            vm.op("DUP")
+            vm.op("LOAD")
+            vm.op("SWAP")
+            vm.lit(1)
+            vm.op("ADD")
+        elif xt == DUP_:
+            vm.op("SWAP")
+            vm.op("DUP")
+            vm.op("ROT")
+        else:
+            vm.op("ROT")
+            vm.op("ROT")
+            vm.op("MUL" if xt == MUL_ else "ADD")
+            vm.op("SWAP")
+    vm.op("DROP")
+
+def matmul(vm: StackMachine, n: int = 4):
+    a, b, c = 0x1000, 0x2000, 0x3000
+    for i in range(n*n):
+        vm.memory[a+i] = i + 1
+        vm.memory[b+i] = n*n - i
+    # ( i j acc ), with the loop indices kept on the stack.
+    vm.lit(0)
+    while True:
+        vm.lit(0)
+        while True:
+            vm.lit(0)
+            for k in range(n):
+                vm.op("PICK2")
+                vm.lit(n)
+                vm.op("MUL")
+                vm.lit(a+k)
+                vm.op("ADD")
+                vm.op("LOAD")
+                vm.op("PICK2")
+                vm.lit(b+k*n)
+                vm.op("ADD")
+                vm.op("LOAD")
+                vm.op("MUL")
+                vm.op("ADD")
+            vm.op("PICK2")
+            vm.lit(n)
+            vm.op("MUL")
+            vm.op("PICK2")
+            vm.op("ADD")
+            vm.lit(c)
+            vm.op("ADD")
+            vm.store()
+            vm.lit(1)
+            vm.op("ADD")
+            vm.op("DUP")
+            vm.lit(n)
+            vm.op("LT")
+            if not vm.branch():
+                break
+        vm.op("DROP")
+        vm.lit(1)
+        vm.op("ADD")
+        vm.op("DUP")
+        vm.lit(n)
+        vm.op("LT")
+        if not vm.branch():
+            break
+    vm.op("DROP")
+
+KERNELS = {
+    "fib": fib,
+    "dot": dot,
+    "forth": forth,
+    "matmul": matmul,
+}
+
+# WorkloadStats summarizes one run of a trace.
+class WorkloadStats:
+    def __init__(self):
+        self.cycles = 0
+        self.ops = 0
+        # spills: occupied entries evicted through out_bottom into the memory stack
+        self.spills = 0
+        # fills: entries pulled back up from the memory stack through in_mem
+        self.fills = 0
+        # writeback_stalls: cycles in which issue stopped early to wait for a writeback, either because no tag
+        # was free or because the entry at the bottom of the mid region had not yet been written back
+        self.writeback_stalls = 0
+
+    @property
+    def ipc(self):
+        return self.ops / self.cycles if self.cycles else 0.0
+
+# Schedule a trace into issue bundles on a model of SSIA. Returns the statistics for the run and the model,
+# along with the memory stack below the mid region (top of stack last). If schedule is given, the stages and
+# writebacks of each cycle are appended to it, in the form accepted by SSIA.applyBundle().
+#
+# If snapshots is given, a Snapshot of the model and the scheduler is appended to it at the start of each cycle
+# in snapshot_cycles. A run given a Snapshot as start resumes from it, and continues exactly as the original run
+# would have, with its statistics counted from the start of the original run.
+def runWorkload(trace, register_width: int, top_stack_depth: int, mid_stack_depth: int, issue_stages: int, tag_width: int, writeback_count: int,
+                schedule=None, snapshots=None, snapshot_cycles=(), start: Snapshot = None):
+    model = SSIAModel(register_width=register_width, top_stack_depth=top_stack_depth, mid_stack_depth=mid_stack_depth, issue_stages=issue_stages, tag_width=tag_width, writeback_count=writeback_count)
+    encodings = {name: OPS[name].encode(top_stack_depth) for name in set(x[0] for x in trace)}
+    stats = WorkloadStats()
+    memory = []
+    free_tags = list(range(2, 1 << tag_width))
+    # pending: (cycle due, trace index, tag, value, operands) for each result awaiting writeback. operands holds the
+    # trace indices of the pending results it consumes, and the cycle due is None until they have been written back.
+    pending = []
+    # depth: the number of occupied entries, so that only occupied entries are spilled and filled
+    depth = 0
+
+    pc = 0
+    if start is not None:
+        start.checkConfig({"issue_stages": issue_stages, "writeback_count": writeback_count})
+        model.loadState(start)
+        memory = list(start.memory)
+        pc = start.workload["pc"]
+        free_tags = list(start.workload["free_tags"])
+        pending = list(start.workload["pending"])
+        depth = start.workload["depth"]
+        for name in ["ops", "spills", "fills", "writeback_stalls"]:
+            setattr(stats, name, start.workload[name])
+        stats.cycles = start.cycle
+
+    while pc < len(trace) or pending:
+        if snapshots is not None and stats.cycles in snapshot_cycles:
+            snapshot = model.dumpState(stats.cycles)
+            snapshot.config.update(issue_stages=issue_stages, writeback_count=writeback_count)
+            snapshot.memory = list(memory)
+            snapshot.workload = {"pc": pc, "free_tags": list(free_tags), "pending": list(pending), "depth": depth}
+            for name in ["ops", "spills", "fills", "writeback_stalls"]:
+                snapshot.workload[name] = getattr(stats, name)
+            snapshots.append(snapshot)
+
+        blocked = False
+        stages = []
+        for stage in range(issue_stages):
+            if pc >= len(trace):
+                break
+            name, result = trace[pc]
+            op = OPS[name]
+            swizzle, pushpop = encodings[name]
+
+            # Entries awaiting a writeback cannot leave the mid region.
+            if op.latency is not None and not free_tags:
+                blocked = True
+                break
+            if pushpop == MidStackCommand.PUSH and model.bottom()[1] > 1:
+                blocked = True
+                break
+
+            push = (0, 0)
+            if op.latency is not None:
+                tag = free_tags.pop(0)
+                push = (0, tag)
+                consumed = set(entry[1] for entry in model.top[:op.consumed])
+                operands = tuple(x[1] for x in pending if x[2] in consumed)
+                ready = None if operands else stats.cycles + op.latency
+                pending.append((ready, pc, tag, result, operands))
+            elif RESULT in op.prefix:
+                push = (result, 1)
+
+            # The mid region only spills and fills occupied entries once the stack reaches below it.
+            mem = (0, 0)
+            if pushpop == MidStackCommand.PUSH:
+                if depth >= top_stack_depth + mid_stack_depth:
+                    memory.append(model.bottom())
+                    stats.spills += 1
+            elif pushpop == MidStackCommand.POP:
+                if memory:
+                    mem = memory.pop()
+                    stats.fills += 1
+            depth += len(op.prefix) - op.consumed
+
+            model.stage(swizzle, pushpop, push, mem)
+            stages.append((swizzle, pushpop, push, mem))
+            pc += 1
+            stats.ops += 1
+        if blocked:
+            stats.writeback_stalls += 1
+
+        # Retire the oldest results that are due, up to the writeback ports available.
+        due = sorted(x for x in pending if x[0] is not None and x[0] <= stats.cycles)[:writeback_count]
+        writebacks = [(val, tag) for _, _, tag, val, _ in due]
+        model.latch(writebacks)
+        if schedule is not None:
+            schedule.append((stages, writebacks))
+        for x in due:
+            pending.remove(x)
+            free_tags.append(x[2])
+        free_tags.sort()
+
+        # Results whose operands have all been written back start their latency in the next cycle.
+        waiting = set(x[1] for x in pending)
+        for i, (ready, index, tag, val, operands) in enumerate(pending):
+            if ready is None and not waiting.intersection(operands):
+                pending[i] = (stats.cycles + 1 + OPS[trace[index][0]].latency, index, tag, val, operands)
+        stats.cycles += 1
+
+    return stats, model, memory
+
+# The full stack held by a model and the memory stack below it, in top-first order.
+def flattenStack(model: SSIAModel, memory):
+    return model.top + model.mid + memory[::-1]
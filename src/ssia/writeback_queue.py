@@ -0,0 +1,138 @@
+from amaranth import *
+from amaranth.hdl import *
+from amaranth.back import verilog
+from amaranth.lib.data import StructLayout
+from ssia.compactor import LaneIndexer
+
+# WritebackQueue sits in front of the in_writeback ports of SSIA, so that bursts of results from variable-latency
+# units don't need to be throttled upstream. It accepts up to input_count results per cycle, and drains up to
+# writeback_count of them per cycle into the stacks.
+#
+# A result is only worth a writeback port while its tag is still held somewhere it can be matched, which is given
+# by in_tag_present, e.g. SSIA's out_tag_present with a WritebackTable's out_tag_present ORed in. Results for absent
+# tags are dropped on arrival, and queued results whose tag has gone absent are dropped instead of being drained.
+# Results with a tag of 0 or 1 carry no writeback and are dropped as well.
+#
+# Queued results are drained in the lane order of the queue entries, not in arrival order. This is safe because a
+# tag is only ever written back once. Writeback ports left over by the queued results are given to the accepted
+# results in input order in the same cycle, bypassing the queue, so that an unloaded queue adds no latency.
+class WritebackQueue(Elaboratable):
+    # queue_depth: the number of results that can be queued at once
+    # input_count: the number of results that can be accepted in a single cycle
+    # writeback_count: the number of results that can be drained in a single cycle
+    def __init__(self, register_width: int, queue_depth: int, input_count: int, tag_width: int, writeback_count: int):
+        assert writeback_count <= queue_depth
+        self._queue_depth = queue_depth
+        self._input_count = input_count
+        self._tag_width = tag_width
+        self._writeback_count = writeback_count
+        self._register_layout = StructLayout({
+            "val": register_width,
+            "tag": tag_width,
+        })
+
+        # in_result/in_result_valid: up to input_count register+tag results to be queued each cycle
+        self.in_result = [Signal(self._register_layout, name="in_result_"+str(x)) for x in range(input_count)]
+        self.in_result_valid = [Signal(1, name="in_result_valid_"+str(x)) for x in range(input_count)]
+
+        # in_tag_present: one bit per tag value, set when an entry with that tag can still be written back
+        self.in_tag_present = Signal(2**tag_width, name="in_tag_present")
+
+        # out_writeback: writeback_count register+tag to be given to SSIA's in_writeback, with a tag of 0 when unused
+        self.out_writeback = [Signal(self._register_layout, name="out_writeback_"+str(x)) for x in range(writeback_count)]
+
+        # out_stall: set when there are not enough free entries for this cycle's results that were not bypassed.
+        # Nothing is accepted, and the results must be replayed in a later cycle.
+        self.out_stall = Signal(1, name="out_stall")
+
+        # out_occupancy: the number of queued results
+        self.out_occupancy = Signal(range(queue_depth+1), name="out_occupancy")
+
+    def elaborate(self, platform):
+        m = Module()
+
+        valid = [Signal(1, name="valid_"+str(x)) for x in range(self._queue_depth)]
+        entries = [Signal(self._register_layout, name="entry_"+str(x)) for x in range(self._queue_depth)]
+
+        def present(tag):
+            return (tag > 1) & self.in_tag_present.bit_select(tag, 1)
+
+        # Drain the first writeback_count queued results whose tag is still present, in lane order.
+        live = [valid[n] & present(entries[n]['tag']) for n in range(self._queue_depth)]
+        m.submodules.drain_indexer = drain_indexer = LaneIndexer(self._queue_depth, lane_count=self._writeback_count)
+        m.d.comb += drain_indexer.input_en.eq(Cat(*live))
+        drained = [0] * self._queue_depth
+        for x in range(self._writeback_count):
+            index, none = drain_indexer.lane_index[x], drain_indexer.lane_none[x]
+            for n in range(self._queue_depth):
+                drained[n] = drained[n] | (~none & (index == n))
+        drained_count = sum(~none for none in drain_indexer.lane_none)
+
+        # Bypass the first accepted results, in input order, to the writeback ports the queue leaves free.
+        accepted = [self.in_result_valid[x] & present(self.in_result[x]['tag']) for x in range(self._input_count)]
+        bypassed = [accepted[x] & (sum(accepted[:x]) + drained_count < self._writeback_count) for x in range(self._input_count)]
+        queued = [accepted[x] & ~bypassed[x] for x in range(self._input_count)]
+        bypass_count = min(self._writeback_count, self._input_count)
+        m.submodules.bypass_indexer = bypass_indexer = LaneIndexer(self._input_count, lane_count=bypass_count)
+        m.d.comb += bypass_indexer.input_en.eq(Cat(*accepted))
+
+        # Allocate free entries to the remaining accepted results in input order, using the lane order of the free
+        # entries.
+        m.submodules.free_indexer = free_indexer = LaneIndexer(self._queue_depth)
+        m.d.comb += free_indexer.input_en.eq(~Cat(*valid))
+        allocations = []
+        for x in range(self._input_count):
+            # Result x is given the free entry ranked by the number of queued results before it.
+            rank = sum(queued[:x])
+            pad = max(0, x+1-self._queue_depth)
+            index = Array([*free_indexer.lane_index[:x+1], *[Const(0)]*pad])[rank]
+            none = Array([*free_indexer.lane_none[:x+1], *[Const(1)]*pad])[rank]
+            allocations.append((index, none))
+        m.d.comb += self.out_stall.eq(Cat(*(queued[x] & allocations[x][1] for x in range(self._input_count))).any())
+
+        # Writeback port x drains a queued result, or else takes the accepted result ranked after the queued results.
+        for x in range(self._writeback_count):
+            index, none = drain_indexer.lane_index[x], drain_indexer.lane_none[x]
+            rank = x - drained_count
+            pad = max(0, x+1-bypass_count)
+            bypass_index = Array([*bypass_indexer.lane_index[:x+1], *[Const(0)]*pad])[rank]
+            bypass_none = Array([*bypass_indexer.lane_none[:x+1], *[Const(1)]*pad])[rank]
+            bypass = Mux(bypass_none | self.out_stall, 0, Array(self.in_result)[bypass_index])
+            m.d.comb += self.out_writeback[x].eq(Mux(none, bypass, Array(entries)[index]))
+
+        for n in range(self._queue_depth):
+            with m.If(valid[n]):
+                # Results are released once drained, or once their tag is no longer present.
+                with m.If(drained[n] | ~live[n]):
+                    m.d.sync += valid[n].eq(0)
+            with m.Elif(~self.out_stall):
+                for x in range(self._input_count):
+                    index, none = allocations[x]
+                    with m.If(queued[x] & ~none & (index == n)):
+                        m.d.sync += valid[n].eq(1)
+                        m.d.sync += entries[n].eq(self.in_result[x])
+
+        m.d.comb += self.out_occupancy.eq(sum(valid))
+        return m
+
+    # Testing helpers
+    def zeroAllInputs(self):
+        for x in range(self._input_count):
+            yield self.in_result[x].eq(0)
+            yield self.in_result_valid[x].eq(0)
+        yield self.in_tag_present.eq(0)
+
+if __name__ == '__main__':
+    writeback_queue = WritebackQueue(register_width=32, queue_depth=8, input_count=4, tag_width=3, writeback_count=1)
+    with open('writeback_queue.v', 'w') as f:
+        def asValue(v):
+            return v.as_value()
+        f.write(verilog.convert(writeback_queue,
+                                ports = [
+                                         *map(asValue, writeback_queue.in_result),
+                                         *writeback_queue.in_result_valid,
+                                         writeback_queue.in_tag_present,
+                                         *map(asValue, writeback_queue.out_writeback),
+                                         writeback_queue.out_stall,
+                                         writeback_queue.out_occupancy,
+                                        ]))
@@ -0,0 +1,182 @@
+from amaranth import *
+from amaranth.hdl import *
+from amaranth.back import verilog
+from amaranth.lib.coding import PriorityEncoder
+from amaranth.lib.data import StructLayout
+from ssia.compactor import LaneIndexer
+
+# WritebackTable lets entries that are still awaiting a writeback spill below the MidStack. Each tagged entry that
+# leaves through out_bottom is recorded with the memory address it is spilled to. A later writeback to that tag is
+# captured by the table and then patched into memory through a single write port. If the entry is refilled before
+# the patch is written, the captured value is substituted on the way back up instead. A refill always releases the
+# entry, since a refilled entry is once again held where writebacks are matched.
+#
+# Refills are matched by address rather than by tag. The same tag can be spilled more than once, e.g. after a DUP
+# of a pending result, and a tag can be reused while an older entry with it is still waiting to be patched.
+#
+# Without the table, the processor must stall until writebacks drain from the bottom of the MidStack. With it, the
+# processor only stalls when the table has no room for this cycle's tagged spills.
+class WritebackTable(Elaboratable):
+    # register_width: the width in bits of individual stack entries
+    # entry_count: the number of spilled entries that can be awaiting a writeback at once
+    # address_width: the width in bits of a memory address
+    # issue_stages: the number of spills and refills that can happen in a single cycle
+    # tag_width: the number of bits to use to tag unretired instructions
+    # writeback_count: the number of values that can be retired in a single cycle
+    def __init__(self, register_width: int, entry_count: int, address_width: int, issue_stages: int, tag_width: int, writeback_count: int):
+        self._entry_count = entry_count
+        self._issue_stages = issue_stages
+        self._tag_width = tag_width
+        self._register_layout = StructLayout({
+            "val": register_width,
+            "tag": tag_width,
+        })
+
+        # in_spill/in_spill_valid/in_spill_address: an entry spilled below the MidStack at each stage, and its address
+        self.in_spill = [Signal(self._register_layout, name="in_spill_"+str(s)) for s in range(issue_stages)]
+        self.in_spill_valid = [Signal(1, name="in_spill_valid_"+str(s)) for s in range(issue_stages)]
+        self.in_spill_address = [Signal(address_width, name="in_spill_address_"+str(s)) for s in range(issue_stages)]
+
+        # in_refill/in_refill_valid/in_refill_address: an entry refilled from memory at each stage, and its address
+        self.in_refill = [Signal(self._register_layout, name="in_refill_"+str(s)) for s in range(issue_stages)]
+        self.in_refill_valid = [Signal(1, name="in_refill_valid_"+str(s)) for s in range(issue_stages)]
+        self.in_refill_address = [Signal(address_width, name="in_refill_address_"+str(s)) for s in range(issue_stages)]
+
+        # out_refill: in_refill with any captured writeback substituted, to be given to the MidStack's in_mem
+        self.out_refill = [Signal(self._register_layout, name="out_refill_"+str(s)) for s in range(issue_stages)]
+
+        # in_writeback: writeback_count register+tag which are tag-matched and captured each cycle
+        self.in_writeback = [Signal(self._register_layout, name="in_cdb_"+str(x)) for x in range(writeback_count)]
+
+        # out_patch_valid/out_patch_address/out_patch: a captured writeback to be written to memory, as a register
+        # with a tag of 1. The table entry is released when in_patch_ready is set.
+        self.out_patch_valid = Signal(1, name="out_patch_valid")
+        self.out_patch_address = Signal(address_width, name="out_patch_address")
+        self.out_patch = Signal(self._register_layout, name="out_patch")
+        self.in_patch_ready = Signal(1, name="in_patch_ready")
+
+        # out_stall: set when there are not enough free entries for this cycle's tagged spills. Nothing is recorded,
+        # and the spills must be replayed in a later cycle.
+        self.out_stall = Signal(1, name="out_stall")
+
+        # out_occupancy: the number of entries in use
+        self.out_occupancy = Signal(range(entry_count+1), name="out_occupancy")
+
+        # out_tag_present: one bit per tag value, set when an entry is still awaiting a writeback to that tag
+        self.out_tag_present = Signal(2**tag_width, name="out_tag_present")
+
+    def elaborate(self, platform):
+        m = Module()
+
+        valid = [Signal(1, name="valid_"+str(x)) for x in range(self._entry_count)]
+        done = [Signal(1, name="done_"+str(x)) for x in range(self._entry_count)]
+        # Each entry keeps the tag it was spilled with, since a captured value is marked with a tag of 1.
+        tags = [Signal(self._tag_width, name="tag_"+str(x)) for x in range(self._entry_count)]
+        entries = [Signal(self._register_layout, name="entry_"+str(x)) for x in range(self._entry_count)]
+        addresses = [Signal(len(self.out_patch_address), name="address_"+str(x)) for x in range(self._entry_count)]
+
+        def captured(tag, current):
+            # Every writeback is matched against the tag, and the last match wins.
+            result = current
+            for c in self.in_writeback:
+                writeback_matched = (c['tag'] != 0) & (c['tag'] == tag)
+                result = Mux(writeback_matched, Cat(c['val'], Const(1, self._tag_width)), result)
+            return result
+
+        # Allocate free entries to the tagged spills in stage order, using the lane order of the free entries.
+        m.submodules.free_indexer = free_indexer = LaneIndexer(self._entry_count)
+        m.d.comb += free_indexer.input_en.eq(~Cat(*valid))
+        tagged = [self.in_spill_valid[s] & (self.in_spill[s]['tag'] > 1) for s in range(self._issue_stages)]
+        allocations = []
+        for s in range(self._issue_stages):
+            # Stage s is given the free entry ranked by the number of tagged spills before it.
+            rank = sum(tagged[:s])
+            pad = max(0, s+1-self._entry_count)
+            index = Array([*free_indexer.lane_index[:s+1], *[Const(0)]*pad])[rank]
+            none = Array([*free_indexer.lane_none[:s+1], *[Const(1)]*pad])[rank]
+            allocations.append((index, none))
+        m.d.comb += self.out_stall.eq(Cat(*(tagged[s] & allocations[s][1] for s in range(self._issue_stages))).any())
+
+        # Substitute captured writebacks into refills.
+        refilled = [0] * self._entry_count
+        for s in range(self._issue_stages):
+            refill = self.in_refill[s].as_value()
+            for n in range(self._entry_count):
+                matched = valid[n] & (addresses[n] == self.in_refill_address[s])
+                refill = Mux(matched & done[n], entries[n], refill)
+                refilled[n] = refilled[n] | (self.in_refill_valid[s] & matched)
+            m.d.comb += self.out_refill[s].eq(refill)
+
+        # Offer the first captured writeback to the memory write port.
+        m.submodules.patch_encoder = patch_encoder = PriorityEncoder(self._entry_count)
+        m.d.comb += patch_encoder.i.eq(Cat(*(v & d for v, d in zip(valid, done))))
+        m.d.comb += self.out_patch_valid.eq(~patch_encoder.n)
+        m.d.comb += self.out_patch.eq(Array(entries)[patch_encoder.o])
+        m.d.comb += self.out_patch_address.eq(Array(addresses)[patch_encoder.o])
+
+        for n in range(self._entry_count):
+            patched = self.out_patch_valid & self.in_patch_ready & (patch_encoder.o == n)
+            with m.If(valid[n]):
+                # Entries awaiting a writeback capture it, and captured entries are released once written.
+                with m.If(refilled[n] | patched):
+                    m.d.sync += valid[n].eq(0)
+                with m.Elif(~done[n]):
+                    new_entry = captured(tags[n], entries[n].as_value())
+                    m.d.sync += entries[n].eq(new_entry)
+                    m.d.sync += done[n].eq(new_entry[-self._tag_width:] == 1)
+            with m.Elif(~self.out_stall):
+                # A spill can be written back in the same cycle, since it has already left the MidStack.
+                for s in range(self._issue_stages):
+                    index, none = allocations[s]
+                    with m.If(tagged[s] & ~none & (index == n)):
+                        new_entry = captured(self.in_spill[s]['tag'], self.in_spill[s].as_value())
+                        m.d.sync += valid[n].eq(1)
+                        m.d.sync += entries[n].eq(new_entry)
+                        m.d.sync += done[n].eq(new_entry[-self._tag_width:] == 1)
+                        m.d.sync += tags[n].eq(self.in_spill[s]['tag'])
+                        m.d.sync += addresses[n].eq(self.in_spill_address[s])
+
+        m.d.comb += self.out_occupancy.eq(sum(valid))
+
+        tag_present = 0
+        for n in range(self._entry_count):
+            tag_present = tag_present | ((valid[n] & ~done[n]) << tags[n])
+        m.d.comb += self.out_tag_present.eq(tag_present)
+        return m
+
+    # Testing helpers
+    def zeroAllInputs(self):
+        for s in range(self._issue_stages):
+            yield self.in_spill[s].eq(0)
+            yield self.in_spill_valid[s].eq(0)
+            yield self.in_spill_address[s].eq(0)
+            yield self.in_refill[s].eq(0)
+            yield self.in_refill_valid[s].eq(0)
+            yield self.in_refill_address[s].eq(0)
+        for i in self.in_writeback:
+            yield i.eq(0)
+        yield self.in_patch_ready.eq(0)
+
+if __name__ == '__main__':
+    writeback_table = WritebackTable(register_width=32, entry_count=4, address_width=16, issue_stages=4, tag_width=3, writeback_count=1)
+    with open('writeback_table.v', 'w') as f:
+        def asValue(v):
+            return v.as_value()
+        f.write(verilog.convert(writeback_table,
+                                ports = [
+                                         *map(asValue, writeback_table.in_spill),
+                                         *writeback_table.in_spill_valid,
+                                         *writeback_table.in_spill_address,
+                                         *map(asValue, writeback_table.in_refill),
+                                         *writeback_table.in_refill_valid,
+                                         *writeback_table.in_refill_address,
+                                         *map(asValue, writeback_table.out_refill),
+                                         *map(asValue, writeback_table.in_writeback),
+                                         writeback_table.out_patch_valid,
+                                         writeback_table.out_patch_address,
+                                         writeback_table.out_patch.as_value(),
+                                         writeback_table.in_patch_ready,
+                                         writeback_table.out_stall,
+                                         writeback_table.out_occupancy,
+                                         writeback_table.out_tag_present,
+                                        ]))
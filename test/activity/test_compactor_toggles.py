@@ -0,0 +1,40 @@
+from amaranth.sim import Simulator, Settle
+from ssia.compactor import Compactor
+from ssia.activity import ToggleCounter
+
+dut = Compactor(width=32, count=4)
+counter = ToggleCounter()
+
+# Test 011: Toggles are counted per group between samples
+def process():
+    counter.addGroups(dut.activityGroups())
+    yield from dut.zeroAllInputs()
+    yield dut.input[0].eq(0xFF)
+    yield Settle()
+    yield from counter.sample()
+
+    # Enabling and disabling lane 0 toggles 8 bits of part 0 and
+    # of the output value, and 1 bit of the output count.
+    for i in range(10):
+        yield dut.input_en[0].eq((i + 1) % 2)
+        yield Settle()
+        yield from counter.sample()
+
+    assert counter.samples == 11
+    assert counter.toggles["part_0"] == 80
+    assert counter.toggles["part_1"] == 0
+    assert counter.toggles["output"] == 90
+    assert counter.toggles["concat_en_0"] == 10
+    assert counter.totalPower() == 180
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_process(process)
+    if debug:
+        with sim.write_vcd('test_011.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
@@ -0,0 +1,48 @@
+from amaranth.sim import Simulator
+from ssia.ssia import SSIA
+from ssia.activity import ToggleCounter
+
+dut = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1)
+counter = ToggleCounter()
+
+# Test 012: Feed-forward cycles cause no toggles, while pushes toggle every stage
+def process():
+    counter.addGroups(dut.activityGroups())
+    yield from dut.zeroAllInputs()
+    yield from dut.pushStackAllStages()
+    for i in range(4):
+        yield dut.in_push[i].eq(0x1FFFFFFFF)
+    yield
+    yield
+    yield from dut.feedForwardAllStages()
+    yield
+    yield
+    yield
+
+    # Once the stack has settled, feeding forward moves no bits.
+    before = counter.totalPower()
+    for i in range(8):
+        yield
+    assert counter.totalPower() == before
+
+    yield from dut.pushStackAllStages()
+    for i in range(4):
+        yield dut.in_push[i].eq(0x100000000 | i)
+    for i in range(4):
+        yield
+    assert counter.totalPower("top_stack_1_") > 0
+    assert counter.totalPower("mid_stack_0_") > 0
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    sim.add_sync_process(counter.clockedProcess)
+    if debug:
+        with sim.write_vcd('test_012.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
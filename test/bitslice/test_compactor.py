@@ -0,0 +1,28 @@
+from ssia.bitslice import BitSlicedEvaluator, exhaustivePlanes
+from ssia.compactor import Compactor
+
+dut = Compactor(width=8, count=16)
+
+# Test 016: Compactor gathers the enabled lanes in order, for all 65536 enable patterns
+def test():
+    evaluator = BitSlicedEvaluator(dut)
+    count, (en,) = exhaustivePlanes([dut._count])
+    evaluator.reset(count)
+    for i in range(dut._count):
+        evaluator.setInput(dut.input_en[i], [en[i]])
+        evaluator.setConst(dut.input[i], i+1)
+
+    everywhere = [(1 << count) - 1]
+    assert evaluator.planes(dut.output_count == sum(dut.input_en)) == everywhere
+    for j in range(dut._count):
+        # Part j holds lane i when lane i is enabled with exactly j enabled lanes before it.
+        expected = [0] * 8
+        for i in range(dut._count):
+            [selected] = evaluator.planes(dut.input_en[i] & (sum(dut.input_en[:i]) == j))
+            for b in range(8):
+                if ((i+1) >> b) & 1:
+                    expected[b] |= selected
+        assert evaluator.planes(dut.output_val[j*8:(j+1)*8]) == expected
+
+if __name__ == '__main__':
+    test()
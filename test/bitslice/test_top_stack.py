@@ -0,0 +1,44 @@
+from ssia.bitslice import BitSlicedEvaluator, exhaustivePlanes
+from ssia.top_stack import TopStack
+
+dut = TopStack(register_width=8, stack_depth=4, issue_stages=2, tag_width=3, writeback_count=1)
+
+# Test 017: Two TopStack stages apply all 262144 combinations of swizzle encodings, including out-of-range ones
+def test():
+    evaluator = BitSlicedEvaluator(dut)
+    swizzles = [s for stage in dut.in_stack_swizzle for s in stage]
+    count, planes = exhaustivePlanes([len(s) for s in swizzles])
+    evaluator.reset(count)
+    for signal, p in zip(swizzles, planes):
+        evaluator.setInput(signal, p)
+    # Every source holds a distinct value, with tags of zero so that no writeback matches.
+    for d in range(4):
+        evaluator.setConst(dut.stacks[0][d], 0x10+d)
+    for stage in range(2):
+        evaluator.setConst(dut.in_push[stage], 0x20+stage)
+        evaluator.setConst(dut.in_mem[stage], 0x30+stage)
+
+    def const(value):
+        return [(1 << count) - 1 if (value >> b) & 1 else 0 for b in range(11)]
+
+    stack = [const(0x10+d) for d in range(4)]
+    for stage in range(2):
+        sources = [stack + [const(0x20+stage)], stack, stack, stack + [const(0x30+stage)]]
+        new = []
+        for d in range(4):
+            swizzle = dut.in_stack_swizzle[stage][d]
+            expected = [0] * 11
+            for k, source in enumerate(sources[d]):
+                # Sources past the end of a slot's range select its last source, as for an Array.
+                if k == len(sources[d]) - 1:
+                    [selected] = evaluator.planes(swizzle >= k)
+                else:
+                    [selected] = evaluator.planes(swizzle == k)
+                expected = [e | (p & selected) for e, p in zip(expected, source)]
+            new.append(expected)
+        stack = new
+    for d in range(4):
+        assert evaluator.planes(dut.out_next_state[d]) == stack[d]
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,21 @@
+import os
+import pytest
+
+# Set SSIA_PROFILE=1 to profile the simulations run by each test, with a summary per test at the end of the run.
+if os.environ.get("SSIA_PROFILE"):
+    from ssia.profiling import SimProfile
+
+    _reports = []
+
+    @pytest.fixture(autouse=True)
+    def simProfile(request):
+        profile = SimProfile(request.node.nodeid)
+        with profile.instrument():
+            yield profile
+        if profile.run_time:
+            _reports.append(profile.report())
+
+    def pytest_terminal_summary(terminalreporter):
+        terminalreporter.section("simulation profile")
+        for report in _reports:
+            terminalreporter.write_line(report)
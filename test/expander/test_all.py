@@ -0,0 +1,40 @@
+from amaranth.sim import Simulator, Settle
+from ssia.expander import Expander
+
+dut = Expander(width=32, count=4)
+
+def process():
+    yield from dut.zeroAllInputs()
+    yield Settle()
+    for i in range(dut._count):
+        assert (yield dut.output[i]) == 0
+    assert (yield dut.output_count) == 0
+
+    # Scatter a dense vector over every combination of enabled lanes.
+    parts = [0xFFFFFFFF, 0xEEEEEEEE, 0xDDDDDDDD, 0xCCCCCCCC]
+    for mask in range(1 << dut._count):
+        yield from dut.zeroAllInputs()
+        yield dut.input_val.eq(0xCCCCCCCCDDDDDDDDEEEEEEEEFFFFFFFF)
+        for i in range(dut._count):
+            yield dut.input_en[i].eq((mask >> i) & 1)
+        yield Settle()
+        assert (yield dut.output_count) == bin(mask).count("1")
+        next_part = 0
+        for i in range(dut._count):
+            if mask & (1 << i):
+                assert (yield dut.output[i]) == parts[next_part]
+                next_part += 1
+            else:
+                assert (yield dut.output[i]) == 0
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_process(process)
+    if debug:
+        with sim.write_vcd('test_all.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
@@ -0,0 +1,64 @@
+import random
+from amaranth.sim import Simulator, Settle
+from ssia.fill_prefetcher import FillPrefetcher, LatencyMemory
+from ssia.mid_stack import MidStackCommand
+
+dut = FillPrefetcher(register_width=32, buffer_depth=8, issue_stages=2, tag_width=3, fill_latency=4)
+
+def unpack(entry):
+    return (entry & 0xFFFFFFFF, entry >> 32)
+
+# Test 015: Fills and spills pass through the prefetch buffer in stack order, and a steady pop rate is
+# covered by prefetching after warm-up.
+def process():
+    rng = random.Random(15)
+    initial = [(x, 1) for x in range(1000, 1400)]
+    memory = LatencyMemory(dut, latency=4, stack=initial)
+    # The whole stack below the MidStack, top of stack last.
+    expected = list(initial)
+    yield from dut.zeroAllInputs()
+
+    def cycle(commands):
+        spills = []
+        for stage, command in enumerate(commands):
+            spill = (rng.getrandbits(32), 1)
+            spills.append(spill)
+            yield dut.in_stack_pushpop[stage].eq(command)
+            yield dut.in_spill[stage].eq(spill[0] | (spill[1] << 32))
+        yield from memory.step()
+        stalled = (yield dut.out_stall)
+        if not stalled:
+            for stage, command in enumerate(commands):
+                if command == MidStackCommand.POP:
+                    assert unpack((yield dut.out_mem[stage].as_value())) == expected.pop()
+                elif command == MidStackCommand.PUSH:
+                    expected.append(spills[stage])
+        yield
+        return stalled
+
+    # Random traffic in both directions.
+    for i in range(200):
+        commands = [rng.choice([MidStackCommand.NOP, MidStackCommand.POP, MidStackCommand.PUSH]) for x in range(2)]
+        yield from cycle(commands)
+    assert memory.fills > 0 and memory.evictions > 0
+
+    # A steady pop per cycle only stalls while the predictor warms up.
+    stalls = 0
+    for i in range(100):
+        stalled = yield from cycle([MidStackCommand.POP, MidStackCommand.NOP])
+        if i >= 20:
+            stalls += stalled
+    assert stalls == 0
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_015.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
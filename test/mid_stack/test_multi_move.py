@@ -0,0 +1,56 @@
+from amaranth.sim import Simulator
+from ssia.mid_stack import MidStack
+
+dut = MidStack(register_width=32, stack_depth=4, issue_stages=2, tag_width=3, writeback_count=1, move_width=2)
+
+# Test 013: Multi-entry pushes and pops
+def process():
+    # Push two pairs of values in a single cycle.
+    yield from dut.zeroAllInputs()
+    yield from dut.pushStackAllStages(count=2)
+    yield dut.in_push_lanes[0][0].eq(0x1AAAAAAAA)
+    yield dut.in_push_lanes[0][1].eq(0x1BBBBBBBB)
+    yield dut.in_push_lanes[1][0].eq(0x1CCCCCCCC)
+    yield dut.in_push_lanes[1][1].eq(0x1DDDDDDDD)
+    yield
+    assert (yield dut.out_peek_lanes[1][0]['val']) == 0xBBBBBBBB
+    assert (yield dut.out_peek_lanes[1][1]['val']) == 0xAAAAAAAA
+    assert (yield dut.out_bottom_lanes[1][0]['tag']) == 0
+    assert (yield dut.out_bottom_lanes[1][1]['tag']) == 0
+
+    # Pop two values, pulling two up from below, then push one.
+    yield from dut.zeroAllInputs()
+    yield from dut.popStackAtStage(0, count=2)
+    yield dut.in_mem_lanes[0][0].eq(0x1EEEEEEEE)
+    yield dut.in_mem_lanes[0][1].eq(0x1FFFFFFFF)
+    yield from dut.pushStackAtStage(1)
+    yield dut.in_push_lanes[1][0].eq(0x111111111)
+    yield
+    assert (yield dut.out_peek_lanes[0][0]['val']) == 0xDDDDDDDD
+    assert (yield dut.out_peek_lanes[0][1]['val']) == 0xCCCCCCCC
+    assert (yield dut.out_bottom_lanes[0][0]['val']) == 0xAAAAAAAA
+    assert (yield dut.out_bottom_lanes[0][1]['val']) == 0xBBBBBBBB
+    assert (yield dut.out_peek_lanes[1][0]['val']) == 0xBBBBBBBB
+    assert (yield dut.out_peek_lanes[1][1]['val']) == 0xAAAAAAAA
+    assert (yield dut.out_bottom_lanes[1][0]['val']) == 0xFFFFFFFF
+    assert (yield dut.out_bottom_lanes[1][1]['val']) == 0xEEEEEEEE
+
+    yield from dut.zeroAllInputs()
+    yield
+    assert (yield dut.out_peek_lanes[0][0]['val']) == 0x11111111
+    assert (yield dut.out_peek_lanes[0][1]['val']) == 0xBBBBBBBB
+    assert (yield dut.out_bottom_lanes[0][0]['val']) == 0xEEEEEEEE
+    assert (yield dut.out_bottom_lanes[0][1]['val']) == 0xAAAAAAAA
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_013.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
@@ -0,0 +1,55 @@
+from amaranth.sim import Simulator, Settle
+from ssia.mid_stack import MidStack
+
+dut = MidStack(register_width=32, stack_depth=4, issue_stages=2, tag_width=3, writeback_count=1)
+
+def enables():
+    result = []
+    for we in dut.out_slot_we:
+        result.append((yield we))
+    return result
+
+# Test 021: Slot write enables only fire for slots that change
+def process():
+    # Idle cycles write no slots.
+    yield from dut.zeroAllInputs()
+    yield Settle()
+    assert (yield from enables()) == [0, 0, 0, 0]
+
+    # A push followed by a pop only replaces the bottom slot with the pulled-up entry.
+    yield from dut.pushStackAtStage(0)
+    yield from dut.popStackAtStage(1)
+    yield Settle()
+    assert (yield from enables()) == [0, 0, 0, 1]
+
+    # A push moves every slot.
+    yield from dut.feedForwardAllStages()
+    yield from dut.pushStackAtStage(1)
+    yield dut.in_push[1].eq(0x311111111)
+    yield Settle()
+    assert (yield from enables()) == [1, 1, 1, 1]
+    yield
+
+    # A writeback writes only the slot it matches.
+    yield from dut.feedForwardAllStages()
+    yield dut.in_writeback[0].eq(0x322222222)
+    yield Settle()
+    assert (yield from enables()) == [1, 0, 0, 0]
+    yield
+    yield dut.in_writeback[0].eq(0)
+    yield Settle()
+    assert (yield dut.out_peek[0]['val']) == 0x22222222
+    assert (yield from enables()) == [0, 0, 0, 0]
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_021.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
@@ -0,0 +1,55 @@
+import random
+from amaranth.sim import Simulator, Settle
+from ssia.ssia import SSIA
+from ssia.mid_stack import MidStackCommand
+from ssia.model import SSIAModel
+
+dut = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=2)
+model = SSIAModel(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=2)
+
+def unpack(entry):
+    return (entry & 0xFFFFFFFF, entry >> 32)
+
+# Test 009: The reference model matches SSIA under random bundles and writebacks
+def process():
+    rng = random.Random(9)
+    yield from dut.zeroAllInputs()
+    for cycle in range(128):
+        stages = []
+        for stage in range(4):
+            swizzle = [rng.randrange(5), rng.randrange(4), rng.randrange(4), rng.randrange(5)]
+            pushpop = rng.choice([MidStackCommand.NOP, MidStackCommand.POP, MidStackCommand.PUSH])
+            push = (rng.getrandbits(32), rng.randrange(8))
+            mem = (rng.getrandbits(32), rng.randrange(8))
+            for slot in range(4):
+                yield dut.in_stack_swizzle[stage][slot].eq(swizzle[slot])
+            yield dut.in_stack_pushpop[stage].eq(pushpop)
+            yield dut.in_push[stage].eq(push[0] | (push[1] << 32))
+            yield dut.in_mem[stage].eq(mem[0] | (mem[1] << 32))
+            stages.append((swizzle, pushpop, push, mem))
+        writebacks = [(rng.getrandbits(32), rng.randrange(8)) for x in range(2)]
+        for x in range(2):
+            yield dut.in_writeback[x].eq(writebacks[x][0] | (writebacks[x][1] << 32))
+        yield Settle()
+
+        for stage in range(4):
+            peek = model.peek()
+            for i in range(2):
+                assert unpack((yield dut.out_peek[stage][i].as_value())) == peek[i]
+            assert unpack((yield dut.out_bottom[stage].as_value())) == model.bottom()
+            model.stage(*stages[stage])
+        model.latch(writebacks)
+        yield
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_009.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
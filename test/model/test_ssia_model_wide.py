@@ -0,0 +1,50 @@
+import random
+from amaranth.sim import Simulator, Settle
+from ssia.ssia import SSIA
+from ssia.mid_stack import MidStackCommand
+from ssia.model import SSIAModel
+
+dut = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1, move_width=2)
+model = SSIAModel(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1, move_width=2)
+
+def unpack(entry):
+    return (entry & 0xFFFFFFFF, entry >> 32)
+
+# Test 014: The reference model matches SSIA with multi-entry moves
+def process():
+    rng = random.Random(14)
+    yield from dut.zeroAllInputs()
+    for cycle in range(128):
+        stages = []
+        for stage in range(4):
+            swizzle = [rng.randrange(5), rng.randrange(4), rng.randrange(6), rng.randrange(6)]
+            pushpop = rng.choice([MidStackCommand.NOP, MidStackCommand.POP, MidStackCommand.PUSH])
+            push = (rng.getrandbits(32), rng.randrange(8))
+            mem = [(rng.getrandbits(32), rng.randrange(8)) for x in range(2)]
+            stages.append((swizzle, pushpop, push, mem, rng.randrange(2)))
+        writebacks = [(rng.getrandbits(32), rng.randrange(8))]
+        yield from dut.applyBundle(stages, writebacks)
+        yield Settle()
+
+        for stage in range(4):
+            peek = model.peek()
+            for i in range(2):
+                assert unpack((yield dut.out_peek[stage][i].as_value())) == peek[i]
+            for i in range(2):
+                assert unpack((yield dut.out_bottom_lanes[stage][i].as_value())) == model.bottom(i)
+            model.stage(*stages[stage])
+        model.latch(writebacks)
+        yield
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_014.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
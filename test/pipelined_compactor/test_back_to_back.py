@@ -0,0 +1,47 @@
+import random
+from amaranth.sim import Simulator, Settle
+from ssia.pipelined_compactor import PipelinedCompactor
+
+dut = PipelinedCompactor(width=16, count=8, latency=3)
+
+# Test 024: A new vector is accepted every cycle and each leaves compacted after a fixed latency
+def process():
+    rng = random.Random(24)
+    yield from dut.zeroAllInputs()
+    # expected: the (valid, value, count) that each cycle's vector should produce
+    expected = []
+    for cycle in range(64):
+        inputs = [rng.getrandbits(16) for x in range(8)]
+        enables = [rng.getrandbits(1) for x in range(8)]
+        # Vectors are back to back, except for a bubble every 16 cycles.
+        valid = int(cycle % 16 != 15)
+        for x in range(8):
+            yield dut.input[x].eq(inputs[x])
+            yield dut.input_en[x].eq(enables[x])
+        yield dut.input_valid.eq(valid)
+        packed = 0
+        for i, x in enumerate(v for v, en in zip(inputs, enables) if en):
+            packed |= x << (16*i)
+        expected.append((valid, packed, sum(enables)))
+        yield
+        yield Settle()
+        # Each clock edge has latched one more stage, so the vector from latency-1 cycles ago is now at the output.
+        if cycle >= 2:
+            valid, packed, count = expected[cycle-2]
+            assert (yield dut.output_valid) == valid
+            if valid:
+                assert (yield dut.output_val) == packed
+                assert (yield dut.output_count) == count
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_024.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
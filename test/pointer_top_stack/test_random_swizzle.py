@@ -0,0 +1,60 @@
+import random
+from amaranth import Module
+from amaranth.sim import Simulator, Settle
+from ssia.top_stack import TopStack
+from ssia.pointer_top_stack import PointerTopStack
+
+value_dut = TopStack(register_width=32, stack_depth=6, issue_stages=3, tag_width=3, writeback_count=2, move_width=2)
+pointer_dut = PointerTopStack(register_width=32, stack_depth=6, issue_stages=3, tag_width=3, writeback_count=2, move_width=2)
+
+# Test 026: Swizzling pointers into a register file matches swizzling the values under random swizzles and writebacks
+def process():
+    rng = random.Random(26)
+    yield from value_dut.zeroAllInputs()
+    yield from pointer_dut.zeroAllInputs()
+    for cycle in range(96):
+        for stage in range(3):
+            push = rng.getrandbits(35)
+            yield value_dut.in_push[stage].eq(push)
+            yield pointer_dut.in_push[stage].eq(push)
+            for lane in range(2):
+                mem = rng.getrandbits(35)
+                yield value_dut.in_mem_lanes[stage][lane].eq(mem)
+                yield pointer_dut.in_mem_lanes[stage][lane].eq(mem)
+            for slot in range(6):
+                if slot == 0:
+                    swizzle = rng.randrange(7)
+                elif slot >= 4:
+                    swizzle = rng.randrange(8)
+                else:
+                    swizzle = rng.randrange(6)
+                yield value_dut.in_stack_swizzle[stage][slot].eq(swizzle)
+                yield pointer_dut.in_stack_swizzle[stage][slot].eq(swizzle)
+        for x in range(2):
+            writeback = rng.getrandbits(35)
+            yield value_dut.in_writeback[x].eq(writeback)
+            yield pointer_dut.in_writeback[x].eq(writeback)
+        yield Settle()
+        for stage in range(3):
+            for i in range(2):
+                assert (yield value_dut.out_peek[stage][i]) == (yield pointer_dut.out_peek[stage][i])
+            for lane in range(2):
+                assert (yield value_dut.out_bottom_lanes[stage][lane]) == (yield pointer_dut.out_bottom_lanes[stage][lane])
+        assert (yield value_dut.out_tag_present) == (yield pointer_dut.out_tag_present)
+        yield
+
+def test(debug: bool = False):
+    m = Module()
+    m.submodules.value = value_dut
+    m.submodules.pointer = pointer_dut
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_026.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
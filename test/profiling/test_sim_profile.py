@@ -0,0 +1,40 @@
+from amaranth.sim import Simulator, Settle
+from ssia.mid_stack import MidStack
+from ssia.profiling import SimProfile
+
+dut = MidStack(register_width=32, stack_depth=4, issue_stages=2, tag_width=3, writeback_count=1)
+
+def process():
+    yield from dut.zeroAllInputs()
+    for cycle in range(3):
+        yield from dut.pushStackAllStages()
+        yield Settle()
+        assert (yield dut.out_peek[0]['tag']) == 0
+        yield
+
+# Test 022: Simulation profiles count commands, helper yields and cycles
+def test():
+    profile = SimProfile("midstack")
+    run = Simulator.run
+    with profile.instrument():
+        sim = Simulator(dut)
+        sim.add_clock(1e-6)
+        sim.add_sync_process(process)
+        sim.run()
+    assert Simulator.run is run
+
+    zero_yields = len(list(dut.zeroAllInputs()))
+    push_yields = len(list(dut.pushStackAllStages()))
+    assert profile.cycles == 3
+    assert profile.commands["tick"] == 3
+    assert profile.commands["settle"] == 3
+    assert profile.commands["read"] == 3
+    assert profile.commands["write"] == zero_yields + 3*push_yields
+    assert profile.helpers["MidStack.zeroAllInputs"] == zero_yields
+    assert profile.helpers["MidStack.pushStackAllStages"] == 3*push_yields
+    assert profile.helpers["MidStack.pushStackAtStage"] == 3*push_yields
+    assert profile.run_time > 0
+    assert "midstack: " in profile.report()
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,79 @@
+from amaranth.sim import Simulator
+from ssia.ssia import SSIA
+
+dut = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1, checkpoint_count=2)
+
+# Test 006: Checkpoint and restore
+def process():
+    # Push four values, the last of which is awaiting a writeback,
+    # and checkpoint the resulting state.
+    yield from dut.zeroAllInputs()
+    yield from dut.pushStackAllStages()
+    yield dut.in_push[0].eq(0x111111111)
+    yield dut.in_push[1].eq(0x122222222)
+    yield dut.in_push[2].eq(0x133333333)
+    yield dut.in_push[3].eq(0x700000000)
+    yield dut.in_checkpoint.eq(1)
+    yield
+    assert (yield dut.out_checkpoint_id) == 0
+    assert (yield dut.out_checkpoint_full) == 0
+
+    # Speculatively pop everything, and checkpoint again.
+    yield from dut.zeroAllInputs()
+    yield from dut.popStackAllStages()
+    yield dut.in_checkpoint.eq(1)
+    yield
+    assert (yield dut.out_checkpoint_id) == 1
+    assert (yield dut.out_checkpoint_full) == 0
+    assert (yield dut.out_peek[0][0]['tag']) == 7
+    assert (yield dut.out_peek[0][1]['tag']) == 1
+    assert (yield dut.out_peek[0][1]['val']) == 0x33333333
+
+    # Both checkpoints are now outstanding. The pushed values are no longer
+    # in the stack, but the writeback must still reach the first checkpoint.
+    yield from dut.zeroAllInputs()
+    yield from dut.feedForwardAllStages()
+    yield dut.in_checkpoint.eq(1)
+    yield dut.in_writeback[0].eq(0x777777777)
+    yield
+    assert (yield dut.out_checkpoint_full) == 1
+    assert (yield dut.out_peek[0][0]['tag']) == 0
+    assert (yield dut.out_peek[0][0]['val']) == 0
+    assert (yield dut.out_peek[0][1]['tag']) == 0
+    assert (yield dut.out_peek[0][1]['val']) == 0
+
+    # Mispredict: restore the first checkpoint, discarding the pushes in this bundle.
+    yield from dut.zeroAllInputs()
+    yield from dut.pushStackAllStages()
+    yield dut.in_push[0].eq(0x1DEADBEEF)
+    yield dut.in_restore.eq(1)
+    yield dut.in_restore_id.eq(0)
+    yield
+    assert (yield dut.out_checkpoint_full) == 1
+
+    # Both checkpoints are released, and the restored state includes the writeback.
+    yield from dut.zeroAllInputs()
+    yield from dut.feedForwardAllStages()
+    yield
+    assert (yield dut.out_checkpoint_full) == 0
+    assert (yield dut.out_checkpoint_id) == 0
+    for i in range(4):
+        assert (yield dut.out_peek[i][0]['tag']) == 1
+        assert (yield dut.out_peek[i][0]['val']) == 0x77777777
+        assert (yield dut.out_peek[i][1]['tag']) == 1
+        assert (yield dut.out_peek[i][1]['val']) == 0x33333333
+        assert (yield dut.out_bottom[i]['tag']) == 0
+        assert (yield dut.out_bottom[i]['val']) == 0
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_006.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
@@ -0,0 +1,54 @@
+import random
+from amaranth import Module
+from amaranth.sim import Simulator, Settle, Delay, Tick
+from ssia.ssia import SSIA
+from ssia.mid_stack import MidStackCommand
+
+ref = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1)
+dut = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1, double_pump=True)
+
+# Test 028: A double-pumped MidStack gives the same peeks, bottoms and tags as a single-clocked one
+def process():
+    rng = random.Random(28)
+    yield from ref.zeroAllInputs()
+    yield from dut.zeroAllInputs()
+    yield Tick()
+    for cycle in range(96):
+        stages = []
+        for stage in range(4):
+            swizzle = [rng.randrange(5), rng.randrange(4), rng.randrange(4), rng.randrange(5)]
+            pushpop = rng.choice([MidStackCommand.NOP, MidStackCommand.POP, MidStackCommand.PUSH])
+            push = (rng.getrandbits(32), rng.randrange(8))
+            mem = (rng.getrandbits(32), rng.randrange(8))
+            stages.append((swizzle, pushpop, push, mem))
+        writebacks = [(rng.getrandbits(32), rng.randrange(8))]
+        yield from ref.applyBundle(stages, writebacks)
+        yield from dut.applyBundle(stages, writebacks)
+
+        # Compare in the second half of the cycle, once the MidStack has run every stage.
+        yield Delay(1.5e-6)
+        yield Settle()
+        assert (yield dut.pump_second_half) == 1
+        for stage in range(4):
+            for i in range(2):
+                assert (yield ref.out_peek[stage][i]) == (yield dut.out_peek[stage][i])
+            assert (yield ref.out_bottom[stage]) == (yield dut.out_bottom[stage])
+        assert (yield ref.out_tag_present) == (yield dut.out_tag_present)
+        yield Tick()
+
+def test(debug: bool = False):
+    m = Module()
+    m.submodules.ref = ref
+    m.submodules.dut = dut
+    sim = Simulator(m)
+    sim.add_clock(2e-6)
+    sim.add_clock(1e-6, domain="fast", phase=0.5e-6)
+    sim.add_process(process)
+    if debug:
+        with sim.write_vcd('test_028.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
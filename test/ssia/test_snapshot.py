@@ -0,0 +1,92 @@
+import os
+import tempfile
+from amaranth import Module
+from amaranth.sim import Simulator, Settle
+from ssia.ssia import SSIA
+from ssia.model import SSIAModel
+from ssia.snapshot import Snapshot
+from ssia.workloads import KERNELS, StackMachine, runWorkload, flattenStack
+
+warm_dut = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1, checkpoint_count=2)
+cold_dut = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1, checkpoint_count=2)
+model = SSIAModel(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1)
+params = dict(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1)
+warm_up = 24
+
+def unpack(entry):
+    return (entry & 0xFFFFFFFF, entry >> 32)
+
+# Test 030: A snapshot taken after a warm-up resumes the same run on the model and on the Amaranth simulator
+def process():
+    vm = StackMachine(register_width=32)
+    KERNELS["dot"](vm, 16)
+    schedule, snapshots = [], []
+    stats, final_model, memory = runWorkload(vm.trace, **params, schedule=schedule, snapshots=snapshots, snapshot_cycles=[warm_up])
+    assert len(schedule) > 2*warm_up
+
+    with tempfile.TemporaryDirectory() as path:
+        # The scheduler resumes from a saved snapshot exactly as the original run continued.
+        snapshots[0].save(os.path.join(path, "model.json"))
+        snapshot = Snapshot.load(os.path.join(path, "model.json"))
+        resumed_schedule = []
+        resumed_stats, resumed_model, resumed_memory = runWorkload(vm.trace, **params, schedule=resumed_schedule, start=snapshot)
+        assert resumed_schedule == schedule[warm_up:]
+        assert flattenStack(resumed_model, resumed_memory) == flattenStack(final_model, memory)
+        for name in ["cycles", "ops", "spills", "fills", "writeback_stalls"]:
+            assert getattr(resumed_stats, name) == getattr(stats, name)
+
+        # Warm up one simulation, taking a checkpoint along the way so that the CheckpointFile holds state too.
+        yield from warm_dut.zeroAllInputs()
+        yield from cold_dut.zeroAllInputs()
+        for cycle in range(warm_up):
+            yield warm_dut.in_checkpoint.eq(cycle == warm_up-4)
+            yield from warm_dut.applyBundle(*schedule[cycle])
+            yield
+        yield warm_dut.in_checkpoint.eq(0)
+
+        sim_snapshot = yield from warm_dut.dumpState(warm_up)
+        assert sim_snapshot.top == snapshot.top
+        assert sim_snapshot.mid == snapshot.mid
+        assert sim_snapshot.registers["checkpoint_count"] == 1
+
+        # Fan out: the other simulation and the model start from the saved snapshot of the first.
+        sim_snapshot.save(os.path.join(path, "sim.json"))
+        yield from cold_dut.loadState(Snapshot.load(os.path.join(path, "sim.json")))
+        model.loadState(Snapshot.load(os.path.join(path, "sim.json")))
+
+    for stages, writebacks in schedule[warm_up:]:
+        for dut in [warm_dut, cold_dut]:
+            yield from dut.applyBundle(stages, writebacks)
+        yield Settle()
+        for stage in range(4):
+            peek = model.peek()
+            for dut in [warm_dut, cold_dut]:
+                for i in range(2):
+                    assert unpack((yield dut.out_peek[stage][i].as_value())) == peek[i]
+                assert unpack((yield dut.out_bottom[stage].as_value())) == model.bottom()
+            if stage < len(stages):
+                model.stage(*stages[stage])
+        model.latch(writebacks)
+        yield
+
+    warm_state = yield from warm_dut.dumpState()
+    cold_state = yield from cold_dut.dumpState()
+    assert warm_state.top == cold_state.top == final_model.top
+    assert warm_state.mid == cold_state.mid == final_model.mid
+    assert warm_state.registers == cold_state.registers
+
+def test(debug: bool = False):
+    m = Module()
+    m.submodules.warm = warm_dut
+    m.submodules.cold = cold_dut
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_030.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
@@ -0,0 +1,56 @@
+import random
+from amaranth.sim import Simulator, Settle
+from ssia.ssia import SSIA
+from ssia.mid_stack import MidStackCommand
+from ssia.model import SSIAModel
+
+dut = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1, sparse_issue=True)
+model = SSIAModel(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1)
+
+def unpack(entry):
+    return (entry & 0xFFFFFFFF, entry >> 32)
+
+# Test 025: Partially filled bundles issue their valid stages in order, with peeks at the original stages
+def process():
+    rng = random.Random(25)
+    yield from dut.zeroAllInputs()
+    for cycle in range(96):
+        stages = []
+        valid = [rng.getrandbits(1) for stage in range(4)]
+        for stage in range(4):
+            swizzle = [rng.randrange(5), rng.randrange(4), rng.randrange(4), rng.randrange(5)]
+            pushpop = rng.choice([MidStackCommand.NOP, MidStackCommand.POP, MidStackCommand.PUSH])
+            push = (rng.getrandbits(32), rng.randrange(8))
+            mem = (rng.getrandbits(32), rng.randrange(8))
+            stages.append((swizzle, pushpop, push, mem))
+            yield dut.in_stage_valid[stage].eq(valid[stage])
+        writebacks = [(rng.getrandbits(32), rng.randrange(8))]
+        yield from dut.applyBundle(stages, writebacks)
+        yield Settle()
+
+        assert (yield dut.out_active_stages) == sum(valid)
+        for stage in range(4):
+            if valid[stage]:
+                peek = model.peek()
+                for i in range(2):
+                    assert unpack((yield dut.out_peek[stage][i].as_value())) == peek[i]
+                assert unpack((yield dut.out_bottom[stage].as_value())) == model.bottom()
+                model.stage(*stages[stage])
+            else:
+                assert (yield dut.out_peek[stage][0].as_value()) == 0
+                assert (yield dut.out_bottom[stage].as_value()) == 0
+        model.latch(writebacks)
+        yield
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_025.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
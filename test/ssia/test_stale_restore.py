@@ -0,0 +1,86 @@
+from amaranth.sim import Simulator, Settle
+from ssia.ssia import SSIA
+
+dut = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1, checkpoint_count=2)
+
+# Test 032: Restoring a checkpoint that is not outstanding is ignored
+def process():
+    # Nothing is outstanding, so the restore is ignored and the pushes are issued.
+    yield from dut.zeroAllInputs()
+    yield from dut.feedForwardAllStages()
+    yield from dut.pushStackAtStage(0)
+    yield dut.in_push[0].eq(0x111111111)
+    yield dut.in_restore.eq(1)
+    yield dut.in_restore_id.eq(0)
+    yield
+    yield from dut.zeroAllInputs()
+    yield from dut.feedForwardAllStages()
+    yield Settle()
+    assert (yield dut.out_checkpoint_id) == 0
+    assert (yield dut.out_checkpoint_full) == 0
+    assert (yield dut.out_peek[0][0].as_value()) == 0x111111111
+
+    # Checkpoint the pushed value, then push another.
+    yield dut.in_checkpoint.eq(1)
+    yield
+    yield from dut.zeroAllInputs()
+    yield from dut.feedForwardAllStages()
+    yield from dut.pushStackAtStage(0)
+    yield dut.in_push[0].eq(0x122222222)
+    yield
+    yield from dut.zeroAllInputs()
+    yield from dut.feedForwardAllStages()
+    yield Settle()
+    assert (yield dut.out_checkpoint_id) == 1
+
+    # Checkpoint 1 has not been taken, so restoring it is ignored and the pop is issued.
+    yield from dut.popStackAtStage(0)
+    yield dut.in_restore.eq(1)
+    yield dut.in_restore_id.eq(1)
+    yield
+    yield from dut.zeroAllInputs()
+    yield from dut.feedForwardAllStages()
+    yield Settle()
+    assert (yield dut.out_checkpoint_id) == 1
+    assert (yield dut.out_peek[0][0].as_value()) == 0x111111111
+    assert (yield dut.out_peek[0][1].as_value()) == 0
+
+    # Checkpoint 0 is still outstanding and is restored.
+    yield from dut.pushStackAtStage(0)
+    yield dut.in_push[0].eq(0x133333333)
+    yield dut.in_restore.eq(1)
+    yield dut.in_restore_id.eq(0)
+    yield
+    yield from dut.zeroAllInputs()
+    yield from dut.feedForwardAllStages()
+    yield Settle()
+    assert (yield dut.out_checkpoint_id) == 0
+    assert (yield dut.out_checkpoint_full) == 0
+    assert (yield dut.out_peek[0][0].as_value()) == 0x111111111
+    assert (yield dut.out_peek[0][1].as_value()) == 0
+
+    # Restoring the released checkpoint again is ignored.
+    yield from dut.pushStackAtStage(0)
+    yield dut.in_push[0].eq(0x144444444)
+    yield dut.in_restore.eq(1)
+    yield dut.in_restore_id.eq(0)
+    yield
+    yield from dut.zeroAllInputs()
+    yield from dut.feedForwardAllStages()
+    yield Settle()
+    assert (yield dut.out_checkpoint_id) == 0
+    assert (yield dut.out_peek[0][0].as_value()) == 0x144444444
+    assert (yield dut.out_peek[0][1].as_value()) == 0x111111111
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_032.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
@@ -0,0 +1,52 @@
+import random
+from amaranth import Module
+from amaranth.sim import Simulator, Settle
+from ssia.ssia import SSIA
+from ssia.mid_stack import MidStackCommand
+
+ref = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1, move_width=2)
+binary_dut = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1, move_width=2, value_lanes=3)
+onehot_dut = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1, move_width=2, value_lanes=3, onehot_swizzle=True)
+
+# Test 029: Slicing values into lanes with replicated controls matches the unsliced stacks
+def process():
+    rng = random.Random(29)
+    duts = [ref, binary_dut, onehot_dut]
+    for dut in duts:
+        yield from dut.zeroAllInputs()
+    for cycle in range(96):
+        stages = []
+        for stage in range(4):
+            swizzle = [rng.randrange(5), rng.randrange(4), rng.randrange(6), rng.randrange(6)]
+            pushpop = rng.choice([MidStackCommand.NOP, MidStackCommand.POP, MidStackCommand.PUSH])
+            push = (rng.getrandbits(32), rng.randrange(8))
+            mem = [(rng.getrandbits(32), rng.randrange(8)) for lane in range(2)]
+            stages.append((swizzle, pushpop, push, mem, rng.randrange(2)))
+        writebacks = [(rng.getrandbits(32), rng.randrange(8))]
+        for dut in duts:
+            yield from dut.applyBundle(stages, writebacks)
+        yield Settle()
+        for dut in duts[1:]:
+            for stage in range(4):
+                for i in range(2):
+                    assert (yield ref.out_peek[stage][i]) == (yield dut.out_peek[stage][i])
+                for lane in range(2):
+                    assert (yield ref.out_bottom_lanes[stage][lane]) == (yield dut.out_bottom_lanes[stage][lane])
+        yield
+
+def test(debug: bool = False):
+    m = Module()
+    m.submodules.ref = ref
+    m.submodules.binary = binary_dut
+    m.submodules.onehot = onehot_dut
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_029.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
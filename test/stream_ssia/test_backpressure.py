@@ -0,0 +1,89 @@
+from amaranth.sim import Simulator, Settle, Passive
+from ssia.stream_ssia import StreamSSIA
+
+dut = StreamSSIA(register_width=32, top_stack_depth=2, mid_stack_depth=2, issue_stages=2, tag_width=3, writeback_count=1)
+
+spilled = []
+
+# Test 007: Bundles with bubbles, spill backpressure and late fill data
+def producer():
+    yield from dut.zeroAllInputs()
+    yield Settle()
+
+    # Four bundles, each pushing two values, with a bubble between each.
+    for i in range(4):
+        yield from dut.pushStackAllStages()
+        yield dut.in_bundle.push[0].eq(0x100000000 | (2*i+1))
+        yield dut.in_bundle.push[1].eq(0x100000000 | (2*i+2))
+        yield dut.in_bundle_valid.eq(1)
+        yield Settle()
+        while not (yield dut.in_bundle_ready):
+            yield
+            yield Settle()
+        yield
+        yield dut.in_bundle_valid.eq(0)
+        yield
+        yield Settle()
+
+    # A bundle popping two values, which must wait for its fill data.
+    yield from dut.popStackAllStages()
+    yield dut.in_bundle_valid.eq(1)
+    yield Settle()
+    while not (yield dut.in_bundle_ready):
+        yield
+        yield Settle()
+    yield
+    yield dut.in_bundle_valid.eq(0)
+
+    # The stack must not move until the fill data arrives.
+    for i in range(8):
+        yield
+        yield Settle()
+        assert (yield dut.out_peek[0][0]['val']) == 8
+        assert (yield dut.out_peek[0][1]['val']) == 7
+
+    yield dut.in_mem[0].eq(0x1000000AA)
+    yield dut.in_mem[1].eq(0x1000000BB)
+    yield dut.in_mem_valid.eq(1)
+    yield Settle()
+    assert (yield dut.in_mem_ready)
+    yield
+    yield dut.in_mem_valid.eq(0)
+
+    for i in range(4):
+        yield
+    yield Settle()
+    assert (yield dut.out_peek[0][0]['val']) == 6
+    assert (yield dut.out_peek[0][1]['val']) == 5
+
+    # Every spill reached the consumer in order, despite its stalls.
+    assert spilled == [0, 0, 0, 0, 1, 2, 3, 4]
+
+def consumer():
+    yield Passive()
+    cycle = 0
+    while True:
+        yield dut.out_bottom_ready.eq(cycle % 3 == 0)
+        yield Settle()
+        if (yield dut.out_bottom_valid) and (yield dut.out_bottom_ready):
+            mask = yield dut.out_bottom.mask
+            for x in range(2):
+                if mask & (1 << x):
+                    spilled.append((yield dut.out_bottom.bottom[x]['val']))
+        cycle += 1
+        yield
+
+def test(debug: bool = False):
+    spilled.clear()
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(producer)
+    sim.add_sync_process(consumer)
+    if debug:
+        with sim.write_vcd('test_007.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
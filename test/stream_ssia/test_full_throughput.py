@@ -0,0 +1,60 @@
+from amaranth.sim import Simulator, Settle
+from ssia.stream_ssia import StreamSSIA
+
+dut = StreamSSIA(register_width=32, top_stack_depth=2, mid_stack_depth=2, issue_stages=2, tag_width=3, writeback_count=1)
+
+# Test 033: With every stream valid and ready, one bundle is accepted and issued per cycle without bubbles
+def process():
+    # Every bundle pushes at stage 0 and pops at stage 1, so it both spills an entry and consumes fill data, and all
+    # four streams carry a transfer every cycle.
+    yield from dut.zeroAllInputs()
+    yield from dut.pushStackAtStage(0)
+    yield from dut.popStackAtStage(1)
+    yield dut.in_bundle_valid.eq(1)
+    yield dut.in_mem_valid.eq(1)
+    yield dut.in_writeback_valid.eq(1)
+    yield dut.out_bottom_ready.eq(1)
+
+    accepted = issued = spilled = 0
+    for cycle in range(32):
+        yield dut.in_bundle.push[0].eq(0x100000000 | cycle)
+        yield dut.in_mem[0].eq(0x100000000 | (0x100+cycle))
+        yield Settle()
+        # Each stream has a one cycle latency through its SkidBuffer, after which nothing stalls.
+        assert (yield dut.in_bundle_ready) == 1
+        assert (yield dut.in_mem_ready) == 1
+        assert (yield dut.in_writeback_ready) == 1
+        if cycle >= 1:
+            assert (yield dut.out_issue) == 1
+        if cycle >= 2:
+            assert (yield dut.out_bottom_valid) == 1
+            assert (yield dut.out_bottom.mask) == 0b01
+        accepted += (yield dut.in_bundle_valid) & (yield dut.in_bundle_ready)
+        issued += yield dut.out_issue
+        spilled += (yield dut.out_bottom_valid) & (yield dut.out_bottom_ready)
+        yield
+
+    # Drain the bundles still in flight.
+    yield dut.in_bundle_valid.eq(0)
+    yield dut.in_mem_valid.eq(0)
+    for cycle in range(3):
+        yield Settle()
+        issued += yield dut.out_issue
+        spilled += (yield dut.out_bottom_valid) & (yield dut.out_bottom_ready)
+        yield
+    assert accepted == 32
+    assert issued == 32
+    assert spilled == 32
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_033.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
@@ -0,0 +1,68 @@
+from amaranth.sim import Simulator, Settle
+from ssia.stream_ssia import StreamSSIA
+
+dut = StreamSSIA(register_width=32, top_stack_depth=2, mid_stack_depth=2, issue_stages=2, tag_width=3, writeback_count=1)
+
+def issue():
+    # Offer the bundle until it issues.
+    yield dut.in_bundle_valid.eq(1)
+    yield Settle()
+    while not (yield dut.in_bundle_ready):
+        yield
+        yield Settle()
+    yield
+    yield dut.in_bundle_valid.eq(0)
+    for i in range(3):
+        yield
+
+# Test 035: Fill entries are packed in pop order, whichever stages of the bundle pop
+def process():
+    yield from dut.zeroAllInputs()
+    yield dut.out_bottom_ready.eq(1)
+
+    # Push 1 to 4, leaving 4 and 3 in the top region and 2 and 1 in the mid region.
+    for i in range(2):
+        yield from dut.pushStackAllStages()
+        yield dut.in_bundle.push[0].eq(0x100000000 | (2*i+1))
+        yield dut.in_bundle.push[1].eq(0x100000000 | (2*i+2))
+        yield from issue()
+
+    # Only stage 1 pops, and it takes the first fill entry.
+    yield from dut.feedForwardAtStage(0)
+    yield from dut.popStackAtStage(1)
+    yield dut.in_mem[0].eq(0x1000000AA)
+    yield dut.in_mem[1].eq(0x1000000FF)
+    yield dut.in_mem_valid.eq(1)
+    yield Settle()
+    assert (yield dut.in_mem_ready)
+    yield
+    yield dut.in_mem_valid.eq(0)
+    yield from issue()
+    yield Settle()
+    assert (yield dut.out_peek[0][0]['val']) == 3
+    assert (yield dut.out_peek[0][1]['val']) == 2
+
+    # Both stages pop, bringing the first fill entry up to the top region.
+    yield from dut.popStackAllStages()
+    yield dut.in_mem[0].eq(0x1000000BB)
+    yield dut.in_mem[1].eq(0x1000000CC)
+    yield dut.in_mem_valid.eq(1)
+    yield
+    yield dut.in_mem_valid.eq(0)
+    yield from issue()
+    yield Settle()
+    assert (yield dut.out_peek[0][0]['val']) == 1
+    assert (yield dut.out_peek[0][1]['val']) == 0xAA
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_035.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
@@ -0,0 +1,56 @@
+import random
+from amaranth.sim import Simulator, Settle
+from ssia.top_stack import TopStack
+
+dut = TopStack(register_width=32, stack_depth=6, issue_stages=2, tag_width=3, writeback_count=1, onehot_swizzle=True)
+
+# Test 034: With one-hot swizzles, slot write enables agree with the latched values under out-of-range swizzles
+def process():
+    rng = random.Random(34)
+    yield from dut.zeroAllInputs()
+
+    # Fill the stack with distinct values.
+    for cycle in range(6):
+        yield from dut.pushStackAtStage(0)
+        yield from dut.feedForwardAtStage(1)
+        yield dut.in_push[0].eq(0x100000000 | (cycle+1))
+        yield
+    yield from dut.feedForwardAllStages()
+    yield dut.in_push[0].eq(0)
+
+    # An out-of-range swizzle selects nothing in the one-hot crossbar, so the slot is cleared and must be written.
+    yield dut.in_stack_swizzle[0][1].eq(7)
+    yield Settle()
+    assert (yield dut.out_next_state[1].as_value()) == 0
+    assert (yield dut.out_slot_we[1]) == 1
+    assert (yield dut.out_slot_we[2]) == 0
+    yield
+    yield Settle()
+    assert (yield dut.stacks[0][1].as_value()) == 0
+
+    # Random swizzles over the whole range of each select: a slot that is not written keeps its value.
+    for cycle in range(128):
+        for stage in range(2):
+            for slot in range(6):
+                yield dut.in_stack_swizzle[stage][slot].eq(rng.randrange(8))
+            yield dut.in_push[stage].eq(rng.getrandbits(35))
+            yield dut.in_mem[stage].eq(rng.getrandbits(35))
+        yield dut.in_writeback[0].eq(rng.getrandbits(35))
+        yield Settle()
+        for slot in range(6):
+            if not (yield dut.out_slot_we[slot]):
+                assert (yield dut.out_next_state[slot].as_value()) == (yield dut.stacks[0][slot].as_value())
+        yield
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_034.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
@@ -0,0 +1,54 @@
+import random
+from amaranth import Module
+from amaranth.sim import Simulator
+from ssia.top_stack import TopStack
+
+binary_dut = TopStack(register_width=32, stack_depth=8, issue_stages=4, tag_width=3, writeback_count=1)
+onehot_dut = TopStack(register_width=32, stack_depth=8, issue_stages=4, tag_width=3, writeback_count=1, onehot_swizzle=True)
+
+# Test 008: The one-hot crossbar matches the binary-indexed muxes under random swizzles
+def process():
+    rng = random.Random(8)
+    yield from binary_dut.zeroAllInputs()
+    yield from onehot_dut.zeroAllInputs()
+    for cycle in range(64):
+        for stage in range(4):
+            push = rng.getrandbits(35)
+            mem = rng.getrandbits(35)
+            yield binary_dut.in_push[stage].eq(push)
+            yield onehot_dut.in_push[stage].eq(push)
+            yield binary_dut.in_mem[stage].eq(mem)
+            yield onehot_dut.in_mem[stage].eq(mem)
+            for slot in range(8):
+                if slot == 0 or slot == 7:
+                    swizzle = rng.randrange(9)
+                else:
+                    swizzle = rng.randrange(8)
+                yield binary_dut.in_stack_swizzle[stage][slot].eq(swizzle)
+                yield onehot_dut.in_stack_swizzle[stage][slot].eq(swizzle)
+        writeback = rng.getrandbits(35)
+        yield binary_dut.in_writeback[0].eq(writeback)
+        yield onehot_dut.in_writeback[0].eq(writeback)
+        yield
+        for stage in range(4):
+            for i in range(2):
+                assert (yield binary_dut.out_peek[stage][i]) == (yield onehot_dut.out_peek[stage][i])
+            assert (yield binary_dut.out_bottom[stage]) == (yield onehot_dut.out_bottom[stage])
+        for slot in range(8):
+            assert (yield binary_dut.out_next_state[slot]) == (yield onehot_dut.out_next_state[slot])
+
+def test(debug: bool = False):
+    m = Module()
+    m.submodules.binary = binary_dut
+    m.submodules.onehot = onehot_dut
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_008.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
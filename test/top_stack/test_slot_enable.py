@@ -0,0 +1,68 @@
+from amaranth.sim import Simulator, Settle
+from ssia.top_stack import TopStack
+
+dut = TopStack(register_width=32, stack_depth=4, issue_stages=2, tag_width=3, writeback_count=1)
+
+def enables():
+    result = []
+    for we in dut.out_slot_we:
+        result.append((yield we))
+    return result
+
+# Test 020: Slot write enables only fire for slots that change
+def process():
+    # Idle cycles write no slots.
+    yield from dut.zeroAllInputs()
+    yield from dut.feedForwardAllStages()
+    yield Settle()
+    assert (yield from enables()) == [0, 0, 0, 0]
+
+    # A swap writes the two swapped slots.
+    yield dut.in_stack_swizzle[0][0].eq(1)
+    yield dut.in_stack_swizzle[0][1].eq(0)
+    yield Settle()
+    assert (yield from enables()) == [1, 1, 0, 0]
+
+    # Swapping back in the next stage leaves every slot as it was.
+    yield dut.in_stack_swizzle[1][0].eq(1)
+    yield dut.in_stack_swizzle[1][1].eq(0)
+    yield Settle()
+    assert (yield from enables()) == [0, 0, 0, 0]
+
+    # A push moves every slot.
+    yield from dut.feedForwardAllStages()
+    yield from dut.pushStackAtStage(0)
+    yield dut.in_push[0].eq(0x211111111)
+    yield
+    yield Settle()
+    assert (yield from enables()) == [1, 1, 1, 1]
+
+    # A writeback writes only the slot it matches.
+    yield from dut.feedForwardAllStages()
+    yield dut.in_writeback[0].eq(0x222222222)
+    yield Settle()
+    assert (yield from enables()) == [1, 0, 0, 0]
+    yield
+    yield dut.in_writeback[0].eq(0)
+    yield Settle()
+    assert (yield dut.out_peek[0][0]['val']) == 0x22222222
+    assert (yield dut.out_peek[0][1]['val']) == 0
+    assert (yield from enables()) == [0, 0, 0, 0]
+
+    # A restore writes every slot.
+    yield dut.in_restore.eq(1)
+    yield Settle()
+    assert (yield from enables()) == [1, 1, 1, 1]
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_020.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
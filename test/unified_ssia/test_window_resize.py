@@ -0,0 +1,59 @@
+import random
+from amaranth.sim import Simulator, Settle
+from ssia.unified_ssia import UnifiedSSIA
+from ssia.mid_stack import MidStackCommand
+from ssia.model import SSIAModel
+
+dut = UnifiedSSIA(register_width=32, stack_depth=8, window_depth=5, issue_stages=3, tag_width=3, writeback_count=1)
+
+def unpack(entry):
+    return (entry & 0xFFFFFFFF, entry >> 32)
+
+# Test 023: A unified stack matches an SSIA split at its current window, as the window is resized. Windows outside
+# 2 to window_depth are clamped.
+def process():
+    rng = random.Random(23)
+    yield from dut.zeroAllInputs()
+    stack = [(0, 0)] * 8
+    for cycle in range(128):
+        # Resize the window every few cycles. The whole stack stays in place across the new boundary.
+        if cycle % 4 == 0:
+            requested = rng.randrange(0, 8)
+            window = min(max(requested, 2), 5)
+            yield dut.in_window.eq(requested)
+        model = SSIAModel(register_width=32, top_stack_depth=window, mid_stack_depth=8-window, issue_stages=3, tag_width=3, writeback_count=1)
+        model.top, model.mid = stack[:window], stack[window:]
+
+        stages = []
+        for stage in range(3):
+            swizzle = [rng.randrange(window+1)] + [rng.randrange(window) for d in range(window-2)] + [rng.randrange(window+1)]
+            pushpop = rng.choice([MidStackCommand.NOP, MidStackCommand.POP, MidStackCommand.PUSH])
+            push = (rng.getrandbits(32), rng.randrange(8))
+            mem = (rng.getrandbits(32), rng.randrange(8))
+            stages.append((swizzle, pushpop, push, mem))
+        writebacks = [(rng.getrandbits(32), rng.randrange(8))]
+        yield from dut.applyBundle(stages, writebacks)
+        yield Settle()
+
+        for stage in range(3):
+            peek = model.peek()
+            for i in range(2):
+                assert unpack((yield dut.out_peek[stage][i].as_value())) == peek[i]
+            assert unpack((yield dut.out_bottom[stage].as_value())) == model.bottom()
+            model.stage(*stages[stage])
+        model.latch(writebacks)
+        stack = model.top + model.mid
+        yield
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_023.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
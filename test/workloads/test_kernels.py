@@ -0,0 +1,31 @@
+from ssia.workloads import KERNELS, StackMachine, runWorkload, flattenStack
+
+# Test 010: Every kernel leaves the same stack on the SSIA model as on the stack machine, with every result
+# written back, across narrow and wide configurations. Only occupied entries below the mid region are spilled, and
+# results wait on their operands, so a deeper mid region spills less and a dependent kernel issues below the width.
+def test():
+    for name, kernel in KERNELS.items():
+        vm = StackMachine(register_width=32)
+        kernel(vm)
+        for issue_stages, top_stack_depth, mid_stack_depth, tag_width, writeback_count in [(2, 4, 4, 3, 1), (4, 4, 4, 4, 1), (8, 8, 8, 6, 4)]:
+            stats, model, memory = runWorkload(vm.trace, register_width=32, top_stack_depth=top_stack_depth, mid_stack_depth=mid_stack_depth, issue_stages=issue_stages, tag_width=tag_width, writeback_count=writeback_count)
+            assert stats.ops == len(vm.trace)
+            assert stats.ipc <= issue_stages
+            stack = flattenStack(model, memory)
+            for i, val in enumerate(reversed(vm.stack)):
+                assert stack[i] == (val, 1)
+
+    vm = StackMachine(register_width=32)
+    KERNELS["fib"](vm)
+    shallow, _, _ = runWorkload(vm.trace, register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=5, writeback_count=2)
+    deep, _, _ = runWorkload(vm.trace, register_width=32, top_stack_depth=4, mid_stack_depth=8, issue_stages=4, tag_width=5, writeback_count=2)
+    assert deep.spills < shallow.spills
+    assert deep.fills <= deep.spills
+    assert deep.ipc < 4
+
+    vm = StackMachine()
+    KERNELS["fib"](vm, 10)
+    assert vm.stack == [55]
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,71 @@
+from amaranth import Module
+from amaranth.sim import Simulator, Settle
+from ssia.ssia import SSIA
+from ssia.writeback_queue import WritebackQueue
+
+ssia = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1)
+dut = WritebackQueue(register_width=32, queue_depth=4, input_count=4, tag_width=3, writeback_count=1)
+
+def unpack(entry):
+    return (entry & 0xFFFFFFFF, entry >> 32)
+
+# Test 027: A burst of results is written back one per cycle, skipping results whose tags have left the stacks
+def process():
+    # Push entries awaiting writebacks to tags 2 to 5, leaving tag 5 on top. The writeback ports and the tags present
+    # are driven between the two modules, so neither module's zeroAllInputs() is used.
+    yield from ssia.pushStackAllStages()
+    for stage in range(4):
+        yield ssia.in_push[stage].eq((2+stage) << 32)
+    yield
+    yield from ssia.feedForwardAllStages()
+    yield Settle()
+    assert (yield ssia.out_tag_present) == 0b111101
+
+    # A burst of results, where tag 6 is not on the stack and is dropped on arrival. The queue is empty, so tag 2 is
+    # written back in the same cycle and the rest are queued.
+    for x, tag in enumerate([2, 3, 5, 6]):
+        yield dut.in_result[x].eq((0x100+tag) | (tag << 32))
+        yield dut.in_result_valid[x].eq(1)
+    yield Settle()
+    assert (yield dut.out_stall) == 0
+    assert unpack((yield dut.out_writeback[0].as_value())) == (0x102, 2)
+    yield
+    for x in range(4):
+        yield dut.in_result_valid[x].eq(0)
+    yield Settle()
+    assert (yield dut.out_occupancy) == 2
+
+    # Tag 5 is popped off the stack while tag 3 is written back.
+    yield from ssia.popStackAtStage(0)
+    yield Settle()
+    assert unpack((yield dut.out_writeback[0].as_value())) == (0x103, 3)
+    yield
+    yield from ssia.feedForwardAllStages()
+    yield Settle()
+    assert (yield dut.out_occupancy) == 1
+    assert unpack((yield ssia.out_peek[0][0].as_value())) == (0, 4)
+    assert unpack((yield dut.out_writeback[0].as_value()))[1] == 0
+    yield
+    yield Settle()
+    assert (yield dut.out_occupancy) == 0
+    assert unpack((yield ssia.out_peek[0][1].as_value())) == (0x103, 1)
+    assert (yield ssia.out_tag_present) == 0b010011
+
+def test(debug: bool = False):
+    m = Module()
+    m.submodules.ssia = ssia
+    m.submodules.queue = dut
+    m.d.comb += dut.in_tag_present.eq(ssia.out_tag_present)
+    for x in range(1):
+        m.d.comb += ssia.in_writeback[x].eq(dut.out_writeback[x])
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_027.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
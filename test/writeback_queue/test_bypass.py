@@ -0,0 +1,85 @@
+from amaranth.sim import Simulator, Settle
+from ssia.writeback_queue import WritebackQueue
+
+dut = WritebackQueue(register_width=32, queue_depth=4, input_count=4, tag_width=3, writeback_count=2)
+
+def unpack(entry):
+    return (entry & 0xFFFFFFFF, entry >> 32)
+
+# Test 036: Results that get a free writeback port bypass the queue, so an unloaded queue adds no latency
+def process():
+    yield from dut.zeroAllInputs()
+    yield dut.in_tag_present.eq(0b11111100)
+
+    # Up to two results a cycle are written back in the cycle they arrive, in input order, and nothing is queued.
+    for cycle in range(6):
+        tags = [2+cycle%5, 3+cycle%5] if cycle % 2 else [2+cycle%5]
+        for x in range(4):
+            yield dut.in_result_valid[x].eq(0)
+        for x, tag in zip([1, 3], tags):
+            yield dut.in_result[x].eq((0x100+tag) | (tag << 32))
+            yield dut.in_result_valid[x].eq(1)
+        yield Settle()
+        assert (yield dut.out_stall) == 0
+        for x, tag in enumerate(tags):
+            assert unpack((yield dut.out_writeback[x].as_value())) == (0x100+tag, tag)
+        for x in range(len(tags), 2):
+            assert unpack((yield dut.out_writeback[x].as_value()))[1] == 0
+        yield
+        yield Settle()
+        assert (yield dut.out_occupancy) == 0
+
+    # A burst of four writes back two and queues two, and a further result waits behind the queued results.
+    for x, tag in enumerate([2, 3, 4, 5]):
+        yield dut.in_result[x].eq((0x100+tag) | (tag << 32))
+        yield dut.in_result_valid[x].eq(1)
+    yield Settle()
+    assert unpack((yield dut.out_writeback[0].as_value())) == (0x102, 2)
+    assert unpack((yield dut.out_writeback[1].as_value())) == (0x103, 3)
+    yield
+    for x in range(4):
+        yield dut.in_result_valid[x].eq(0)
+    yield dut.in_result[0].eq(0x106 | (6 << 32))
+    yield dut.in_result_valid[0].eq(1)
+    yield Settle()
+    assert (yield dut.out_occupancy) == 2
+    assert unpack((yield dut.out_writeback[0].as_value())) == (0x104, 4)
+    assert unpack((yield dut.out_writeback[1].as_value())) == (0x105, 5)
+    yield
+    yield dut.in_result_valid[0].eq(0)
+    yield Settle()
+    assert (yield dut.out_occupancy) == 1
+    assert unpack((yield dut.out_writeback[0].as_value())) == (0x106, 6)
+    yield
+    yield Settle()
+    assert (yield dut.out_occupancy) == 0
+
+    # With one port left by a queued result, one result is bypassed alongside it.
+    for x, tag in enumerate([2, 3, 4]):
+        yield dut.in_result[x].eq((0x100+tag) | (tag << 32))
+        yield dut.in_result_valid[x].eq(1)
+    yield
+    yield dut.in_result_valid[0].eq(0)
+    yield dut.in_result_valid[1].eq(0)
+    yield dut.in_result[2].eq(0x107 | (7 << 32))
+    yield Settle()
+    assert (yield dut.out_occupancy) == 1
+    assert unpack((yield dut.out_writeback[0].as_value())) == (0x104, 4)
+    assert unpack((yield dut.out_writeback[1].as_value())) == (0x107, 7)
+    yield
+    yield dut.in_result_valid[2].eq(0)
+    yield Settle()
+    assert (yield dut.out_occupancy) == 0
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_036.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
@@ -0,0 +1,69 @@
+from amaranth import Module
+from amaranth.sim import Simulator, Settle
+from ssia.ssia import SSIA
+from ssia.writeback_queue import WritebackQueue
+
+ssia = SSIA(register_width=32, top_stack_depth=4, mid_stack_depth=4, issue_stages=4, tag_width=3, writeback_count=1, checkpoint_count=2)
+dut = WritebackQueue(register_width=32, queue_depth=4, input_count=4, tag_width=3, writeback_count=1)
+
+def unpack(entry):
+    return (entry & 0xFFFFFFFF, entry >> 32)
+
+# Test 031: A result for a tag held only by an outstanding checkpoint is kept, and reaches the stack after a restore
+def process():
+    # Push entries awaiting writebacks to tags 2 to 5 and checkpoint them, then speculatively pop them all. As in
+    # Test 027, neither module's zeroAllInputs() is used.
+    yield from ssia.pushStackAllStages()
+    for stage in range(4):
+        yield ssia.in_push[stage].eq((2+stage) << 32)
+    yield ssia.in_checkpoint.eq(1)
+    yield
+    yield ssia.in_checkpoint.eq(0)
+    yield from ssia.popStackAllStages()
+    yield
+    yield from ssia.feedForwardAllStages()
+    yield Settle()
+    assert unpack((yield ssia.out_peek[0][0].as_value())) == (0, 0)
+    assert (yield ssia.out_tag_present) == 0b111101
+
+    # The result for tag 5 is accepted rather than dropped, and is written back into the checkpoint.
+    yield dut.in_result[0].eq(0x105 | (5 << 32))
+    yield dut.in_result_valid[0].eq(1)
+    yield Settle()
+    assert (yield dut.out_stall) == 0
+    assert unpack((yield dut.out_writeback[0].as_value())) == (0x105, 5)
+    yield
+    yield dut.in_result_valid[0].eq(0)
+    yield Settle()
+    assert (yield dut.out_occupancy) == 0
+    assert (yield ssia.out_tag_present) == 0b011111
+
+    # Mispredict: the restored state includes the writeback.
+    yield ssia.in_restore.eq(1)
+    yield ssia.in_restore_id.eq(0)
+    yield
+    yield ssia.in_restore.eq(0)
+    yield Settle()
+    assert (yield ssia.out_checkpoint_full) == 0
+    assert unpack((yield ssia.out_peek[0][0].as_value())) == (0x105, 1)
+    assert unpack((yield ssia.out_peek[0][1].as_value())) == (0, 4)
+    assert (yield ssia.out_tag_present) == 0b011111
+
+def test(debug: bool = False):
+    m = Module()
+    m.submodules.ssia = ssia
+    m.submodules.queue = dut
+    m.d.comb += dut.in_tag_present.eq(ssia.out_tag_present)
+    for x in range(1):
+        m.d.comb += ssia.in_writeback[x].eq(dut.out_writeback[x])
+    sim = Simulator(m)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_031.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)
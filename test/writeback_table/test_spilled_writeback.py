@@ -0,0 +1,141 @@
+from amaranth.sim import Simulator, Settle
+from ssia.writeback_table import WritebackTable
+
+dut = WritebackTable(register_width=32, entry_count=2, address_width=8, issue_stages=2, tag_width=3, writeback_count=1)
+
+def entry(val, tag):
+    return val | (tag << 32)
+
+# Test 019: Writebacks to spilled entries are patched into memory or substituted on refill
+def process():
+    # Spill two tagged entries and an untagged one.
+    yield from dut.zeroAllInputs()
+    yield dut.in_spill[0].eq(entry(0, 2))
+    yield dut.in_spill_valid[0].eq(1)
+    yield dut.in_spill_address[0].eq(5)
+    yield dut.in_spill[1].eq(entry(0x1234, 1))
+    yield dut.in_spill_valid[1].eq(1)
+    yield dut.in_spill_address[1].eq(6)
+    yield Settle()
+    assert (yield dut.out_stall) == 0
+    yield
+    yield from dut.zeroAllInputs()
+    yield dut.in_spill[0].eq(entry(0, 3))
+    yield dut.in_spill_valid[0].eq(1)
+    yield dut.in_spill_address[0].eq(7)
+    yield
+    yield Settle()
+    assert (yield dut.out_occupancy) == 2
+    assert (yield dut.out_tag_present) == 0b1100
+
+    # The table is full, so a further tagged spill stalls.
+    yield dut.in_spill[0].eq(entry(0, 4))
+    yield Settle()
+    assert (yield dut.out_stall) == 1
+
+    # A writeback to tag 2 is captured and offered to memory.
+    yield from dut.zeroAllInputs()
+    yield dut.in_writeback[0].eq(entry(0xAAAAAAAA, 2))
+    yield
+    yield from dut.zeroAllInputs()
+    yield Settle()
+    assert (yield dut.out_patch_valid) == 1
+    assert (yield dut.out_patch_address) == 5
+    assert (yield dut.out_patch.as_value()) == entry(0xAAAAAAAA, 1)
+    assert (yield dut.out_tag_present) == 0b1000
+
+    # Tag 3 is refilled before its writeback, so it is passed up unchanged and released.
+    yield dut.in_refill[1].eq(entry(0, 3))
+    yield dut.in_refill_valid[1].eq(1)
+    yield dut.in_refill_address[1].eq(7)
+    yield Settle()
+    assert (yield dut.out_refill[1].as_value()) == entry(0, 3)
+    yield
+    yield from dut.zeroAllInputs()
+    yield Settle()
+    assert (yield dut.out_occupancy) == 1
+
+    # Tag 2 is refilled before its patch is written, so the captured value is substituted.
+    yield dut.in_refill[0].eq(entry(0, 2))
+    yield dut.in_refill_valid[0].eq(1)
+    yield dut.in_refill_address[0].eq(5)
+    yield Settle()
+    assert (yield dut.out_refill[0].as_value()) == entry(0xAAAAAAAA, 1)
+    yield
+    yield from dut.zeroAllInputs()
+    yield Settle()
+    assert (yield dut.out_occupancy) == 0
+    assert (yield dut.out_patch_valid) == 0
+
+    # A spill written back in the same cycle is captured at once, and released when the patch is written.
+    yield dut.in_spill[1].eq(entry(0, 6))
+    yield dut.in_spill_valid[1].eq(1)
+    yield dut.in_spill_address[1].eq(9)
+    yield dut.in_writeback[0].eq(entry(0xBBBBBBBB, 6))
+    yield
+    yield from dut.zeroAllInputs()
+    yield dut.in_patch_ready.eq(1)
+    yield Settle()
+    assert (yield dut.out_patch_valid) == 1
+    assert (yield dut.out_patch_address) == 9
+    assert (yield dut.out_patch.as_value()) == entry(0xBBBBBBBB, 1)
+    yield
+    yield Settle()
+    assert (yield dut.out_occupancy) == 0
+
+    # A pending tag spilled twice, e.g. after a DUP. Refilling one copy only releases that copy.
+    yield from dut.zeroAllInputs()
+    for s in range(2):
+        yield dut.in_spill[s].eq(entry(0, 2))
+        yield dut.in_spill_valid[s].eq(1)
+        yield dut.in_spill_address[s].eq(5+s)
+    yield
+    yield from dut.zeroAllInputs()
+    yield dut.in_refill[0].eq(entry(0, 2))
+    yield dut.in_refill_valid[0].eq(1)
+    yield dut.in_refill_address[0].eq(6)
+    yield
+    yield from dut.zeroAllInputs()
+    yield Settle()
+    assert (yield dut.out_occupancy) == 1
+
+    # The other copy still captures the writeback and is patched.
+    yield dut.in_writeback[0].eq(entry(0xCCCCCCCC, 2))
+    yield
+    yield from dut.zeroAllInputs()
+    yield Settle()
+    assert (yield dut.out_patch_valid) == 1
+    assert (yield dut.out_patch_address) == 5
+    assert (yield dut.out_patch.as_value()) == entry(0xCCCCCCCC, 1)
+
+    # Tag 2 is reused while the old entry waits for the patch port. Refilling the new entry passes it up
+    # unchanged, rather than substituting the old entry's captured value, and leaves the old entry to be patched.
+    yield dut.in_spill[0].eq(entry(0, 2))
+    yield dut.in_spill_valid[0].eq(1)
+    yield dut.in_spill_address[0].eq(8)
+    yield
+    yield from dut.zeroAllInputs()
+    yield dut.in_refill[1].eq(entry(0, 2))
+    yield dut.in_refill_valid[1].eq(1)
+    yield dut.in_refill_address[1].eq(8)
+    yield Settle()
+    assert (yield dut.out_refill[1].as_value()) == entry(0, 2)
+    yield
+    yield from dut.zeroAllInputs()
+    yield Settle()
+    assert (yield dut.out_occupancy) == 1
+    assert (yield dut.out_patch_valid) == 1
+    assert (yield dut.out_patch_address) == 5
+
+def test(debug: bool = False):
+    sim = Simulator(dut)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(process)
+    if debug:
+        with sim.write_vcd('test_019.vcd'):
+            sim.run()
+    else:
+        sim.run()
+
+if __name__ == '__main__':
+    test(debug = True)